@@ -3,14 +3,37 @@ ASGI config for assistant project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The slots stream is served here, outside of Django's request handling,
+because Django 4.0 can not stream responses from async views. Feeds are
+served by the WSGI application in a thread, as Django 4.0 iterates
+streaming responses in the event loop, where queries are not allowed.
+Each feed gets its own thread, as ASGIHandler does for Django requests,
+so one slow export does not hold up the others.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/4.0/howto/deployment/asgi/
 """
 
 import os
 
+from asgiref.sync import ThreadSensitiveContext
+from asgiref.wsgi import WsgiToAsgi
 from django.core.asgi import get_asgi_application
+from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'assistant.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+feeds_application = WsgiToAsgi(get_wsgi_application())
+
+from web import sse  # noqa: E402 (needs the apps loaded)
+from web.consts import Feed, PubSub  # noqa: E402
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] == PubSub.STREAM_PATH:
+        return await sse.slots_stream(scope, receive, send)
+    if scope['type'] == 'http' and scope['path'].startswith(Feed.PATH):
+        async with ThreadSensitiveContext():
+            return await feeds_application(scope, receive, send)
+    return await django_application(scope, receive, send)
@@ -44,6 +44,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'web.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -89,6 +90,24 @@ DATABASES = {
 }
 
 
+# Password hashing
+# https://docs.djangoproject.com/en/4.0/topics/auth/passwords/
+# PASSWORD_HASHER picks the hasher new passwords are stored with, the others
+# are kept to check existing passwords, which are rehashed on login. argon2
+# needs the argon2-cffi package and bcrypt the bcrypt package.
+
+PASSWORD_HASHER = os.environ.get("PASSWORD_HASHER", "pbkdf2")
+PASSWORD_HASH_ITERATIONS = int(
+    os.environ.get("PASSWORD_HASH_ITERATIONS", 320000))
+_PASSWORD_HASHERS = {
+    'pbkdf2': 'web.hashers.PBKDF2PasswordHasher',
+    'argon2': 'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'bcrypt': 'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+}
+PASSWORD_HASHERS = [_PASSWORD_HASHERS[PASSWORD_HASHER]] + [
+    hasher for name, hasher in _PASSWORD_HASHERS.items()
+    if name != PASSWORD_HASHER]
+
 # Password validation
 # https://docs.djangoproject.com/en/4.0/ref/settings/#auth-password-validators
 AUTHENTICATION_BACKENDS = ["web.backends.EmailAuthBackend",
@@ -129,6 +148,51 @@ STATICFILES_DIRS = [
     os.path.join(BASE_DIR, 'statics'),
 ]
 
+# Cache
+# https://docs.djangoproject.com/en/4.0/topics/cache/
+# Local memory is per process, set CACHE_BACKEND/CACHE_LOCATION to a shared
+# backend (e.g. the file based one) when running several workers.
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            "CACHE_BACKEND", 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get("CACHE_LOCATION", ''),
+    }
+}
+CLIENT_CALENDARS_CACHE_TIMEOUT = 60 * 60
+# Seconds an authenticated user is cached between requests, 0 disables it.
+AUTH_USER_CACHE_TIMEOUT = int(os.environ.get("AUTH_USER_CACHE_TIMEOUT", 30))
+# Rendered calendar months are dropped when their events change, the
+# timeout only bounds the memory they use.
+MONTH_CACHE_TIMEOUT = int(os.environ.get("MONTH_CACHE_TIMEOUT", 60 * 60))
+MONTH_CACHE_LOCK_TIMEOUT = 2
+
+# Pub/sub
+# Backend pushing event changes to the slots stream. The local one only
+# reaches the clients connected to the same process, use
+# web.pubsub.PostgresBackend when running several workers.
+PUBSUB_BACKEND = os.environ.get("PUBSUB_BACKEND", 'web.pubsub.LocalBackend')
+# Seconds between keep-alive comments on idle streams.
+SLOTS_STREAM_KEEPALIVE = 15
+
+# Logging
+# LOG_LEVEL is one of DEBUG, INFO or ERROR. LOG_SAMPLING maps a module
+# ('web.models') or function ('web.models.get_events') to the fraction of
+# its records kept.
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+LOG_SAMPLING = {
+    'web.models.get_events': float(
+        os.environ.get("LOG_SAMPLING_GET_EVENTS", 0.01)),
+}
+
+# Metrics
+# /metrics requires the "Authorization: Bearer <token>" header, and is not
+# served when unset.
+
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+
 # Session config
 SESSION_EXPIRE_AT_BROWSER_CLOSE = True     # opional, as this will log you out when browser is closed
 SESSION_COOKIE_AGE = 300                   # 0r 5 * 60, same thing
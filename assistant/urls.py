@@ -32,6 +32,8 @@ urlpatterns = [
          name='scheduled_event_view'),
     path('client/schedule/new', views.schedule_event,
          name='schedule_event'),
+    path('client/schedule/batch', views.schedule_events,
+         name='schedule_events'),
     path('owner/', views.owner_view, name='owner_view'),
     path('owner/calendar/add', views.add_owner_calendar,
          name='add_owner_calendar'),
@@ -41,6 +43,8 @@ urlpatterns = [
          name='delete_owner_client'),
     path('owner_clients/add', views.add_owner_client,
          name='add_owner_client'),
+    path('owner_clients/add/bulk', views.add_owner_clients,
+         name='add_owner_clients'),
     path('available_events/owner/<str:month_filter>&<int:year_filter>',
          views.available_events_view,
          name='available_events_view'),
@@ -51,7 +55,17 @@ urlpatterns = [
          name='taken_events_view'),
     path('taken_events/cancel', views.cancel_event,
          name='cancel_event'),
+    path('taken_events/cancel/batch', views.cancel_events,
+         name='cancel_events'),
     path('available_events/add', views.add_event, name='add_event'),
     path('available_events/delete', views.delete_event, name='delete_event'),
+    path('available_events/template', views.add_weekly_template,
+         name='add_weekly_template'),
+    path('available_events/import', views.import_events,
+         name='import_events'),
+    path('api/events', views.events_api, name='events_api'),
+    path('feeds/<str:token>.ics', views.feed, name='feed'),
+    path('feed/rotate', views.rotate_feed, name='rotate_feed'),
+    path('metrics', views.metrics, name='metrics'),
     path('admin/', admin.site.urls),
 ]
@@ -0,0 +1,27 @@
+// Patch the event tables with the changes returned by the event views when
+// they are posted with changes: 'html'. Row ids are the event_info of their
+// button, which sort by day and start time.
+
+function removeRows(eventInfos) {
+    eventInfos.forEach(function(eventInfo) {
+        var button = document.getElementById(eventInfo);
+        if (button) {
+            $(button).closest("tr").remove();
+        }
+    });
+}
+
+function insertRows(table, rows) {
+    rows.forEach(function(row) {
+        var newRow = $(row);
+        var eventInfo = newRow.find("button").attr("id");
+        var next = $(table).find("tr.table-secondary").filter(function() {
+            return $(this).find("button").attr("id") > eventInfo;
+        }).first();
+        if (next.length) {
+            newRow.insertBefore(next);
+        } else {
+            $(table).find("tr").last().after(newRow);
+        }
+    });
+}
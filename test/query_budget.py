@@ -0,0 +1,37 @@
+import time
+from contextlib import contextmanager
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetMixin:
+    """
+    This class adds a query budget assertion to test cases.
+    """
+
+    @contextmanager
+    def assertQueryBudget(self, max_queries, max_seconds):
+        """
+        Assert the code run in the block runs at most max_queries queries
+        and takes at most max_seconds. The failure message lists the sql
+        of every query run.
+
+        Args:
+            - max_queries(int):
+            - max_seconds(float):
+        """
+        with CaptureQueriesContext(connection) as context:
+            start = time.perf_counter()
+            yield context
+            seconds = time.perf_counter() - start
+
+        queries = context.captured_queries
+        if len(queries) > max_queries:
+            self.fail("{} queries run, budget is {}:\n{}".format(
+                len(queries), max_queries,
+                "\n".join("{}. {}".format(number, query['sql'])
+                          for number, query in enumerate(queries, 1))))
+        self.assertLessEqual(
+            seconds, max_seconds,
+            msg="Took {:.3f} s, budget is {} s".format(seconds, max_seconds))
@@ -0,0 +1,196 @@
+import time
+
+from web.backends import EmailAuthBackend
+from web.hashers import PBKDF2PasswordHasher
+from web.models import Client, Owner
+
+from django.contrib.auth.hashers import check_password, make_password
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+TEST_EMAIL = 'test@test.com'
+TEST_ID = '12345678'
+TEST_PASSWORD = 'superSafePass'
+TEST_LOGINS = 5
+
+
+class GetUserTest(TestCase):
+    """
+    This class implements all the unit tests for EmailAuthBackend.get_user.
+    """
+
+    def setUp(self):
+        """
+        Create the test client and owner.
+        """
+        self.backend = EmailAuthBackend()
+        self.user_client = Client.objects.create(
+            email=TEST_EMAIL, password=TEST_PASSWORD, first_name='test',
+            last_name='test', identity_number=TEST_ID)
+        self.user_owner = Owner.objects.create(
+            email=TEST_EMAIL, password=TEST_PASSWORD, first_name='test',
+            last_name='test', identity_number=TEST_ID)
+
+    def tearDown(self):
+        """
+        Drop the cached users.
+        """
+        cache.clear()
+
+    @override_settings(AUTH_USER_CACHE_TIMEOUT=0)
+    def test_get_owner(self):
+        """
+        This test gets an owner with a single query.
+        """
+        with self.assertNumQueries(1):
+            user = self.backend.get_user(str(self.user_owner.pk))
+        self.assertEqual(user, self.user_owner, msg='Wrong user')
+        self.assertIsInstance(user, Owner, msg='Wrong user type')
+
+    @override_settings(AUTH_USER_CACHE_TIMEOUT=0)
+    def test_get_client(self):
+        """
+        This test gets a client with a single query.
+        """
+        with self.assertNumQueries(1):
+            user = self.backend.get_user(str(self.user_client.pk))
+        self.assertEqual(user, self.user_client, msg='Wrong user')
+        self.assertIsInstance(user, Client, msg='Wrong user type')
+
+    def test_get_unknown_user(self):
+        """
+        This test gets users which do not exist.
+        """
+        with self.assertNumQueries(1):
+            self.assertIsNone(self.backend.get_user('199999999'))
+        with self.assertNumQueries(0):
+            self.assertIsNone(self.backend.get_user('399999999'))
+
+    @override_settings(AUTH_USER_CACHE_TIMEOUT=30)
+    def test_get_user_cached(self):
+        """
+        This test gets a user twice and asserts the second time does not
+        query the database.
+        """
+        self.backend.get_user(str(self.user_client.pk))
+        with self.assertNumQueries(0):
+            user = self.backend.get_user(str(self.user_client.pk))
+        self.assertEqual(user, self.user_client, msg='Wrong cached user')
+
+    @override_settings(AUTH_USER_CACHE_TIMEOUT=30)
+    def test_get_user_invalidated(self):
+        """
+        This test changes a cached user and asserts the change is seen.
+        """
+        self.backend.get_user(str(self.user_client.pk))
+        self.user_client.first_name = 'changed'
+        self.user_client.save()
+        user = self.backend.get_user(str(self.user_client.pk))
+        self.assertEqual(user.first_name, 'changed',
+                         msg='Cached user was not invalidated')
+
+
+class LoginTest(TestCase):
+    """
+    This class implements the password hashing tests of the login path.
+    """
+
+    def setUp(self):
+        """
+        Create the test owner.
+        """
+        self.user_owner = Owner.objects.create(
+            email=TEST_EMAIL, password=TEST_PASSWORD, first_name='test',
+            last_name='test', identity_number=TEST_ID)
+
+    def _login(self):
+        """
+        Login the test owner.
+        """
+        body = {'email': TEST_EMAIL,
+                'password': TEST_PASSWORD,
+                'is_client': False,
+                'is_owner': True}
+        response = self.client.post(reverse('login_user'), data=body,
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 200, msg='Login failed')
+
+    def test_save_keeps_password(self):
+        """
+        This test saves an owner and asserts the password hash is kept.
+        """
+        password = self.user_owner.password
+        owner_id = self.user_owner.owner_id
+        self.user_owner.first_name = 'changed'
+        self.user_owner.save()
+        self.user_owner = Owner.objects.get(pk=self.user_owner.pk)
+        self.user_owner.save()
+        self.user_owner.refresh_from_db()
+        self.assertEqual(self.user_owner.password, password,
+                         msg='Password was hashed again')
+        self.assertEqual(self.user_owner.owner_id, owner_id,
+                         msg='Owner id was changed')
+        self.assertTrue(check_password(TEST_PASSWORD,
+                                       self.user_owner.password),
+                        msg='Password was corrupted')
+
+    def test_save_changed_password(self):
+        """
+        This test changes the password of an owner and asserts it is hashed.
+        """
+        self.user_owner = Owner.objects.get(pk=self.user_owner.pk)
+        self.user_owner.password = 'newPassword'
+        self.user_owner.save()
+        self.user_owner.refresh_from_db()
+        self.assertTrue(check_password('newPassword',
+                                       self.user_owner.password),
+                        msg='Password was not hashed')
+
+    def test_login_keeps_password(self):
+        """
+        This test logins twice and asserts the password hash is kept.
+        """
+        password = self.user_owner.password
+        self._login()
+        self._login()
+        self.user_owner.refresh_from_db()
+        self.assertEqual(self.user_owner.password, password,
+                         msg='Password was hashed again on login')
+
+    def test_login_upgrades_password(self):
+        """
+        This test logins with a password hashed with fewer iterations and
+        asserts it is rehashed with the configured ones.
+        """
+        self.user_owner.password = PBKDF2PasswordHasher().encode(
+            TEST_PASSWORD, PBKDF2PasswordHasher().salt(), iterations=1000)
+        Owner.objects.filter(pk=self.user_owner.pk).update(
+            password=self.user_owner.password)
+        self._login()
+        self.user_owner.refresh_from_db()
+        iterations = int(self.user_owner.password.split('$')[1])
+        self.assertEqual(iterations, PBKDF2PasswordHasher().iterations,
+                         msg='Password was not upgraded')
+        self.assertTrue(check_password(TEST_PASSWORD,
+                                       self.user_owner.password),
+                        msg='Password was corrupted')
+
+    def test_login_latency(self):
+        """
+        This test measures the login latency and asserts it is close to the
+        cost of a single password hash.
+        """
+        start = time.perf_counter()
+        make_password(TEST_PASSWORD)
+        hash_time = time.perf_counter() - start
+
+        self._login()
+        start = time.perf_counter()
+        for _ in range(TEST_LOGINS):
+            self._login()
+        login_time = (time.perf_counter() - start) / TEST_LOGINS
+        self.assertLess(
+            login_time, hash_time * 1.5 + 0.05,
+            msg='Login takes {:.1f} ms, a password hash {:.1f} ms'.format(
+                login_time * 1000, hash_time * 1000))
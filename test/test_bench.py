@@ -0,0 +1,34 @@
+from web.management.commands.bench import _percentile, _summary
+
+from django.test import SimpleTestCase
+
+
+class BenchReportTest(SimpleTestCase):
+    """
+    This class tests the latency report of the bench command.
+    """
+
+    def test_percentile(self):
+        """
+        This test checks percentiles are taken by the nearest rank.
+        """
+        latencies = [number / 1000 for number in range(1, 101)]
+        self.assertEqual(_percentile(latencies, 50), 50,
+                         msg="Wrong p50")
+        self.assertEqual(_percentile(latencies, 99), 99,
+                         msg="Wrong p99")
+        self.assertEqual(_percentile([0.002], 95), 2,
+                         msg="Wrong percentile of a single request")
+        self.assertIsNone(_percentile([], 50),
+                          msg="Percentile of no requests should be None")
+
+    def test_summary(self):
+        """
+        This test checks the summary of a route.
+        """
+        summary = _summary([0.003, 0.001, 0.002, 0.004], 1, 2)
+        self.assertEqual(summary['requests'], 4, msg="Wrong requests")
+        self.assertEqual(summary['errors'], 1, msg="Wrong errors")
+        self.assertEqual(summary['throughput'], 2, msg="Wrong throughput")
+        self.assertEqual(summary['p50_ms'], 2, msg="Wrong p50")
+        self.assertEqual(summary['p99_ms'], 4, msg="Wrong p99")
@@ -0,0 +1,207 @@
+import datetime
+import io
+import os
+import tempfile
+
+from web.consts import Import
+from web.helpers import import_helper
+from web.models import Calendar, Event, Owner
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+
+TEST_ID = 12345678
+TEST_DAY = datetime.date(2100, 1, 4)
+
+TEST_CSV = b"""day,start_time,end_time,location
+2100-01-04,09:00,10:00,office
+2100-01-04,09:30,10:30,office
+2100-01-04,11:00,10:00,office
+2100-01-05,09:00
+2100-01-05,10:00,11:00,
+"""
+
+TEST_ICS = b"""BEGIN:VCALENDAR\r
+VERSION:2.0\r
+BEGIN:VEVENT\r
+UID:event-1@test\r
+DTSTART:21000104T090000\r
+DTEND:21000104T100000\r
+LOCATION:office\\, first\r
+  floor\r
+END:VEVENT\r
+BEGIN:VEVENT\r
+UID:series-1@test\r
+DTSTART:21000105T090000\r
+DTEND:21000105T100000\r
+RRULE:FREQ=WEEKLY;UNTIL=21000126T090000\r
+EXDATE:21000112T090000\r
+END:VEVENT\r
+BEGIN:VEVENT\r
+UID:event-2@test\r
+DTSTART;VALUE=DATE:21000106\r
+DTEND;VALUE=DATE:21000107\r
+END:VEVENT\r
+END:VCALENDAR\r
+"""
+
+
+class ParseTest(SimpleTestCase):
+    """
+    This class implements all the unit tests for the parse helper.
+    """
+
+    def _parse(self, name, content):
+        return list(import_helper.parse(name, io.BytesIO(content)))
+
+    def test_parse_csv(self):
+        """
+        This test parses a CSV file and asserts the invalid rows are
+        reported with their line.
+        """
+        rows = self._parse('slots.csv', TEST_CSV)
+
+        self.assertEqual(
+            [slot for _, slot, _ in rows if slot],
+            [(TEST_DAY, datetime.time(9), datetime.time(10), 'office'),
+             (TEST_DAY, datetime.time(9, 30), datetime.time(10, 30),
+              'office'),
+             (TEST_DAY + datetime.timedelta(days=1), datetime.time(10),
+              datetime.time(11), None)],
+            msg='Wrong slots')
+        self.assertEqual(
+            [(line, error) for line, _, error in rows if error],
+            [(4, 'End time must be greater than start time'),
+             (5, 'Missing end_time')],
+            msg='Wrong errors')
+
+    def test_parse_ics(self):
+        """
+        This test parses an iCalendar file and asserts folded lines are
+        joined, weekly events are expanded without their exceptions and all
+        day events are reported.
+        """
+        rows = self._parse('slots.ics', TEST_ICS)
+
+        slots = [slot for _, slot, _ in rows if slot]
+        self.assertEqual(slots[0][3], 'office, first floor',
+                         msg='Location was not unfolded')
+        self.assertEqual(
+            [slot[0] for slot in slots[1:]],
+            [datetime.date(2100, 1, 5), datetime.date(2100, 1, 19),
+             datetime.date(2100, 1, 26)],
+            msg='Recurrence was not expanded')
+        self.assertEqual(
+            [(line, error) for line, _, error in rows if error],
+            [(17, 'All day events are not supported')],
+            msg='Wrong errors')
+
+    def test_parse_ics_count(self):
+        """
+        This test parses recurrences counting past the supported slots or
+        the last supported date and asserts they are cut or reported as
+        errors of their event.
+        """
+        content = b"".join(
+            b"BEGIN:VEVENT\r\nDTSTART:%s\r\nDTEND:%s\r\n"
+            b"RRULE:FREQ=WEEKLY;%s\r\nEND:VEVENT\r\n" % event
+            for event in [
+                (b"21000104T090000", b"21000104T100000", b"COUNT=999999999"),
+                (b"99991220T090000", b"99991220T100000", b"COUNT=3"),
+                (b"21000104T090000", b"21000104T100000",
+                 b"INTERVAL=0;COUNT=3")])
+        rows = self._parse('slots.ics', content)
+
+        self.assertEqual(len([slot for _, slot, _ in rows if slot]),
+                         Import.MAX_SLOTS + 1, msg='Count was not capped')
+        self.assertEqual(
+            [(line, error) for line, _, error in rows if error],
+            [(6, 'date value out of range'),
+             (11, 'Recurrence interval must be at least 1')],
+            msg='Wrong errors')
+
+    def test_parse_ics_rule_parts(self):
+        """
+        This test parses recurrences with BYDAY and WKST parts and asserts
+        only BYDAY on the start day is accepted, naming the unsupported
+        parts otherwise.
+        """
+        content = b"".join(
+            b"BEGIN:VEVENT\r\nDTSTART:21000105T090000\r\n"
+            b"DTEND:21000105T100000\r\nRRULE:FREQ=WEEKLY;%s\r\n"
+            b"END:VEVENT\r\n" % rule
+            for rule in [b"COUNT=2;BYDAY=TU;WKST=MO",
+                         b"COUNT=2;BYDAY=TU,TH",
+                         b"COUNT=2;BYMONTH=1;BYSETPOS=1"])
+        rows = self._parse('slots.ics', content)
+
+        self.assertEqual(
+            [slot[0] for _, slot, _ in rows if slot],
+            [datetime.date(2100, 1, 5), datetime.date(2100, 1, 12)],
+            msg='BYDAY on the start day was not accepted')
+        self.assertEqual(
+            [(line, error) for line, _, error in rows if error],
+            [(6, 'Unsupported recurrence rule part BYDAY'),
+             (11, 'Unsupported recurrence rule part BYMONTH, BYSETPOS')],
+            msg='Wrong errors')
+
+    def test_parse_unknown(self):
+        """
+        This test parses a file of an unknown format and asserts an error
+        is raised.
+        """
+        with self.assertRaises(ValueError,
+                               msg='Unknown format was not detected'):
+            self._parse('slots.txt', TEST_CSV)
+
+
+class ImportSlotsTest(TestCase):
+    """
+    This class implements all the unit tests for the import_slots helper
+    and the import_events command.
+    """
+
+    def setUp(self):
+        """
+        Creates an owner, a calendar and an event overlapping the file.
+        """
+        owner = Owner.objects.create(
+            email='owner@test.com', password='test', first_name='test',
+            last_name='test', identity_number=TEST_ID)
+        self.calendar = Calendar.objects.create(summary='test', owner=owner)
+        Event.objects.create(
+            day=TEST_DAY + datetime.timedelta(days=1),
+            start_time=datetime.time(10, 30), end_time=datetime.time(12),
+            calendar=self.calendar)
+
+    def test_import_slots(self):
+        """
+        This test imports a CSV file and asserts the slots overlapping
+        each other or the calendar are reported.
+        """
+        summary = import_helper.import_slots(self.calendar, 'slots.csv',
+                                             io.BytesIO(TEST_CSV))
+
+        self.assertEqual(summary['created'], 1, msg='Wrong created slots')
+        self.assertEqual(
+            summary['conflicts'],
+            ['2100-01-04|09:30:00.000000|10:30:00.000000',
+             '2100-01-05|10:00:00.000000|11:00:00.000000'],
+            msg='Wrong conflicts')
+        self.assertEqual(len(summary['errors']), 2, msg='Wrong errors')
+
+    def test_import_events_command(self):
+        """
+        This test imports an iCalendar file with the import_events command.
+        """
+        handle, path = tempfile.mkstemp(suffix='.ics')
+        with os.fdopen(handle, 'wb') as ics:
+            ics.write(TEST_ICS)
+        try:
+            call_command('import_events', self.calendar.pk, path,
+                         stdout=io.StringIO())
+        finally:
+            os.remove(path)
+
+        self.assertEqual(Event.objects.filter(calendar=self.calendar).count(),
+                         5, msg='Events were not imported')
@@ -0,0 +1,191 @@
+import json
+import os
+import tempfile
+
+from utils.logger import Logger
+
+from django.test import SimpleTestCase
+
+TEST_RECORDS = 100
+
+
+class Formatted:
+    """
+    Argument counting how many times it is formatted.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __str__(self):
+        self.count += 1
+        return "formatted"
+
+
+class Unprintable:
+    """
+    Argument failing to be formatted.
+    """
+
+    def __str__(self):
+        raise RuntimeError("unprintable")
+
+    def __repr__(self):
+        raise RuntimeError("unprintable")
+
+
+class LoggerTest(SimpleTestCase):
+    """
+    This class implements all the unit tests for the Logger.
+    """
+
+    def setUp(self):
+        """
+        Create a temporary log directory.
+        """
+        self.log_dir = tempfile.TemporaryDirectory()
+        self.log_path = os.path.join(self.log_dir.name, "log.txt")
+
+    def tearDown(self):
+        """
+        Delete the temporary log directory.
+        """
+        self.log_dir.cleanup()
+
+    def _read(self, path):
+        with open(path) as log_file:
+            return [json.loads(line) for line in log_file]
+
+    def test_log(self):
+        """
+        This test logs info and error records and asserts they are written
+        as JSON lines, in order.
+        """
+        logger = Logger(self.log_dir.name)
+        for number in range(TEST_RECORDS):
+            logger.log_info("info {}".format(number))
+        logger.log_error("error")
+        self.assertTrue(logger.flush(), msg='Records were not written')
+
+        records = self._read(self.log_path)
+        self.assertEqual(len(records), TEST_RECORDS + 1,
+                         msg='Records were lost')
+        self.assertEqual(records[0]['level'], 'INFO')
+        self.assertEqual(records[0]['message'], 'info 0')
+        self.assertEqual(records[-1]['level'], 'ERROR')
+        self.assertEqual(records[-1]['message'], 'error')
+
+    def test_no_file_until_logging(self):
+        """
+        This test asserts the log file is not opened before logging.
+        """
+        Logger(self.log_dir.name)
+        self.assertFalse(os.path.exists(self.log_path),
+                         msg='Log file was opened on init')
+
+    def test_rotate_by_size(self):
+        """
+        This test logs over max_bytes and asserts the file is rotated.
+        """
+        logger = Logger(self.log_dir.name, max_bytes=1024, backups=2)
+        for number in range(TEST_RECORDS):
+            logger.log_info("info {}".format(number))
+            logger.flush()
+
+        self.assertTrue(os.path.exists(self.log_path + ".1"),
+                        msg='Log file was not rotated')
+        self.assertFalse(os.path.exists(self.log_path + ".3"),
+                         msg='Too many backups were kept')
+        self.assertLess(os.path.getsize(self.log_path), 2048,
+                        msg='Log file was not rotated')
+        self.assertEqual(
+            self._read(self.log_path)[-1]['message'],
+            "info {}".format(TEST_RECORDS - 1), msg='Records were lost')
+
+    def test_rotate_by_age(self):
+        """
+        This test logs into a file older than rotate_seconds and asserts it
+        is rotated.
+        """
+        logger = Logger(self.log_dir.name, rotate_seconds=60)
+        logger.log_info("old")
+        logger.flush()
+        logger._opened_at -= 60
+        logger.log_info("new")
+        logger.flush()
+        logger.log_info("newer")
+        logger.flush()
+
+        self.assertEqual(
+            [record['message'] for record in self._read(self.log_path)],
+            ['newer'], msg='Log file was not rotated')
+        self.assertEqual(
+            [record['message']
+             for record in self._read(self.log_path + ".1")],
+            ['old', 'new'], msg='Log file was not rotated')
+
+    def test_lazy_arguments(self):
+        """
+        This test logs a message with arguments and asserts they are
+        formatted into it.
+        """
+        logger = Logger(self.log_dir.name)
+        logger.log_info("Getting event %s %s", {'day': 1}, 2)
+        logger.flush()
+
+        self.assertEqual(self._read(self.log_path)[0]['message'],
+                         "Getting event {'day': 1} 2")
+
+    def test_unprintable_arguments(self):
+        """
+        This test logs an argument whose __str__ raises and asserts the
+        record and the ones after it are still written.
+        """
+        logger = Logger(self.log_dir.name)
+        logger.log_info("Getting event %s", Unprintable())
+        logger.log_info("after")
+        self.assertTrue(logger.flush(), msg='Writer thread died')
+
+        self.assertEqual(
+            [record['message'] for record in self._read(self.log_path)],
+            ['Getting event %s (RuntimeError formatting arguments)',
+             'after'], msg='Records were lost')
+
+    def test_level(self):
+        """
+        This test logs below the configured level and asserts the records
+        are dropped without formatting their arguments.
+        """
+        logger = Logger(self.log_dir.name, level='ERROR')
+        argument = Formatted()
+        logger.log_debug("debug %s", argument)
+        logger.log_info("info %s", argument)
+        logger.log_error("error %s", argument)
+        logger.flush()
+
+        self.assertEqual(
+            [record['message'] for record in self._read(self.log_path)],
+            ['error formatted'], msg='Records below the level were written')
+        self.assertEqual(argument.count, 1,
+                         msg='Dropped records were formatted')
+
+    def test_sampling(self):
+        """
+        This test samples the records of a function and of a module.
+        """
+        logger = Logger(self.log_dir.name, sampling={
+            '{}.test_sampling'.format(__name__): 0,
+            __name__: 1})
+        argument = Formatted()
+        logger.log_info("sampled %s", argument)
+        self._log_kept(logger)
+        logger.flush()
+
+        self.assertEqual(
+            [record['message'] for record in self._read(self.log_path)],
+            ['kept'], msg='Records were not sampled')
+        self.assertEqual(argument.count, 0,
+                         msg='Dropped records were formatted')
+
+    def _log_kept(self, logger):
+        logger.log_info("kept")
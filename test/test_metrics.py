@@ -0,0 +1,89 @@
+import re
+
+from web.metrics import metrics
+from web.models import Owner
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+TEST_EMAIL = 'test@test.com'
+TEST_ID = '12345678'
+TEST_PASSWORD = 'superSafePass'
+
+
+class MetricsViewTest(TestCase):
+    """
+    This class implements all the tests for the metrics middleware and view.
+    """
+
+    def setUp(self):
+        """
+        Drop the metrics recorded by other tests.
+        """
+        metrics.reset()
+
+    def _sample(self, text, name, **labels):
+        """
+        Get the value of a sample of the exported metrics.
+        """
+        label_text = ",".join('{}="{}"'.format(label, value)
+                              for label, value in labels.items())
+        match = re.search(r'^{}\{{{}\}} (\S+)$'.format(
+            re.escape(name), re.escape(label_text)), text, re.M)
+        self.assertIsNotNone(match, msg='{} {} not exported'.format(
+            name, labels))
+        return float(match.group(1))
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics(self):
+        """
+        This test requests some views and asserts their metrics are
+        exported.
+        """
+        owner = Owner.objects.create(
+            email=TEST_EMAIL, password=TEST_PASSWORD, first_name='test',
+            last_name='test', identity_number=TEST_ID)
+        self.client.force_login(owner)
+        self.client.get(reverse('owner_view'))
+        self.client.get(reverse('owner_view'))
+        self.client.get(reverse('login'))
+
+        text = self.client.get(
+            reverse('metrics'),
+            HTTP_AUTHORIZATION='Bearer secret').content.decode()
+        self.assertEqual(
+            self._sample(text, 'http_responses_total', view='owner_view',
+                         status=200), 2)
+        self.assertEqual(
+            self._sample(text, 'http_request_duration_seconds_count',
+                         view='owner_view'), 2)
+        self.assertEqual(
+            self._sample(text, 'http_request_duration_seconds_bucket',
+                         view='owner_view', le='+Inf'), 2)
+        self.assertGreater(
+            self._sample(text, 'db_queries_total', view='owner_view'), 0)
+        self.assertGreater(
+            self._sample(text, 'http_response_bytes_total', view='login'), 0)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_token(self):
+        """
+        This test requests the metrics with and without the token.
+        """
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 403,
+                         msg='Metrics were exported without the token')
+        response = self.client.get(reverse('metrics'),
+                                   HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200,
+                         msg='Metrics were not exported with the token')
+
+    @override_settings(METRICS_TOKEN=None)
+    def test_metrics_no_token(self):
+        """
+        This test asserts the metrics are not served without a token
+        configured.
+        """
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 404,
+                         msg='Metrics were exported without a token set')
@@ -0,0 +1,93 @@
+import datetime
+
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase
+
+TEST_DAY = datetime.date(2100, 1, 7)
+
+
+class TestEventWeekDayMigration(TransactionTestCase):
+    """
+    This class implements the tests for the migration adding the week day
+    of the events.
+    """
+    before = [('web', '0004_event_calendar_free_day_index')]
+    after = [('web', '0005_event_week_day')]
+
+    def setUp(self):
+        """
+        Migrates back to the events without week day and stores one.
+        """
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.before)
+        apps = executor.loader.project_state(self.before).apps
+        calendar = apps.get_model('web', 'Calendar').objects.create(
+            summary="test")
+        apps.get_model('web', 'Event').objects.create(
+            day=TEST_DAY,
+            start_time=datetime.time(9, 0),
+            end_time=datetime.time(10, 0),
+            calendar=calendar)
+
+    def tearDown(self):
+        """
+        Migrates forward to the latest models.
+        """
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_backfill_week_day(self):
+        """
+        This test migrates the stored event and asserts its week day is
+        taken from its day.
+        """
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.after)
+        apps = executor.loader.project_state(self.after).apps
+
+        event = apps.get_model('web', 'Event').objects.get()
+        self.assertEqual(event.week_day, TEST_DAY.weekday(),
+                         msg='Week day was not backfilled')
+
+
+class TestFeedSecretMigration(TransactionTestCase):
+    """
+    This class implements the tests for the migration adding the feed
+    secrets.
+    """
+    before = [('web', '0009_calendar_modified')]
+    after = [('web', '0010_feed_secret')]
+
+    def setUp(self):
+        """
+        Migrates back to the calendars without feed secret and stores two.
+        """
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.before)
+        apps = executor.loader.project_state(self.before).apps
+        for summary in ("first", "second"):
+            apps.get_model('web', 'Calendar').objects.create(summary=summary)
+
+    def tearDown(self):
+        """
+        Migrates forward to the latest models.
+        """
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_new_feed_secrets(self):
+        """
+        This test migrates the stored calendars and asserts each one gets a
+        secret of its own.
+        """
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.after)
+        apps = executor.loader.project_state(self.after).apps
+
+        secrets = apps.get_model('web', 'Calendar').objects\
+            .values_list('feed_secret', flat=True)
+        self.assertEqual(len(set(secrets)), 2,
+                         msg='Calendars share their feed secret')
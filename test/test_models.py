@@ -1,14 +1,18 @@
 import datetime
+import threading
 
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
 from django.core.exceptions import ValidationError
 
-from web.models import Calendar, Client, Event, Owner
+from web.models import Calendar, Client, Event, EventTakenError, Owner,\
+    RecurringSeries, WeeklyTemplate
 
 TEST_ID_NUMBER = "12345678"
 TEST_DAY = datetime.date.today()
 TEST_START_TIME = datetime.time(00, 00, 00)
 TEST_END_TIME = datetime.time(00, 30, 00)
+TEST_CONCURRENT_CLIENTS = 20
 
 
 class TestClient(TestCase):
@@ -64,6 +68,33 @@ class TestOwner(TestCase):
         self.assertEqual(self.owner.clients.count(), 0,
                          msg="Client was not deleted")
 
+    def test_add_clients(self):
+        """
+        This test adds several clients at once and asserts only the clients
+        not added before, and the rows matching no client, or two different
+        ones, are returned.
+        """
+        other = Client.objects.create(
+            email="other@test.com",
+            password="testPass",
+            first_name="test",
+            last_name="test",
+            identity_number=int(TEST_ID_NUMBER) + 1)
+        self.owner.add_client(self.client)
+        rows = [{'email': "test@test.com", 'identity_number': TEST_ID_NUMBER},
+                {'email': "other@test.com"},
+                {'email': "unknown@test.com"},
+                {'email': "test@test.com",
+                 'identity_number': int(TEST_ID_NUMBER) + 1}]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            added, unknown = self.owner.add_clients(rows)
+
+        self.assertEqual(added, [other], msg="Wrong clients added")
+        self.assertEqual(unknown, rows[2:], msg="Wrong unknown rows")
+        self.assertEqual(self.owner.clients.count(), 2,
+                         msg="Clients were not added")
+
 
 class TestCalendar(TestCase):
     """
@@ -140,6 +171,106 @@ class TestCalendar(TestCase):
                 end_time=TEST_END_TIME,
                 location='test')
 
+    def test_create_event_partial_overlap(self):
+        """
+        Try to create an event starting inside another one. Assert exception
+        is raised.
+        """
+        Event.objects.create(
+            day=TEST_DAY,
+            start_time=TEST_START_TIME,
+            end_time=TEST_END_TIME,
+            calendar=self.calendar)
+        with self.assertRaises(ValidationError,
+                               msg="Overlap was not detected"):
+            self.calendar.create_event(
+                day=TEST_DAY,
+                start_time=datetime.time(00, 15, 00),
+                end_time=datetime.time(00, 45, 00),
+                location='test')
+
+    def test_create_event_back_to_back(self):
+        """
+        This test creates an event starting when another one ends.
+        """
+        Event.objects.create(
+            day=TEST_DAY,
+            start_time=TEST_START_TIME,
+            end_time=TEST_END_TIME,
+            calendar=self.calendar)
+        self.calendar.create_event(
+            day=TEST_DAY,
+            start_time=TEST_END_TIME,
+            end_time=datetime.time(1, 00, 00),
+            location='test')
+
+        self.assertEqual(Event.objects.filter(calendar=self.calendar).count(),
+                         2, msg="Back to back event was not created")
+
+    def test_create_event_recurrent(self):
+        """
+        This test creates a recurrent event and asserts one series with one
+        occurrence per week for a year is created.
+        """
+        self.calendar.create_event(
+            day=TEST_DAY,
+            start_time=TEST_START_TIME,
+            end_time=TEST_END_TIME,
+            location='test',
+            recurrent=True)
+
+        self.assertEqual(
+            RecurringSeries.objects.filter(calendar=self.calendar).count(), 1,
+            msg="Recurrent event was not created")
+        self.assertEqual(Event.objects.filter(calendar=self.calendar).count(),
+                         0, msg="Recurrent event was stored once per week")
+        events = self.calendar.get_events_between(
+            TEST_DAY, TEST_DAY + datetime.timedelta(days=365))
+        self.assertEqual(len(events), 53,
+                         msg="Recurrent event was not expanded")
+
+    def test_create_event_recurrent_overlap(self):
+        """
+        Try to create a recurrent event overlapping one of its weeks. Assert
+        exception is raised, the date is reported and nothing is created.
+        """
+        overlap_day = TEST_DAY + datetime.timedelta(days=14)
+        Event.objects.create(
+            day=overlap_day,
+            start_time=TEST_START_TIME,
+            end_time=TEST_END_TIME,
+            calendar=self.calendar)
+        with self.assertRaisesMessage(ValidationError, str(overlap_day)):
+            self.calendar.create_event(
+                day=TEST_DAY,
+                start_time=TEST_START_TIME,
+                end_time=TEST_END_TIME,
+                location='test',
+                recurrent=True)
+
+        self.assertEqual(
+            RecurringSeries.objects.filter(calendar=self.calendar).count(), 0,
+            msg="Recurrent event was created")
+
+    def test_create_event_series_overlap(self):
+        """
+        Try to create an event overlapping an occurrence of a recurrent
+        event. Assert exception is raised.
+        """
+        self.calendar.create_event(
+            day=TEST_DAY,
+            start_time=TEST_START_TIME,
+            end_time=TEST_END_TIME,
+            location='test',
+            recurrent=True)
+        with self.assertRaises(ValidationError,
+                               msg="Overlap was not detected"):
+            self.calendar.create_event(
+                day=TEST_DAY + datetime.timedelta(days=7),
+                start_time=TEST_START_TIME,
+                end_time=TEST_END_TIME,
+                location='test')
+
     def test_delete_event(self):
         """
         This test deletes an event.
@@ -155,6 +286,87 @@ class TestCalendar(TestCase):
         self.assertEqual(Event.objects.filter(calendar=self.calendar).count(),
                          0, msg='Failed to delete event')
 
+    def test_delete_event_occurrence(self):
+        """
+        This test deletes one occurrence of a recurrent event.
+        """
+        self.calendar.create_event(
+            day=TEST_DAY,
+            start_time=TEST_START_TIME,
+            end_time=TEST_END_TIME,
+            location='test',
+            recurrent=True)
+        week_later = TEST_DAY + datetime.timedelta(days=7)
+
+        deleted = self.calendar.delete_event(
+            day=week_later, start_time=TEST_START_TIME,
+            end_time=TEST_END_TIME)
+        self.assertEqual(deleted, 1, msg='Occurrence was not counted')
+        days = [event.day for event in self.calendar.get_events_between(
+            TEST_DAY, week_later)]
+        self.assertEqual(days, [TEST_DAY],
+                         msg='Failed to delete event occurrence')
+
+    def test_delete_event_series(self):
+        """
+        This test deletes all the occurrences of a recurrent event.
+        """
+        self.calendar.create_event(
+            day=TEST_DAY,
+            start_time=TEST_START_TIME,
+            end_time=TEST_END_TIME,
+            location='test',
+            recurrent=True)
+
+        self.calendar.delete_event(day=TEST_DAY, start_time=TEST_START_TIME,
+                                   end_time=TEST_END_TIME, all_events=True)
+        self.assertEqual(
+            RecurringSeries.objects.filter(calendar=self.calendar).count(), 0,
+            msg='Failed to delete recurrent event')
+
+    def test_delete_event_all_keeps_past(self):
+        """
+        This test deletes all the recurrences of an event and asserts the
+        past ones are kept.
+        """
+        for weeks in (-2, -1, 0, 1, 2):
+            Event.objects.create(
+                day=TEST_DAY + datetime.timedelta(weeks=weeks),
+                start_time=TEST_START_TIME,
+                end_time=TEST_END_TIME,
+                calendar=self.calendar)
+
+        deleted = self.calendar.delete_event(
+            day=TEST_DAY, start_time=TEST_START_TIME, end_time=TEST_END_TIME,
+            all_events=True)
+        self.assertEqual(deleted, 3, msg='Wrong number of deleted events')
+        self.assertEqual(
+            [event.day for event in Event.objects.order_by('day')],
+            [TEST_DAY - datetime.timedelta(weeks=2),
+             TEST_DAY - datetime.timedelta(weeks=1)],
+            msg='Past events were deleted')
+
+    def test_delete_event_series_keeps_past(self):
+        """
+        This test deletes all the recurrences of a recurrent event started
+        in the past and asserts the past occurrences are kept.
+        """
+        start_day = TEST_DAY - datetime.timedelta(weeks=2)
+        self.calendar.create_event(
+            day=start_day,
+            start_time=TEST_START_TIME,
+            end_time=TEST_END_TIME,
+            location='test',
+            recurrent=True)
+
+        self.calendar.delete_event(day=TEST_DAY, start_time=TEST_START_TIME,
+                                   end_time=TEST_END_TIME, all_events=True)
+        days = [event.day for event in self.calendar.get_events_between(
+            start_day, start_day + datetime.timedelta(days=365))]
+        self.assertEqual(
+            days, [start_day, start_day + datetime.timedelta(weeks=1)],
+            msg='Failed to delete recurrent event from today on')
+
     def test_get_events(self):
         """
         This test get the events from the test Calendar.
@@ -200,6 +412,32 @@ class TestCalendar(TestCase):
             self.calendar.assign_event(self.client.identity_number, event.day,
                                        event.start_time, event.end_time)
 
+    def test_assign_event_occurrence(self):
+        """
+        This test assigns an occurrence of a recurrent event to the test
+        Client and asserts it is stored as an event.
+        """
+        self.calendar.create_event(
+            day=TEST_DAY,
+            start_time=TEST_START_TIME,
+            end_time=TEST_END_TIME,
+            location='test',
+            recurrent=True)
+        week_later = TEST_DAY + datetime.timedelta(days=7)
+
+        self.calendar.assign_event(self.client.identity_number, week_later,
+                                   TEST_START_TIME, TEST_END_TIME)
+        event = Event.objects.get(client=self.client)
+        self.assertEqual(event.day, week_later, msg="Event was not assigned")
+        events = self.calendar.get_events_between(week_later, week_later)
+        self.assertEqual(events, [event],
+                         msg="Assigned occurrence is still expanded")
+        with self.assertRaises(ValidationError,
+                               msg='An event cannot be assigned twice'):
+            self.calendar.assign_event(self.client.identity_number,
+                                       week_later, TEST_START_TIME,
+                                       TEST_END_TIME)
+
     def test_free_event(self):
         """
         This test frees an event.
@@ -217,3 +455,370 @@ class TestCalendar(TestCase):
         event.refresh_from_db()
         self.assertEqual(event.free, True, msg=msg)
         self.assertEqual(event.client, None, msg=msg)
+
+    def test_assign_events(self):
+        """
+        This test assigns an event, a series occurrence and a missing slot
+        at once, and asserts the first two are taken by the client.
+        """
+        week_later = TEST_DAY + datetime.timedelta(days=7)
+        Event.objects.create(
+            day=TEST_DAY,
+            start_time=TEST_START_TIME,
+            end_time=TEST_END_TIME,
+            calendar=self.calendar)
+        series = RecurringSeries.objects.create(
+            calendar=self.calendar,
+            week_day=TEST_DAY.weekday(),
+            start_date=week_later,
+            end_date=week_later + datetime.timedelta(days=28),
+            start_time=TEST_START_TIME,
+            end_time=TEST_END_TIME)
+
+        statuses = self.calendar.assign_events(
+            TEST_ID_NUMBER,
+            [(TEST_DAY, TEST_START_TIME, TEST_END_TIME),
+             (week_later, TEST_START_TIME, TEST_END_TIME),
+             (week_later, TEST_END_TIME, datetime.time(1, 0))])
+
+        self.assertEqual(statuses, ['ok', 'ok', 'not_found'],
+                         msg="Wrong statuses")
+        self.assertEqual(
+            Event.objects.filter(client=self.client, free=False).count(), 2,
+            msg="Events were not assigned")
+        series.refresh_from_db()
+        self.assertEqual(series.skipped_days, [week_later.isoformat()],
+                         msg="Occurrence was not stored")
+
+    def test_assign_events_repeated(self):
+        """
+        This test assigns the same event and the same series occurrence
+        twice in one batch, and asserts only the first copies are reported
+        as taken by the client.
+        """
+        week_later = TEST_DAY + datetime.timedelta(days=7)
+        Event.objects.create(
+            day=TEST_DAY,
+            start_time=TEST_START_TIME,
+            end_time=TEST_END_TIME,
+            calendar=self.calendar)
+        RecurringSeries.objects.create(
+            calendar=self.calendar,
+            week_day=TEST_DAY.weekday(),
+            start_date=week_later,
+            end_date=week_later + datetime.timedelta(days=28),
+            start_time=TEST_START_TIME,
+            end_time=TEST_END_TIME)
+        event = (TEST_DAY, TEST_START_TIME, TEST_END_TIME)
+        occurrence = (week_later, TEST_START_TIME, TEST_END_TIME)
+
+        statuses = self.calendar.assign_events(
+            TEST_ID_NUMBER, [event, occurrence, event, occurrence])
+
+        self.assertEqual(statuses, ['ok', 'ok', 'taken', 'taken'],
+                         msg="Repeated slots were reported as taken twice")
+        self.assertEqual(
+            Event.objects.filter(client=self.client, free=False).count(), 2,
+            msg="Events were not assigned once")
+
+    def test_free_events_atomic(self):
+        """
+        This test frees a taken and a free event all or nothing, and asserts
+        the taken one is kept.
+        """
+        Event.objects.create(
+            day=TEST_DAY,
+            start_time=TEST_START_TIME,
+            end_time=TEST_END_TIME,
+            free=False,
+            client=self.client,
+            calendar=self.calendar)
+        Event.objects.create(
+            day=TEST_DAY,
+            start_time=TEST_END_TIME,
+            end_time=datetime.time(1, 0),
+            calendar=self.calendar)
+
+        statuses = self.calendar.free_events(
+            [(TEST_DAY, TEST_START_TIME, TEST_END_TIME),
+             (TEST_DAY, TEST_END_TIME, datetime.time(1, 0))],
+            atomic=True)
+
+        self.assertEqual(statuses, ['rolled_back', 'free'],
+                         msg="Wrong statuses")
+        self.assertTrue(
+            Event.objects.filter(client=self.client, free=False).exists(),
+            msg="Event was freed")
+
+    def test_version(self):
+        """
+        This test asserts every change of the calendar's events bumps its
+        version.
+        """
+        versions = [self.calendar.version]
+
+        def assert_bumped(msg):
+            self.calendar.refresh_from_db()
+            self.assertGreater(self.calendar.version, versions[-1], msg=msg)
+            versions.append(self.calendar.version)
+
+        self.calendar.create_event(TEST_DAY, TEST_START_TIME, TEST_END_TIME,
+                                   'test')
+        assert_bumped('Creating an event did not bump the version')
+        self.calendar.assign_event(self.client.identity_number, TEST_DAY,
+                                   TEST_START_TIME, TEST_END_TIME)
+        assert_bumped('Assigning an event did not bump the version')
+        self.calendar.free_event(TEST_DAY, TEST_START_TIME, TEST_END_TIME)
+        assert_bumped('Freeing an event did not bump the version')
+        self.calendar.delete_event(TEST_DAY, TEST_START_TIME, TEST_END_TIME)
+        assert_bumped('Deleting an event did not bump the version')
+
+
+class TestWeeklyTemplate(TestCase):
+    """
+    This class implements all the unit tests for the WeeklyTemplate Model
+    Class
+    """
+
+    def setUp(self):
+        """
+        The setUp creates a test Owner, a test Calendar and a template with
+        two slots from monday to friday of one week.
+        """
+        self.owner = Owner.objects.create(
+            email="test@test.com",
+            password="test",
+            first_name="test",
+            last_name="test",
+            identity_number=TEST_ID_NUMBER)
+        self.calendar = Calendar.objects.create(
+            summary="test calendar",
+            owner=self.owner)
+        self.monday = datetime.date(2100, 1, 4)
+        self.template = WeeklyTemplate(
+            calendar=self.calendar,
+            week_days=[0, 1, 2, 3, 4],
+            opening_time=datetime.time(9, 0),
+            closing_time=datetime.time(12, 0),
+            slot_minutes=60,
+            breaks=[['10:30', '11:00']],
+            start_date=self.monday,
+            end_date=self.monday + datetime.timedelta(days=6),
+            location='test')
+
+    def tearDown(self):
+        """
+        The tearDown deletes the test Owner.
+        """
+        self.owner.delete()
+
+    def test_slots(self):
+        """
+        This test asserts the slots skip the weekend and move after breaks.
+        """
+        slots = self.template.slots()
+
+        self.assertEqual(len(slots), 10, msg="Wrong number of slots")
+        self.assertEqual(
+            slots[:2],
+            [(self.monday, datetime.time(9, 0), datetime.time(10, 0)),
+             (self.monday, datetime.time(11, 0), datetime.time(12, 0))],
+            msg="Slots do not skip the break")
+
+    def test_clean(self):
+        """
+        This test asserts invalid hours and dates are rejected.
+        """
+        self.template.closing_time = datetime.time(8, 0)
+        with self.assertRaises(ValidationError,
+                               msg="Closing time error not detected"):
+            self.template.clean()
+        self.template.closing_time = datetime.time(12, 0)
+        self.template.slot_minutes = -30
+        with self.assertRaises(ValidationError,
+                               msg="Negative slot length not detected"):
+            self.template.clean()
+        self.template.slot_minutes = 4 * 60
+        with self.assertRaises(ValidationError,
+                               msg="Slot longer than the hours not detected"):
+            self.template.clean()
+        self.template.slot_minutes = 60
+        self.template.end_date = self.monday - datetime.timedelta(days=1)
+        with self.assertRaises(ValidationError,
+                               msg="Date range error not detected"):
+            self.template.clean()
+
+    def test_create_slots(self):
+        """
+        This test creates the slots of the template and asserts the ones
+        overlapping an event or a series are skipped.
+        """
+        Event.objects.create(
+            day=self.monday,
+            start_time=datetime.time(9, 30),
+            end_time=datetime.time(10, 0),
+            calendar=self.calendar)
+        RecurringSeries.objects.create(
+            calendar=self.calendar,
+            week_day=1,
+            start_date=self.monday,
+            end_date=self.monday + datetime.timedelta(days=364),
+            start_time=datetime.time(11, 30),
+            end_time=datetime.time(13, 0))
+
+        with self.assertNumQueries(9):
+            events, skipped = self.calendar.create_slots(
+                self.template.slots(), self.template.location)
+
+        self.assertEqual(len(events), 8, msg="Wrong number of slots created")
+        self.assertEqual(
+            skipped,
+            [(self.monday, datetime.time(9, 0), datetime.time(10, 0)),
+             (self.monday + datetime.timedelta(days=1),
+              datetime.time(11, 0), datetime.time(12, 0))],
+            msg="Overlapping slots were not skipped")
+        self.assertEqual(Event.objects.filter(calendar=self.calendar).count(),
+                         9, msg="Slots were not stored")
+
+    def test_create_slots_overlapping_slots(self):
+        """
+        This test creates overlapping slots and asserts the earlier one of
+        each overlap is kept.
+        """
+        slots = [(self.monday, datetime.time(10, 0), datetime.time(11, 0)),
+                 (self.monday, datetime.time(9, 30), datetime.time(10, 30)),
+                 (self.monday, datetime.time(9, 0), datetime.time(10, 0))]
+
+        events, skipped = self.calendar.create_slots(slots, 'test')
+
+        self.assertEqual(
+            [event.start_time for event in events],
+            [datetime.time(9, 0), datetime.time(10, 0)],
+            msg="Wrong slots created")
+        self.assertEqual(skipped, [slots[1]],
+                         msg="Overlapping slot was not skipped")
+
+    def test_create_slots_busy_overlapping_slots(self):
+        """
+        This test creates a slot overlapping both an event and a later slot
+        and asserts the later slot is created, as only the event takes its
+        time.
+        """
+        Event.objects.create(
+            day=self.monday,
+            start_time=datetime.time(9, 50),
+            end_time=datetime.time(10, 10),
+            calendar=self.calendar)
+        slots = [(self.monday, datetime.time(9, 0), datetime.time(10, 0)),
+                 (self.monday, datetime.time(9, 30), datetime.time(9, 40))]
+
+        events, skipped = self.calendar.create_slots(slots, 'test')
+
+        self.assertEqual([event.start_time for event in events],
+                         [datetime.time(9, 30)], msg="Wrong slots created")
+        self.assertEqual(skipped, [slots[0]],
+                         msg="Free slot was skipped")
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class TestCalendarConcurrency(TransactionTestCase):
+    """
+    This class implements the concurrency tests for the Calendar Model Class.
+    They need a database with row level locking, SQLite raises table locked
+    errors on concurrent writers instead.
+    """
+
+    def setUp(self):
+        """
+        The setUp creates a test Calendar, a test Owner and many test
+        Clients.
+        """
+        self.owner = Owner.objects.create(
+            email="test@test.com",
+            password="test",
+            first_name="test",
+            last_name="test",
+            identity_number=TEST_ID_NUMBER)
+        self.calendar = Calendar.objects.create(
+            summary="test calendar",
+            owner=self.owner)
+        self.clients = [Client.objects.create(
+            email="test{}@test.com".format(number),
+            password="testPass",
+            first_name="test",
+            last_name="test",
+            identity_number=int(TEST_ID_NUMBER) + number)
+            for number in range(TEST_CONCURRENT_CLIENTS)]
+
+    def _book_concurrently(self, day):
+        """
+        Book the same event from one thread per test Client at the same
+        time.
+
+        Returns(list): the result of every thread, True for a booking and
+        the raised exception otherwise.
+        """
+        barrier = threading.Barrier(len(self.clients))
+        results = []
+
+        def book(client):
+            try:
+                barrier.wait()
+                self.calendar.assign_event(client.identity_number, day,
+                                           TEST_START_TIME, TEST_END_TIME)
+                results.append(True)
+            except Exception as err:
+                results.append(err)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=book, args=(client,))
+                   for client in self.clients]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def assertSingleWinner(self, results):
+        """
+        Assert exactly one thread booked the event and every other one got
+        an EventTakenError.
+        """
+        self.assertEqual(results.count(True), 1,
+                         msg="Event was assigned {} times".format(
+                             results.count(True)))
+        errors = [result for result in results if result is not True]
+        for error in errors:
+            self.assertIsInstance(error, EventTakenError)
+
+    def test_assign_event_concurrently(self):
+        """
+        This test books the same event from many clients at the same time.
+        """
+        Event.objects.create(
+            day=TEST_DAY,
+            start_time=TEST_START_TIME,
+            end_time=TEST_END_TIME,
+            calendar=self.calendar)
+
+        self.assertSingleWinner(self._book_concurrently(TEST_DAY))
+        self.assertEqual(Event.objects.filter(free=False).count(), 1,
+                         msg="Event was assigned more than once")
+
+    def test_assign_event_occurrence_concurrently(self):
+        """
+        This test books the same recurrent event occurrence from many
+        clients at the same time.
+        """
+        self.calendar.create_event(
+            day=TEST_DAY,
+            start_time=TEST_START_TIME,
+            end_time=TEST_END_TIME,
+            location='test',
+            recurrent=True)
+        week_later = TEST_DAY + datetime.timedelta(days=7)
+
+        self.assertSingleWinner(self._book_concurrently(week_later))
+        self.assertEqual(Event.objects.filter(day=week_later).count(), 1,
+                         msg="Occurrence was stored more than once")
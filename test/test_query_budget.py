@@ -0,0 +1,419 @@
+import datetime
+
+from test.query_budget import QueryBudgetMixin
+from web.consts import Feed
+from web.models import Calendar, Client, Event, Owner, RecurringSeries
+
+from django.contrib.auth.hashers import make_password
+from django.core import signing
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+TEST_PASSWORD = 'superSafePass'
+TEST_OWNERS = 20
+TEST_CLIENTS_PER_OWNER = 200
+TEST_DAYS = 365
+TEST_EVENTS_PER_DAY = 6
+TEST_OTHER_EVENTS_PER_DAY = 1
+TEST_FIRST_DAY = datetime.date(2100, 1, 1)
+TEST_DAY = datetime.date(2100, 3, 10)
+TEST_MONTH = 'Marzo'
+TEST_YEAR = 2100
+# Wall time budget of a single request on the seeded dataset.
+MAX_SECONDS = 1
+
+
+class ViewQueryBudgetTest(QueryBudgetMixin, TestCase):
+    """
+    This class pins the number of queries and the wall time of every view
+    on a realistic dataset: many owners, hundreds of clients per owner and
+    thousands of events.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        """
+        Seed the owners, their calendars, clients and events.
+        """
+        password = make_password(TEST_PASSWORD)
+        owners = Owner.objects.bulk_create([
+            Owner(id=int("1{}".format(10000000 + number)),
+                  owner_id=1000 + number,
+                  email='owner{}@test.com'.format(number),
+                  password=password, first_name='owner', last_name='test',
+                  identity_number=10000000 + number)
+            for number in range(TEST_OWNERS)])
+        calendars = Calendar.objects.bulk_create([
+            Calendar(summary='calendar {}'.format(number), owner=owner)
+            for number, owner in enumerate(owners)])
+        clients = Client.objects.bulk_create([
+            Client(id=int("2{}".format(20000000 + number)),
+                   email='client{}@test.com'.format(number),
+                   password=password, first_name='client', last_name='test',
+                   identity_number=20000000 + number)
+            for number in range(TEST_OWNERS * TEST_CLIENTS_PER_OWNER)])
+        cls.user_owner = owners[0]
+        cls.calendar = calendars[0]
+        cls.user_client = clients[0]
+
+        # Every owner has its own clients, and the test client is a client
+        # of all of them.
+        Owner.clients.through.objects.bulk_create(
+            [Owner.clients.through(owner=owner, client=client)
+             for number, owner in enumerate(owners)
+             for client in clients[number * TEST_CLIENTS_PER_OWNER + 1:
+                                   (number + 1) * TEST_CLIENTS_PER_OWNER]] +
+            [Owner.clients.through(owner=owner, client=cls.user_client)
+             for owner in owners])
+
+        events = []
+        booking_clients = iter(clients[1:])
+        for number in range(TEST_DAYS):
+            day = TEST_FIRST_DAY + datetime.timedelta(days=number)
+            for slot in range(TEST_EVENTS_PER_DAY):
+                taken = slot % 2 == 1
+                events.append(Event(
+                    day=day,
+                    start_time=datetime.time(8 + slot, 00),
+                    end_time=datetime.time(8 + slot, 30),
+                    location='test',
+                    free=not taken,
+                    client=next(booking_clients) if taken else None,
+                    calendar=cls.calendar))
+            for calendar in calendars[1:]:
+                for slot in range(TEST_OTHER_EVENTS_PER_DAY):
+                    events.append(Event(
+                        day=day,
+                        start_time=datetime.time(8 + slot, 00),
+                        end_time=datetime.time(8 + slot, 30),
+                        location='test',
+                        calendar=calendar))
+        Event.objects.bulk_create(events)
+        RecurringSeries.objects.create(
+            week_day=TEST_FIRST_DAY.weekday(),
+            start_date=TEST_FIRST_DAY,
+            end_date=TEST_FIRST_DAY + datetime.timedelta(days=364),
+            start_time=datetime.time(18, 00),
+            end_time=datetime.time(18, 30),
+            location='test',
+            calendar=cls.calendar)
+        Event.objects.filter(calendar=cls.calendar, day=TEST_DAY,
+                             start_time=datetime.time(9, 00))\
+            .update(client=cls.user_client)
+
+    def setUp(self):
+        """
+        Start every request with cold caches.
+        """
+        cache.clear()
+
+    def _event_info(self, start_time, end_time):
+        return '{}|{}|{}'.format(TEST_DAY, start_time, end_time)
+
+    def assertViewBudget(self, max_queries, method, url, user=None,
+                         status=200, **kwargs):
+        """
+        Request a view and assert it stays within its query budget.
+        """
+        if user:
+            self.client.force_login(user)
+        with self.assertQueryBudget(max_queries, MAX_SECONDS):
+            response = getattr(self.client, method)(url, **kwargs)
+        self.assertEqual(response.status_code, status)
+        return response
+
+    def _post(self, max_queries, url, user, body, status=200):
+        return self.assertViewBudget(
+            max_queries, 'post', url, user, status=status, data=body,
+            content_type='application/json')
+
+    def test_index(self):
+        """
+        This test checks the query budget of the index view.
+        """
+        self.assertViewBudget(0, 'get', reverse('index'), status=302)
+
+    def test_login_view(self):
+        """
+        This test checks the query budget of the login_view view.
+        """
+        self.assertViewBudget(0, 'get', reverse('login'))
+
+    def test_register_view(self):
+        """
+        This test checks the query budget of the register_view view.
+        """
+        self.assertViewBudget(0, 'get', reverse('register'))
+
+    def test_register_user(self):
+        """
+        This test checks the query budget of the register_user view.
+        """
+        self._post(1, reverse('register_user'), None, {
+            'is_client': True, 'is_owner': False,
+            'email': 'new@test.com', 'password': TEST_PASSWORD,
+            'first_name': 'new', 'last_name': 'test',
+            'identity_number': 30000000})
+
+    def test_login_user(self):
+        """
+        This test checks the query budget of the login_user view.
+        """
+        self._post(9, reverse('login_user'), None, {
+            'is_client': False, 'is_owner': True,
+            'email': self.user_owner.email, 'password': TEST_PASSWORD})
+
+    def test_logout_user(self):
+        """
+        This test checks the query budget of the logout_user view.
+        """
+        self.assertViewBudget(4, 'get', reverse('logout'), self.user_owner,
+                              status=302)
+
+    def test_owner_view(self):
+        """
+        This test checks the query budget of the owner_view view.
+        """
+        self.assertViewBudget(6, 'get', reverse('owner_view'),
+                              self.user_owner)
+
+    def test_owner_clients_view(self):
+        """
+        This test checks the query budget of the owner_clients_view view.
+        """
+        self.assertViewBudget(6, 'get', reverse('owner_clients_view'),
+                              self.user_owner)
+
+    def test_add_owner_client(self):
+        """
+        This test checks the query budget of the add_owner_client view.
+        """
+        self._post(8, reverse('add_owner_client'), self.user_owner, {
+            'email': 'client{}@test.com'.format(TEST_CLIENTS_PER_OWNER),
+            'identity_number': 20000000 + TEST_CLIENTS_PER_OWNER})
+
+    def test_add_owner_clients(self):
+        """
+        This test checks the query budget of the add_owner_clients view
+        adding two thousand clients of other owners.
+        """
+        # SQLite splits the insert to stay under its variable limit.
+        response = self._post(14, reverse('add_owner_clients'),
+                              self.user_owner, {
+            'clients': [{'email': 'client{}@test.com'.format(number),
+                         'identity_number': 20000000 + number}
+                        for number in range(TEST_CLIENTS_PER_OWNER,
+                                            TEST_CLIENTS_PER_OWNER + 2000)]})
+        self.assertEqual(response.json()['added'], 2000)
+
+    def test_delete_owner_client(self):
+        """
+        This test checks the query budget of the delete_owner_client view.
+        """
+        self._post(7, reverse('delete_owner_client'), self.user_owner, {
+            'client_id': 20000001})
+
+    def test_add_owner_calendar(self):
+        """
+        This test checks the query budget of the add_owner_calendar view.
+        """
+        owner = Owner.objects.create(
+            email='new@test.com', password=TEST_PASSWORD, first_name='new',
+            last_name='test', identity_number=30000000)
+        self._post(8, reverse('add_owner_calendar'), owner,
+                   {'summary': 'new calendar'})
+
+    def test_available_events_view(self):
+        """
+        This test checks the query budget of the available_events_view view.
+        """
+        self.assertViewBudget(
+            10, 'get', reverse('available_events_view'), self.user_owner,
+            data={'month_filter': TEST_MONTH, 'year_filter': TEST_YEAR})
+
+    def test_taken_events_view(self):
+        """
+        This test checks the query budget of the taken_events_view view.
+        """
+        self.assertViewBudget(
+            7, 'get', reverse('taken_events_view'), self.user_owner,
+            data={'month_filter': TEST_MONTH, 'year_filter': TEST_YEAR})
+
+    def test_add_event(self):
+        """
+        This test checks the query budget of the add_event view.
+        """
+        self._post(17, reverse('add_event'), self.user_owner, {
+            'day': str(TEST_DAY), 'start_time': '20:00',
+            'end_time': '20:30', 'location_name': 'test',
+            'recurrent': False})
+
+    def test_add_event_recurrent(self):
+        """
+        This test checks the query budget of the add_event view
+        adding a recurrent event.
+        """
+        self._post(15, reverse('add_event'), self.user_owner, {
+            'day': str(TEST_DAY), 'start_time': '20:00',
+            'end_time': '20:30', 'location_name': 'test',
+            'recurrent': True})
+
+    def test_add_weekly_template(self):
+        """
+        This test checks the query budget of the add_weekly_template view
+        creating two weeks of slots.
+        """
+        self._post(18, reverse('add_weekly_template'), self.user_owner, {
+            'week_days': [0, 1, 2, 3, 4], 'opening_time': '20:00',
+            'closing_time': '23:00', 'slot_minutes': 30,
+            'start_date': str(TEST_DAY),
+            'end_date': str(TEST_DAY + datetime.timedelta(days=13)),
+            'location_name': 'test'})
+
+    def test_import_events(self):
+        """
+        This test checks the query budget of the import_events view
+        importing a thousand slots.
+        """
+        rows = ''.join(
+            '{},20:{:02d},20:{:02d},test\n'.format(
+                TEST_DAY + datetime.timedelta(days=number // 20),
+                number % 20 * 3, number % 20 * 3 + 2)
+            for number in range(1000))
+        # SQLite splits each insert to stay under its variable limit.
+        self.assertViewBudget(
+            24, 'post', reverse('import_events'), self.user_owner,
+            data={'file': SimpleUploadedFile(
+                'slots.csv',
+                ('day,start_time,end_time,location\n' + rows).encode())})
+
+    def test_delete_event(self):
+        """
+        This test checks the query budget of the delete_event view.
+        """
+        self._post(13, reverse('delete_event'), self.user_owner, {
+            'event_info': self._event_info('08:00:00', '08:30:00'),
+            'all': False})
+
+    def test_delete_event_all(self):
+        """
+        This test checks the query budget of the delete_event view
+        deleting every occurrence.
+        """
+        self._post(16, reverse('delete_event'), self.user_owner, {
+            'event_info': self._event_info('08:00:00', '08:30:00'),
+            'all': True})
+
+    def test_cancel_event_owner(self):
+        """
+        This test checks the query budget of the cancel_event view
+        called by the owner.
+        """
+        self._post(13, reverse('cancel_event'), self.user_owner, {
+            'event_info': self._event_info('09:00:00', '09:30:00')})
+
+    def test_cancel_event_client(self):
+        """
+        This test checks the query budget of the cancel_event view
+        called by a client.
+        """
+        self._post(13, reverse('cancel_event'), self.user_client, {
+            'event_info': self._event_info('09:00:00', '09:30:00'),
+            'calendar': self.calendar.id})
+
+    def test_client_view(self):
+        """
+        This test checks the query budget of the client_view view.
+        """
+        self.assertViewBudget(5, 'get', reverse('client_view'),
+                              self.user_client)
+
+    def test_schedule_event_view(self):
+        """
+        This test checks the query budget of the schedule_event_view view.
+        """
+        self.assertViewBudget(
+            10, 'get', reverse('schedule_event_view'), self.user_client,
+            data={'month_filter': TEST_MONTH, 'year_filter': TEST_YEAR,
+                  'calendar_filter': 'calendar 0 | owner test'})
+
+    def test_scheduled_event_view(self):
+        """
+        This test checks the query budget of the scheduled_event_view view.
+        """
+        self.assertViewBudget(7, 'get', reverse('scheduled_event_view'),
+                              self.user_client)
+
+    def test_schedule_event(self):
+        """
+        This test checks the query budget of the schedule_event view.
+        """
+        self._post(13, reverse('schedule_event'), self.user_client, {
+            'event_info': self._event_info('08:00:00', '08:30:00'),
+            'calendar': self.calendar.id})
+
+    def test_schedule_events(self):
+        """
+        This test checks the query budget of the schedule_events view
+        booking two free events and a slot not stored as an event.
+        """
+        self._post(15, reverse('schedule_events'), self.user_client, {
+            'event_infos': [self._event_info('08:00:00', '08:30:00'),
+                            self._event_info('10:00:00', '10:30:00'),
+                            self._event_info('18:00:00', '18:30:00')],
+            'calendar': self.calendar.id})
+
+    def test_cancel_events(self):
+        """
+        This test checks the query budget of the cancel_events view
+        called by the owner.
+        """
+        self._post(13, reverse('cancel_events'), self.user_owner, {
+            'event_infos': [self._event_info('09:00:00', '09:30:00'),
+                            self._event_info('11:00:00', '11:30:00')]})
+
+    def test_feed(self):
+        """
+        This test checks the query budget of the feed view streaming a
+        year of the calendar.
+        """
+        token = signing.dumps(
+            ['calendar', self.calendar.pk, self.calendar.feed_secret],
+            salt=Feed.SALT)
+        with self.assertQueryBudget(5, MAX_SECONDS):
+            response = self.client.get(reverse('feed', args=[token]), {
+                'from': str(TEST_FIRST_DAY),
+                'to': str(TEST_FIRST_DAY + datetime.timedelta(days=364))})
+            content = b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(content.count(b'BEGIN:VEVENT'),
+                         TEST_DAYS * TEST_EVENTS_PER_DAY + 1)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics(self):
+        """
+        This test checks the query budget of the metrics view.
+        """
+        self.assertViewBudget(0, 'get', reverse('metrics'),
+                              HTTP_AUTHORIZATION='Bearer secret')
+
+    def test_events_api(self):
+        """
+        This test checks the query budget of the events_api view.
+        """
+        self.assertViewBudget(
+            9, 'get', reverse('events_api'), self.user_owner,
+            data={'from': str(TEST_FIRST_DAY), 'to': '2100-12-31',
+                  'after': '{}|08:00:00|0'.format(TEST_DAY)})
+
+    def test_events_api_client(self):
+        """
+        This test checks the query budget of the events_api view called by
+        a client.
+        """
+        self.assertViewBudget(
+            9, 'get', reverse('events_api'), self.user_client,
+            data={'from': str(TEST_FIRST_DAY), 'to': '2100-12-31',
+                  'calendar': self.calendar.id, 'status': 'free'})
@@ -0,0 +1,186 @@
+import datetime
+import re
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from web.helpers import user_helper
+from web.models import Calendar, Client, Event, Owner, RecurringSeries
+
+TEST_ID_NUMBER = 12345678
+TEST_DAY = datetime.date(2100, 1, 4)
+TEST_START_TIME = datetime.time(8, 00, 00)
+TEST_END_TIME = datetime.time(8, 30, 00)
+SEED_CALENDARS = 5
+SEED_DAYS = 200
+SEED_EVENTS_PER_DAY = 4
+SEED_SERIES_PER_DAY = 4
+WATCHED_TABLES = ('web_event', 'web_recurringseries')
+SEQUENTIAL_SCAN = {
+    'sqlite': re.compile(r'\bSCAN (?:TABLE )?"?(\w+)"?'),
+    'postgresql': re.compile(r'Seq Scan on "?(\w+)"?'),
+}
+
+
+class TestEventQueryPlans(TestCase):
+    """
+    This class runs the Event hot queries against a seeded dataset and
+    asserts the database serves them from an index.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        """
+        Seed several calendars with a few months of events and weekly
+        series.
+        """
+        calendars = []
+        for number in range(SEED_CALENDARS):
+            owner = Owner.objects.create(
+                email="owner{}@test.com".format(number),
+                password="test",
+                first_name="test",
+                last_name="test",
+                identity_number=TEST_ID_NUMBER + number)
+            calendars.append(Calendar.objects.create(
+                summary="calendar {}".format(number), owner=owner))
+        cls.calendar = calendars[0]
+        cls.client_user = Client.objects.create(
+            email="client@test.com",
+            password="test",
+            first_name="test",
+            last_name="test",
+            identity_number=TEST_ID_NUMBER)
+
+        events = []
+        for calendar in calendars:
+            for day_number in range(SEED_DAYS):
+                day = TEST_DAY + datetime.timedelta(days=day_number)
+                for slot in range(SEED_EVENTS_PER_DAY):
+                    events.append(Event(
+                        day=day,
+                        start_time=datetime.time(9 + slot, 00, 00),
+                        end_time=datetime.time(9 + slot, 30, 00),
+                        location='test',
+                        free=slot % 2 == 0,
+                        calendar=calendar))
+        Event.objects.bulk_create(events)
+        RecurringSeries.objects.bulk_create([
+            RecurringSeries(
+                week_day=week_day,
+                start_date=TEST_DAY + datetime.timedelta(days=week_day),
+                end_date=TEST_DAY + datetime.timedelta(days=364),
+                start_time=datetime.time(14 + slot, 00, 00),
+                end_time=datetime.time(14 + slot, 30, 00),
+                location='test',
+                calendar=calendar)
+            for calendar in calendars[1:]
+            for week_day in range(7)
+            for slot in range(SEED_SERIES_PER_DAY)])
+        cls.calendar.create_event(TEST_DAY, TEST_START_TIME, TEST_END_TIME,
+                                  'test', recurrent=True)
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def setUp(self):
+        """
+        Make the planner pick an index whenever one can serve the query.
+        """
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+
+    def assertIndexedQueries(self, function, *args, **kwargs):
+        """
+        Run function and assert none of the queries it runs on the watched
+        tables falls back to a sequential scan.
+        """
+        with CaptureQueriesContext(connection) as context:
+            function(*args, **kwargs)
+
+        statements = [query['sql'] for query in context.captured_queries
+                      if query['sql'].startswith(('SELECT', 'UPDATE',
+                                                  'DELETE'))
+                      and any(table in query['sql']
+                              for table in WATCHED_TABLES)]
+        self.assertTrue(statements, msg="No watched query was run")
+        for sql in statements:
+            plan = self._explain(sql)
+            scans = [table for table in
+                     SEQUENTIAL_SCAN[connection.vendor].findall(plan)
+                     if table in WATCHED_TABLES]
+            self.assertFalse(
+                scans,
+                msg="Sequential scan on {}:\n{}\n{}".format(scans, sql, plan))
+
+    def _explain(self, sql):
+        """
+        Get the query plan of an already interpolated sql statement.
+        """
+        prefix = "EXPLAIN QUERY PLAN " if connection.vendor == 'sqlite' \
+            else "EXPLAIN "
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql)
+            return "\n".join(" ".join(str(column) for column in row)
+                             for row in cursor.fetchall())
+
+    def test_owner_month_events(self):
+        """
+        The owner month view query.
+        """
+        self.assertIndexedQueries(
+            lambda: list(user_helper.get_client_events(
+                self.calendar, month_filter=2, year_filter=2100)))
+
+    def test_owner_month_taken_events(self):
+        """
+        The owner taken events month view query.
+        """
+        self.assertIndexedQueries(
+            lambda: list(user_helper.get_client_events(
+                self.calendar, month_filter=2, year_filter=2100,
+                free=False)))
+
+    def test_create_event_overlap_check(self):
+        """
+        The overlap check run before adding an event.
+        """
+        self.assertIndexedQueries(
+            self.calendar.create_event,
+            TEST_DAY, datetime.time(20, 00, 00), datetime.time(21, 00, 00),
+            'test')
+
+    def test_assign_event(self):
+        """
+        The slot lookup run when a client books an event.
+        """
+        self.assertIndexedQueries(
+            self.calendar.assign_event, self.client_user.identity_number,
+            TEST_DAY, datetime.time(9, 00, 00), datetime.time(9, 30, 00))
+
+    def test_free_event(self):
+        """
+        The slot lookup run when an event is cancelled.
+        """
+        self.assertIndexedQueries(
+            self.calendar.free_event,
+            TEST_DAY, datetime.time(10, 00, 00), datetime.time(10, 30, 00))
+
+    def test_delete_event(self):
+        """
+        The slot lookup run when one event is deleted.
+        """
+        self.assertIndexedQueries(
+            self.calendar.delete_event,
+            TEST_DAY, datetime.time(9, 00, 00), datetime.time(9, 30, 00))
+
+    def test_delete_event_all(self):
+        """
+        The recurrences lookup run when all the recurrences of an event are
+        deleted.
+        """
+        self.assertIndexedQueries(
+            self.calendar.delete_event,
+            TEST_DAY, datetime.time(9, 00, 00), datetime.time(9, 30, 00),
+            all_events=True)
@@ -0,0 +1,219 @@
+import asyncio
+import datetime
+import threading
+import time
+from unittest import mock
+
+from assistant import asgi
+from assistant.asgi import application
+from web.consts import Feed, PubSub
+from web.models import Calendar, Client, Owner
+from web.pubsub import LocalBackend
+
+from asgiref.sync import sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from asgiref.wsgi import WsgiToAsgi
+from django.conf import settings
+from django.test import SimpleTestCase, TransactionTestCase
+
+TEST_ID = 12345678
+TEST_DAY = datetime.date(2100, 1, 1)
+TEST_START_TIME = datetime.time(15, 30)
+TEST_END_TIME = datetime.time(16, 30)
+
+
+class LocalBackendTest(SimpleTestCase):
+    """
+    This class implements all the unit tests for the local pub/sub backend.
+    """
+
+    async def test_publish(self):
+        """
+        This test publishes from another thread to a subscriber.
+        """
+        backend = LocalBackend()
+        subscription = backend.subscribe(['a', 'b'])
+        thread = threading.Thread(target=backend.publish,
+                                  args=('b', {'type': 'taken'}))
+        thread.start()
+        thread.join()
+        self.assertEqual(await subscription.get(1), {'type': 'taken'},
+                         msg='Message was not delivered')
+        backend.publish('c', {'type': 'taken'})
+        self.assertIsNone(await subscription.get(0.1),
+                          msg='Message of another channel was delivered')
+
+    async def test_unsubscribe(self):
+        """
+        This test asserts closed subscriptions get no messages.
+        """
+        backend = LocalBackend()
+        subscription = backend.subscribe(['a'])
+        subscription.close()
+        backend.publish('a', {'type': 'taken'})
+        await asyncio.sleep(0)
+        self.assertTrue(subscription.queue.empty(),
+                        msg='Closed subscription got a message')
+
+    async def test_overflow(self):
+        """
+        This test asserts a slow subscriber drops messages and is told so.
+        """
+        backend = LocalBackend()
+        subscription = backend.subscribe(['a'])
+        for number in range(subscription.queue.maxsize + 1):
+            backend.publish('a', {'type': 'taken'})
+        await asyncio.sleep(0)
+        self.assertTrue(subscription.overflow, msg='Overflow was not set')
+
+
+class FeedsApplicationTest(SimpleTestCase):
+    """
+    This class implements all the tests for the routing of feeds.
+    """
+
+    async def test_concurrent_feeds(self):
+        """
+        This test gets two slow feeds at once and asserts they are written
+        at the same time, each in its own thread.
+        """
+        delay = 0.5
+
+        def slow_feed(environ, start_response):
+            start_response('200 OK', [('Content-Type', 'text/calendar')])
+            time.sleep(delay)
+            return [b'BEGIN:VCALENDAR\r\n']
+
+        scope = {'type': 'http', 'asgi': {'version': '3.0'},
+                 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+                 'path': Feed.PATH + 'token/', 'root_path': '',
+                 'query_string': b'', 'headers': [],
+                 'server': ('testserver', 80)}
+        started = time.monotonic()
+        with mock.patch.object(asgi, 'feeds_application',
+                               WsgiToAsgi(slow_feed)):
+            communicators = [ApplicationCommunicator(application, scope)
+                             for _ in range(2)]
+            for communicator in communicators:
+                await communicator.send_input({'type': 'http.request'})
+            for communicator in communicators:
+                start = await communicator.receive_output(5)
+                self.assertEqual(start['status'], 200)
+                await communicator.wait(5)
+        self.assertLess(time.monotonic() - started, delay * 1.8,
+                        msg='Feeds were written one after another')
+
+
+class SlotsStreamTest(TransactionTestCase):
+    """
+    This class implements all the tests for the slots stream. The stream
+    authorizes its user in a thread of its own, so the test data has to be
+    committed.
+    """
+
+    def setUp(self):
+        """
+        Creates an owner, a client and a calendar with one event.
+        """
+        self.user_owner = Owner.objects.create(
+            email='owner@test.com', password='test', first_name='test',
+            last_name='test', identity_number=TEST_ID)
+        self.user_client = Client.objects.create(
+            email='client@test.com', password='test', first_name='test',
+            last_name='test', identity_number=TEST_ID)
+        self.user_owner.clients.add(self.user_client)
+        self.calendar = Calendar.objects.create(summary='test',
+                                                owner=self.user_owner)
+        self.calendar.create_event(TEST_DAY, TEST_START_TIME, TEST_END_TIME,
+                                   'test')
+
+    def _scope(self, user=None, month=TEST_DAY.month):
+        headers = []
+        if user:
+            self.client.force_login(user)
+            headers.append((b'cookie', '{}={}'.format(
+                settings.SESSION_COOKIE_NAME,
+                self.client.cookies[settings.SESSION_COOKIE_NAME].value)
+                .encode()))
+        return {
+            'type': 'http', 'asgi': {'version': '3.0'},
+            'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+            'path': PubSub.STREAM_PATH, 'root_path': '',
+            'query_string': 'calendar={}&year={}&month={}'.format(
+                self.calendar.id, TEST_DAY.year, month).encode(),
+            'headers': headers, 'server': ('testserver', 80),
+        }
+
+    def _assign_event(self):
+        # Out of a transaction, the change is published right away.
+        self.calendar.assign_event(TEST_ID, TEST_DAY, TEST_START_TIME,
+                                   TEST_END_TIME)
+
+    async def test_stream(self):
+        """
+        This test follows a month and gets the event taken on it.
+        """
+        scope = await sync_to_async(self._scope)(self.user_client)
+        communicator = ApplicationCommunicator(application, scope)
+        await communicator.send_input({'type': 'http.request'})
+        start = await communicator.receive_output(5)
+        self.assertEqual(start['status'], 200, msg='Stream was not opened')
+
+        await sync_to_async(self._assign_event)()
+        message = await communicator.receive_output(5)
+        self.assertEqual(
+            message['body'],
+            b'event: taken\ndata: {"type": "taken", "event_info": '
+            b'"2100-01-01|15:30:00.000000|16:30:00.000000"}\n\n',
+            msg='Taken event was not streamed')
+
+        await communicator.send_input({'type': 'http.disconnect'})
+        end = await communicator.receive_output(5)
+        self.assertFalse(end.get('more_body'), msg='Stream was not closed')
+        await communicator.wait(5)
+
+    async def test_stream_busy_thread(self):
+        """
+        This test opens a stream while the thread shared by sync code is
+        busy and asserts the stream does not wait for it.
+        """
+        scope = await sync_to_async(self._scope)(self.user_client)
+        busy = asyncio.ensure_future(sync_to_async(time.sleep)(1))
+        await asyncio.sleep(0.1)
+        started = time.monotonic()
+        communicator = ApplicationCommunicator(application, scope)
+        await communicator.send_input({'type': 'http.request'})
+        start = await communicator.receive_output(5)
+        self.assertLess(time.monotonic() - started, 0.5,
+                        msg='Stream waited for the shared thread')
+        self.assertEqual(start['status'], 200)
+        await communicator.send_input({'type': 'http.disconnect'})
+        await communicator.receive_output(5)
+        await communicator.wait(5)
+        await busy
+
+    async def test_stream_other_month(self):
+        """
+        This test asserts changes of other months are not streamed.
+        """
+        scope = await sync_to_async(self._scope)(self.user_client,
+                                                 month=TEST_DAY.month + 1)
+        communicator = ApplicationCommunicator(application, scope)
+        await communicator.send_input({'type': 'http.request'})
+        await communicator.receive_output(5)
+        await sync_to_async(self._assign_event)()
+        self.assertTrue(await communicator.receive_nothing(0.2),
+                        msg='Change of another month was streamed')
+        await communicator.send_input({'type': 'http.disconnect'})
+        await communicator.receive_output(5)
+        await communicator.wait(5)
+
+    async def test_stream_anonymous(self):
+        """
+        This test asserts anonymous users can not follow a calendar.
+        """
+        communicator = ApplicationCommunicator(application, self._scope())
+        await communicator.send_input({'type': 'http.request'})
+        start = await communicator.receive_output(5)
+        self.assertEqual(start['status'], 403,
+                         msg='Anonymous user followed a calendar')
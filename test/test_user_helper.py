@@ -0,0 +1,302 @@
+import datetime
+import threading
+import time
+
+from web.helpers import cache_helper, user_helper
+from web.models import Calendar, Client, Owner
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+
+TEST_ID = 12345678
+TEST_OWNERS = 5
+TEST_DAY = datetime.date(2100, 3, 10)
+TEST_START_TIME = datetime.time(15, 30)
+TEST_END_TIME = datetime.time(16, 30)
+
+
+class GetClientCalendarsTest(TestCase):
+    """
+    This class implements all the unit tests for the get_client_calendars
+    helper.
+    """
+
+    def setUp(self):
+        """
+        Creates a client and several owners with their calendars, only some
+        of them having the client.
+        """
+        self.user_client = Client.objects.create(
+            email='client@test.com', password='test', first_name='test',
+            last_name='test', identity_number=TEST_ID)
+        self.calendars = []
+        for number in range(TEST_OWNERS):
+            owner = Owner.objects.create(
+                email='owner{}@test.com'.format(number), password='test',
+                first_name='test', last_name='test',
+                identity_number=TEST_ID + number)
+            calendar = Calendar.objects.create(
+                summary='calendar {}'.format(number), owner=owner)
+            if number % 2 == 0:
+                owner.clients.add(self.user_client)
+                self.calendars.append(calendar)
+
+    def test_get_client_calendars(self):
+        """
+        This test gets the client calendars with a single query on a cold
+        cache.
+        """
+        with self.assertNumQueries(1):
+            calendars = user_helper.get_client_calendars(self.user_client)
+            owners = [calendar.owner for calendar in calendars]
+        self.assertEqual(calendars, self.calendars,
+                         msg='Wrong client calendars')
+        self.assertEqual(len(owners), len(self.calendars))
+
+    def test_get_client_calendars_id(self):
+        """
+        This test gets one of the client calendars by id.
+        """
+        calendar = self.calendars[1]
+        self.assertEqual(
+            user_helper.get_client_calendars(self.user_client,
+                                             id=calendar.id),
+            [calendar], msg='Wrong client calendar')
+
+    def test_get_client_calendars_other_owner(self):
+        """
+        This test asserts a calendar of an owner without the client is not
+        returned.
+        """
+        calendar = Calendar.objects.exclude(
+            id__in=[calendar.id for calendar in self.calendars]).first()
+        self.assertEqual(
+            user_helper.get_client_calendars(self.user_client,
+                                             id=calendar.id),
+            [], msg='Calendar of another owner was returned')
+
+    def test_get_client_calendars_cached(self):
+        """
+        This test gets the client calendars twice and asserts the second
+        time does not query the database.
+        """
+        calendars = user_helper.get_client_calendars(self.user_client)
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                user_helper.get_client_calendars(self.user_client),
+                calendars, msg='Wrong cached client calendars')
+            user_helper.get_client_calendars(self.user_client,
+                                             id=calendars[0].id)
+
+    def test_add_client_invalidates_cache(self):
+        """
+        This test adds the client to another owner and asserts the cached
+        calendars are refreshed.
+        """
+        user_helper.get_client_calendars(self.user_client)
+        calendar = Calendar.objects.exclude(
+            id__in=[calendar.id for calendar in self.calendars]).first()
+        calendar.owner.add_client(self.user_client)
+        self.assertIn(calendar,
+                      user_helper.get_client_calendars(self.user_client),
+                      msg='Cached calendars were not invalidated')
+
+    def test_delete_client_invalidates_cache(self):
+        """
+        This test deletes the client from an owner and asserts the cached
+        calendars are refreshed.
+        """
+        user_helper.get_client_calendars(self.user_client)
+        calendar = self.calendars[0]
+        calendar.owner.delete_client(self.user_client.identity_number)
+        self.assertNotIn(calendar,
+                         user_helper.get_client_calendars(self.user_client),
+                         msg='Cached calendars were not invalidated')
+
+    def test_reverse_add_invalidates_cache(self):
+        """
+        This test adds an owner from the client side and asserts the cached
+        calendars are refreshed.
+        """
+        user_helper.get_client_calendars(self.user_client)
+        calendar = Calendar.objects.exclude(
+            id__in=[calendar.id for calendar in self.calendars]).first()
+        self.user_client.owner_set.add(calendar.owner)
+        self.assertIn(calendar,
+                      user_helper.get_client_calendars(self.user_client),
+                      msg='Cached calendars were not invalidated')
+
+    def test_calendar_change_invalidates_cache(self):
+        """
+        This test renames a calendar and asserts the cached calendars are
+        refreshed.
+        """
+        user_helper.get_client_calendars(self.user_client)
+        calendar = self.calendars[0]
+        calendar.summary = 'renamed'
+        calendar.save()
+        self.assertEqual(
+            user_helper.get_client_calendars(self.user_client,
+                                             id=calendar.id)[0].summary,
+            'renamed', msg='Cached calendars were not invalidated')
+
+
+class GetMonthRowsTest(TestCase):
+    """
+    This class implements all the unit tests for the get_month_rows helper.
+    """
+
+    def setUp(self):
+        """
+        Creates an owner, a client and a calendar with one event.
+        """
+        cache.clear()
+        self.user_client = Client.objects.create(
+            email='client@test.com', password='test', first_name='test',
+            last_name='test', identity_number=TEST_ID)
+        owner = Owner.objects.create(
+            email='owner@test.com', password='test', first_name='test',
+            last_name='test', identity_number=TEST_ID)
+        self.calendar = Calendar.objects.create(summary='calendar',
+                                                owner=owner)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.calendar.create_event(TEST_DAY, TEST_START_TIME,
+                                       TEST_END_TIME, 'test')
+
+    def _rows(self, page='available', month='Marzo'):
+        return user_helper.get_month_rows(self.calendar, page, month, 2100)
+
+    def test_get_month_rows_cached(self):
+        """
+        This test renders a month once and then serves it from the cache.
+        """
+        rows = self._rows()
+        self.assertIn('2100-03-10', rows, msg='Event was not rendered')
+        # Only the version of the month is read.
+        with self.assertNumQueries(1):
+            self.assertEqual(self._rows(), rows,
+                             msg='Cached month changed')
+
+    def test_get_month_rows_empty(self):
+        """
+        This test renders a month without events as an empty string.
+        """
+        self.assertEqual(self._rows(month='Abril'), '',
+                         msg='Empty month was rendered')
+
+    def test_create_event_invalidates_month(self):
+        """
+        This test asserts creating an event drops its month.
+        """
+        self._rows()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.calendar.create_event(TEST_DAY, datetime.time(18, 00),
+                                       datetime.time(18, 30), 'test')
+        self.assertIn('18:00', self._rows(),
+                      msg='Month was not invalidated')
+
+    def test_version_invalidates_month(self):
+        """
+        This test changes the calendar without running the commit callbacks
+        of this worker and asserts its months are still dropped.
+        """
+        self._rows()
+        with self.captureOnCommitCallbacks(execute=False):
+            self.calendar.create_event(TEST_DAY, datetime.time(18, 00),
+                                       datetime.time(18, 30), 'test')
+        self.assertIn('18:00', self._rows(),
+                      msg='Month was not invalidated by the version')
+
+    def test_create_event_keeps_other_months(self):
+        """
+        This test asserts creating an event keeps the other months of the
+        calendar cached.
+        """
+        self._rows(month='Abril')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.calendar.create_event(TEST_DAY, datetime.time(18, 00),
+                                       datetime.time(18, 30), 'test')
+        with self.assertNumQueries(1):
+            self.assertEqual(self._rows(month='Abril'), '',
+                             msg='Untouched month was not cached')
+
+    def test_create_slots_invalidates_months(self):
+        """
+        This test creates slots on two months and asserts both are dropped,
+        and only them.
+        """
+        for month in ('Marzo', 'Abril', 'Mayo'):
+            self._rows(month=month)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.calendar.create_slots(
+                [(TEST_DAY, datetime.time(18, 00), datetime.time(18, 30)),
+                 (datetime.date(2100, 5, 4), datetime.time(18, 00),
+                  datetime.time(18, 30))], 'test')
+        self.assertIn('18:00', self._rows(month='Marzo'),
+                      msg='March was not invalidated')
+        self.assertIn('18:00', self._rows(month='Mayo'),
+                      msg='May was not invalidated')
+        with self.assertNumQueries(1):
+            self._rows(month='Abril')
+
+    def test_assign_event_invalidates_month(self):
+        """
+        This test asserts assigning and freeing an event drop its month.
+        """
+        self.assertIn('2100-03-10', self._rows('schedule'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.calendar.assign_event(TEST_ID, TEST_DAY, TEST_START_TIME,
+                                       TEST_END_TIME)
+        self.assertEqual(self._rows('schedule'), '',
+                         msg='Taken event was still rendered')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.calendar.free_event(TEST_DAY, TEST_START_TIME,
+                                     TEST_END_TIME)
+        self.assertIn('2100-03-10', self._rows('schedule'),
+                      msg='Freed event was not rendered')
+
+    def test_delete_event_all_invalidates_calendar(self):
+        """
+        This test asserts deleting every recurrence of an event drops the
+        months of the deleted events.
+        """
+        self._rows()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.calendar.delete_event(TEST_DAY, TEST_START_TIME,
+                                       TEST_END_TIME, all_events=True)
+        self.assertEqual(self._rows(), '', msg='Month was not invalidated')
+
+
+class GetMonthTest(SimpleTestCase):
+    """
+    This class implements all the unit tests for the get_month cache
+    helper.
+    """
+
+    def setUp(self):
+        cache.clear()
+
+    def test_get_month_renders_once(self):
+        """
+        This test asserts concurrent misses render the month only once.
+        """
+        renders = []
+        results = []
+
+        def render():
+            renders.append(1)
+            time.sleep(0.2)
+            return 'rendered'
+
+        def get_month():
+            results.append(cache_helper.get_month(1, 0, 2100, 3,
+                                                  'available', 'es', render))
+
+        threads = [threading.Thread(target=get_month) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(renders), 1, msg='Month was rendered again')
+        self.assertEqual(results, ['rendered'] * 5,
+                         msg='Waiting workers did not get the month')
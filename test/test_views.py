@@ -1,7 +1,16 @@
-from web.models import Calendar, Client, Event, Owner
+from datetime import datetime, timedelta
 
+from web.consts import Feed
+from web.helpers import user_helper
+from web.models import Calendar, Client, Event, Owner, RecurringSeries,\
+    WeeklyTemplate
+
+from django.core import signing
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.http import HttpResponseBadRequest, JsonResponse
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 TEST_EMAIL = 'test@test.com'
@@ -232,6 +241,92 @@ class AddOwnerClientViewTest(TestCase):
                            msg='Client was not added to owners list')
 
 
+class AddOwnerClientsViewTest(TestCase):
+    """
+    This class implements all the tests for the add_owner_clients view.
+    """
+
+    def setUp(self):
+        """
+        Creates a client and owner.
+        """
+        self.user_client =\
+            Client.objects.create(email=TEST_EMAIL, password=TEST_PASSWORD,
+                                  first_name=TEST_FIRST_NAME,
+                                  last_name=TEST_LAST_NAME,
+                                  identity_number=TEST_ID)
+        self.user_owner =\
+            Owner.objects.create(email=TEST_EMAIL, password=TEST_PASSWORD,
+                                 first_name=TEST_FIRST_NAME,
+                                 last_name=TEST_LAST_NAME,
+                                 identity_number=TEST_ID)
+        Calendar.objects.create(summary=TEST_SUMMARY, owner=self.user_owner)
+
+    def tearDown(self):
+        """
+        Delete test client and owner.
+        """
+        self.user_client.delete()
+        self.user_owner.delete()
+        self.client.logout()
+
+    def test_add_owner_clients(self):
+        """
+        This test adds a known and an unknown client and asserts the unknown
+        one is reported.
+        """
+        self.client.force_login(self.user_owner)
+        body = {'clients': [{'email': TEST_EMAIL, 'identity_number': TEST_ID},
+                            {'email': 'unknown@test.com'}]}
+        response = self.client.post(reverse('add_owner_clients'),
+                                    body,
+                                    content_type='application/json')
+
+        self.assertEqual(response.json(),
+                         {'added': 1, 'unknown': body['clients'][1:]},
+                         msg='Wrong response')
+        self.assertEqual(self.user_owner.clients.count(), 1,
+                         msg='Client was not added to owners list')
+
+    def test_add_owner_clients_again(self):
+        """
+        This test adds a client twice and asserts the second time reports
+        no client added.
+        """
+        self.client.force_login(self.user_owner)
+        body = {'clients': [{'email': TEST_EMAIL, 'identity_number': TEST_ID}]}
+        for added in (1, 0):
+            response = self.client.post(reverse('add_owner_clients'),
+                                        body,
+                                        content_type='application/json')
+            self.assertEqual(response.json(), {'added': added, 'unknown': []},
+                             msg='Wrong response')
+        self.assertEqual(self.user_owner.clients.count(), 1,
+                         msg='Client was added twice')
+
+    def test_add_owner_clients_csv(self):
+        """
+        This test adds the clients of a CSV file and asserts the cached
+        calendars of the client are dropped.
+        """
+        self.client.force_login(self.user_owner)
+        self.assertEqual(user_helper.get_client_calendars(self.user_client),
+                         [])
+        upload = SimpleUploadedFile(
+            'clients.csv',
+            'email,identity_number\n{},{}\n'.format(
+                TEST_EMAIL, TEST_ID).encode('utf-8'))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('add_owner_clients'),
+                                        {'file': upload})
+
+        self.assertEqual(response.json()['added'], 1,
+                         msg='Client was not added to owners list')
+        self.assertEqual(
+            len(user_helper.get_client_calendars(self.user_client)), 1,
+            msg='Cached calendars were not dropped')
+
+
 class DeleteOwnerClientViewTest(TestCase):
     """
     This class implements all the tests for the delete_owner_client view.
@@ -377,13 +472,177 @@ class AddEventViewTest(TestCase):
         self.client.post(reverse('add_event'),
                          body,
                          content_type='application/json')
-        event = Event.objects.filter(
-                start_time=TEST_START_TIME,
-                end_time=TEST_END_TIME,
-                calendar=self.calendar)
+        day = datetime.strptime(TEST_DATE, '%Y-%m-%d').date()
+        event = self.calendar.get_events_between(
+                day, day + timedelta(days=365))
         self.assertGreater(len(event), 2, msg='Event was not added')
 
 
+class AddWeeklyTemplateViewTest(TestCase):
+    """
+    This class implements all the tests for the add_weekly_template view.
+    """
+
+    def setUp(self):
+        """
+        Creates an owner, a calendar and an event.
+        """
+        self.user_owner =\
+            Owner.objects.create(email=TEST_EMAIL, password=TEST_PASSWORD,
+                                 first_name=TEST_FIRST_NAME,
+                                 last_name=TEST_LAST_NAME,
+                                 identity_number=TEST_ID)
+        self.calendar = Calendar.objects.create(summary=TEST_SUMMARY,
+                                                owner=self.user_owner)
+        Event.objects.create(day=TEST_DATE, start_time=TEST_START_TIME,
+                             end_time=TEST_END_TIME, location=TEST_LOCATION,
+                             calendar=self.calendar)
+        self.body = {'week_days': [4, 5],
+                     'opening_time': '15:00',
+                     'closing_time': '18:00',
+                     'slot_minutes': 60,
+                     'breaks': [['17:00', '17:30']],
+                     'start_date': TEST_DATE,
+                     'end_date': TEST_DATE_RECURRENT,
+                     'location_name': TEST_LOCATION}
+
+    def tearDown(self):
+        """
+        Delete test owner.
+        """
+        self.user_owner.delete()
+        self.client.logout()
+
+    def test_add_weekly_template(self):
+        """
+        This test adds the slots of a template and asserts the overlapping
+        ones are reported as skipped.
+        """
+        self.client.force_login(self.user_owner)
+        response = self.client.post(reverse('add_weekly_template'),
+                                    self.body,
+                                    content_type='application/json')
+
+        self.assertEqual(response.status_code, 200,
+                         msg='Template was not added')
+        content = response.json()
+        self.assertEqual(content['created'], 4,
+                         msg='Wrong number of slots created')
+        self.assertEqual(len(content['skipped']), 2,
+                         msg='Overlapping slots were not skipped')
+        self.assertEqual(Event.objects.filter(calendar=self.calendar).count(),
+                         5, msg='Slots were not stored')
+
+        response = self.client.post(reverse('add_weekly_template'),
+                                    {'template': content['template']},
+                                    content_type='application/json')
+        self.assertEqual(response.json()['created'], 0,
+                         msg='Saved template was not applied again')
+
+    def test_add_weekly_template_invalid(self):
+        """
+        This test adds a template closing before it opens and asserts a bad
+        request is returned.
+        """
+        self.client.force_login(self.user_owner)
+        self.body['closing_time'] = '14:00'
+        response = self.client.post(reverse('add_weekly_template'),
+                                    self.body,
+                                    content_type='application/json')
+
+        self.assertEqual(response.status_code,
+                         HttpResponseBadRequest.status_code,
+                         msg='Invalid template was added')
+
+    def test_add_weekly_template_too_many_slots(self):
+        """
+        This test adds a template with more slots than allowed and asserts
+        neither the template nor its slots are stored.
+        """
+        self.client.force_login(self.user_owner)
+        self.body.update({'week_days': list(range(7)),
+                          'opening_time': '00:00',
+                          'closing_time': '23:59',
+                          'slot_minutes': 1,
+                          'breaks': [],
+                          'end_date': '2100-02-01'})
+        response = self.client.post(reverse('add_weekly_template'),
+                                    self.body,
+                                    content_type='application/json')
+
+        self.assertEqual(response.status_code,
+                         HttpResponseBadRequest.status_code,
+                         msg='Too many slots were accepted')
+        self.assertFalse(WeeklyTemplate.objects.exists(),
+                         msg='Template was stored')
+        self.assertEqual(Event.objects.filter(calendar=self.calendar).count(),
+                         1, msg='Slots were stored')
+
+
+class ImportEventsViewTest(TestCase):
+    """
+    This class implements all the tests for the import_events view.
+    """
+
+    def setUp(self):
+        """
+        Creates an owner and a calendar.
+        """
+        self.user_owner =\
+            Owner.objects.create(email=TEST_EMAIL, password=TEST_PASSWORD,
+                                 first_name=TEST_FIRST_NAME,
+                                 last_name=TEST_LAST_NAME,
+                                 identity_number=TEST_ID)
+        self.calendar = Calendar.objects.create(summary=TEST_SUMMARY,
+                                                owner=self.user_owner)
+
+    def tearDown(self):
+        """
+        Delete test owner.
+        """
+        self.user_owner.delete()
+        self.client.logout()
+
+    def test_import_events(self):
+        """
+        This test uploads a CSV file and asserts its slots are added and
+        its invalid rows reported.
+        """
+        self.client.force_login(self.user_owner)
+        upload = SimpleUploadedFile(
+            'slots.csv',
+            'day,start_time,end_time,location\n'
+            '{0},{1},{2},{3}\n{0},{2},{1},{3}\n'.format(
+                TEST_DATE, TEST_START_TIME, TEST_END_TIME,
+                TEST_LOCATION).encode('utf-8'))
+        response = self.client.post(reverse('import_events'),
+                                    {'file': upload})
+
+        self.assertEqual(response.status_code, 200,
+                         msg='File was not imported')
+        self.assertEqual(response.json()['created'], 1,
+                         msg='Wrong created slots')
+        self.assertEqual(response.json()['errors'][0]['line'], 3,
+                         msg='Invalid row was not reported')
+        self.assertTrue(Event.objects.filter(calendar=self.calendar,
+                                             location=TEST_LOCATION).exists(),
+                        msg='Slot was not stored')
+
+    def test_import_events_unknown_format(self):
+        """
+        This test uploads a file of an unknown format and asserts a bad
+        request is returned.
+        """
+        self.client.force_login(self.user_owner)
+        upload = SimpleUploadedFile('slots.txt', b'slots')
+        response = self.client.post(reverse('import_events'),
+                                    {'file': upload})
+
+        self.assertEqual(response.status_code,
+                         HttpResponseBadRequest.status_code,
+                         msg='Unknown format was imported')
+
+
 class DeleteEventViewTest(TestCase):
     """
     This class implements all the tests for the delete_event view.
@@ -447,11 +706,13 @@ class DeleteEventViewTest(TestCase):
                           .format(TEST_DATE, TEST_START_TIME, TEST_END_TIME),
             'all': True
         }
-        self.client.post(reverse('delete_event'),
-                         body,
-                         content_type='application/json')
+        response = self.client.post(reverse('delete_event'),
+                                    body,
+                                    content_type='application/json')
         event = Event.objects.all()
         self.assertEqual(len(event), 0, msg='Events were not deleted')
+        self.assertEqual(response.json(), {'deleted': 2},
+                         msg='Deleted events were not counted')
 
 
 class CancelEventViewTest(TestCase):
@@ -583,3 +844,644 @@ class ScheduleEventViewTest(TestCase):
         self.event.refresh_from_db()
         self.assertEqual(self.event.free, False, msg='Event was not scheduled')
         self.assertIsNotNone(self.event.client, msg='Event was not scheduled')
+
+    def test_schedule_event_taken(self):
+        """
+        This test schedules an already taken event and asserts a conflict
+        is returned.
+        """
+        user_client =\
+            Client.objects.create(email='other@test.com',
+                                  password=TEST_PASSWORD,
+                                  first_name=TEST_FIRST_NAME,
+                                  last_name=TEST_LAST_NAME,
+                                  identity_number='87654321')
+        self.user_owner.clients.add(user_client)
+        self.client.force_login(user_client)
+        body = {
+            'event_info': '{}|{}|{}'
+                          .format(TEST_DATE, TEST_START_TIME, TEST_END_TIME),
+            'calendar': self.calendar.id
+        }
+        response = self.client.post(reverse('schedule_event'),
+                                    body,
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 409,
+                         msg='Taken event was not reported')
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.client, self.user_client,
+                         msg='Taken event was reassigned')
+
+
+class BatchEventsViewTest(TestCase):
+    """
+    This class implements all the tests for the schedule_events and
+    cancel_events views.
+    """
+
+    def setUp(self):
+        """
+        Creates an owner, a client, a calendar, one taken event and two
+        free events.
+        """
+        self.user_owner =\
+            Owner.objects.create(email=TEST_EMAIL, password=TEST_PASSWORD,
+                                 first_name=TEST_FIRST_NAME,
+                                 last_name=TEST_LAST_NAME,
+                                 identity_number=TEST_ID)
+        self.user_client =\
+            Client.objects.create(email=TEST_EMAIL, password=TEST_PASSWORD,
+                                  first_name=TEST_FIRST_NAME,
+                                  last_name=TEST_LAST_NAME,
+                                  identity_number=TEST_ID)
+        self.calendar = Calendar.objects.create(summary=TEST_SUMMARY,
+                                                owner=self.user_owner)
+        self.user_owner.clients.add(self.user_client)
+        for start_time, end_time, client in (
+                (TEST_START_TIME, TEST_END_TIME, self.user_client),
+                ('17:00', '18:00', None),
+                ('18:00', '19:00', None)):
+            Event.objects.create(day=TEST_DATE, start_time=start_time,
+                                 end_time=end_time, location=TEST_LOCATION,
+                                 calendar=self.calendar,
+                                 free=client is None, client=client)
+        self.taken = '{}|{}|{}'.format(TEST_DATE, TEST_START_TIME,
+                                       TEST_END_TIME)
+        self.free = ['{}|17:00|18:00'.format(TEST_DATE),
+                     '{}|18:00|19:00'.format(TEST_DATE)]
+
+    def tearDown(self):
+        """
+        Delete test owner.
+        """
+        self.user_owner.delete()
+        self.user_client.delete()
+        self.client.logout()
+
+    def _statuses(self, response):
+        return [result['status'] for result in response.json()['results']]
+
+    def test_schedule_events(self):
+        """
+        This test schedules two free events and a missing one, and asserts
+        the free ones are taken and the missing one is reported.
+        """
+        self.client.force_login(self.user_client)
+        missing = '{}|20:00|21:00'.format(TEST_DATE)
+        body = {'event_infos': self.free + [missing],
+                'calendar': self.calendar.id}
+        response = self.client.post(reverse('schedule_events'),
+                                    body,
+                                    content_type='application/json')
+
+        self.assertEqual(response.status_code, 200,
+                         msg='Events were not scheduled')
+        self.assertEqual(self._statuses(response), ['ok', 'ok', 'not_found'],
+                         msg='Wrong results')
+        self.assertEqual(
+            Event.objects.filter(client=self.user_client).count(), 3,
+            msg='Events were not scheduled')
+
+    def test_schedule_events_atomic(self):
+        """
+        This test schedules a free and a taken event all or nothing, and
+        asserts none of them is taken.
+        """
+        self.client.force_login(self.user_client)
+        body = {'event_infos': [self.free[0], self.taken],
+                'calendar': self.calendar.id,
+                'atomic': True}
+        response = self.client.post(reverse('schedule_events'),
+                                    body,
+                                    content_type='application/json')
+
+        self.assertEqual(response.status_code, 409,
+                         msg='Rollback was not reported')
+        self.assertEqual(self._statuses(response), ['rolled_back', 'taken'],
+                         msg='Wrong results')
+        self.assertEqual(
+            Event.objects.filter(client=self.user_client).count(), 1,
+            msg='Events were scheduled')
+
+    def test_cancel_events_owner(self):
+        """
+        This test cancels a taken and a free event as the owner, and
+        asserts the taken one is freed.
+        """
+        self.client.force_login(self.user_owner)
+        body = {'event_infos': [self.taken, self.free[0]],
+                'changes': 'json'}
+        response = self.client.post(reverse('cancel_events'),
+                                    body,
+                                    content_type='application/json')
+
+        self.assertEqual(self._statuses(response), ['ok', 'free'],
+                         msg='Wrong results')
+        self.assertEqual(response.json()['removed'], [self.taken],
+                         msg='Wrong changes')
+        self.assertFalse(Event.objects.filter(free=False).exists(),
+                         msg='Event was not canceled')
+
+
+class FeedViewTest(TestCase):
+    """
+    This class implements all the tests for the feed view.
+    """
+
+    def setUp(self):
+        """
+        Creates an owner, a client, a calendar, one taken event, one free
+        event and a recurring series with a skipped day.
+        """
+        self.user_owner =\
+            Owner.objects.create(email=TEST_EMAIL, password=TEST_PASSWORD,
+                                 first_name=TEST_FIRST_NAME,
+                                 last_name=TEST_LAST_NAME,
+                                 identity_number=TEST_ID)
+        self.user_client =\
+            Client.objects.create(email=TEST_EMAIL, password=TEST_PASSWORD,
+                                  first_name=TEST_FIRST_NAME,
+                                  last_name=TEST_LAST_NAME,
+                                  identity_number=TEST_ID)
+        self.calendar = Calendar.objects.create(summary=TEST_SUMMARY,
+                                                owner=self.user_owner)
+        Event.objects.create(day=TEST_DATE, start_time=TEST_START_TIME,
+                             end_time=TEST_END_TIME, location=TEST_LOCATION,
+                             calendar=self.calendar, free=False,
+                             client=self.user_client)
+        Event.objects.create(day=TEST_DATE, start_time='17:00',
+                             end_time='18:00', location=TEST_LOCATION,
+                             calendar=self.calendar)
+        RecurringSeries.objects.create(
+            calendar=self.calendar, week_day=4, start_date=TEST_DATE,
+            end_date='2100-03-01', start_time='09:00', end_time='10:00',
+            location=TEST_LOCATION, skipped_days=['2100-01-15'])
+        self.params = {'from': TEST_DATE, 'to': '2100-12-31'}
+
+    def tearDown(self):
+        """
+        Delete test owner.
+        """
+        self.user_owner.delete()
+        self.user_client.delete()
+
+    def _url(self, kind, owner):
+        token = signing.dumps([kind, owner.pk, owner.feed_secret],
+                              salt=Feed.SALT)
+        return reverse('feed', args=[token])
+
+    def test_calendar_feed(self):
+        """
+        This test streams the feed of a calendar and asserts its events and
+        series are exported.
+        """
+        response = self.client.get(
+            self._url('calendar', self.calendar), self.params)
+
+        self.assertEqual(response.status_code, 200, msg='Feed was not sent')
+        self.assertTrue(response.streaming, msg='Feed was not streamed')
+        content = b''.join(response.streaming_content).decode('utf-8')
+        self.assertEqual(content.count('BEGIN:VEVENT'), 3,
+                         msg='Wrong number of events')
+        self.assertIn('SUMMARY:{} {}'.format(TEST_FIRST_NAME, TEST_LAST_NAME),
+                      content, msg='Booking was not exported')
+        self.assertIn('RRULE:FREQ=WEEKLY;UNTIL=21000301T090000', content,
+                      msg='Series was not exported as a rule')
+        self.assertIn('EXDATE:21000115T090000', content,
+                      msg='Skipped day was not exported')
+
+    def test_client_feed(self):
+        """
+        This test streams the feed of a client and asserts only their
+        bookings are exported.
+        """
+        response = self.client.get(
+            self._url('client', self.user_client), self.params)
+
+        content = b''.join(response.streaming_content).decode('utf-8')
+        self.assertEqual(content.count('BEGIN:VEVENT'), 1,
+                         msg='Wrong number of events')
+        self.assertIn('DTSTART:21000101T153000', content,
+                      msg='Booking was not exported')
+
+    def test_feed_not_modified(self):
+        """
+        This test polls a feed twice and asserts the second time is
+        answered with a 304, until the calendar changes.
+        """
+        url = self._url('calendar', self.calendar)
+        response = self.client.get(url, self.params)
+        self.assertTrue(response.has_header('Last-Modified'),
+                        msg='Last-Modified was not set')
+
+        cached = self.client.get(url, self.params,
+                                 HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304,
+                         msg='Unchanged feed was sent again')
+
+        self.calendar.create_event(
+            datetime.strptime(TEST_DATE, "%Y-%m-%d").date(),
+            datetime.strptime('19:00', "%H:%M").time(),
+            datetime.strptime('20:00', "%H:%M").time(), TEST_LOCATION)
+        changed = self.client.get(url, self.params,
+                                  HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(changed.status_code, 200,
+                         msg='Changed feed was not sent')
+
+    def test_feed_client_renamed(self):
+        """
+        This test polls a calendar feed after a client who booked on it
+        changes their name and asserts the new name is sent.
+        """
+        url = self._url('calendar', self.calendar)
+        response = self.client.get(url, self.params)
+
+        self.user_client.first_name = 'renamed'
+        self.user_client.save()
+        changed = self.client.get(url, self.params,
+                                  HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(changed.status_code, 200,
+                         msg='Feed with the old name was kept')
+        content = b''.join(changed.streaming_content).decode('utf-8')
+        self.assertIn('SUMMARY:renamed {}'.format(TEST_LAST_NAME), content,
+                      msg='New name was not exported')
+
+    def test_rotate_feed(self):
+        """
+        This test rotates the feed of a client and of a calendar and asserts
+        only the new URLs are served.
+        """
+        for user, kind, owner in ((self.user_client, 'client',
+                                   self.user_client),
+                                  (self.user_owner, 'calendar',
+                                   self.calendar)):
+            old_url = self._url(kind, owner)
+            self.client.force_login(user)
+            response = self.client.post(reverse('rotate_feed'))
+            self.assertEqual(response.status_code, 200,
+                             msg='Feed was not rotated')
+            self.assertEqual(self.client.get(old_url).status_code, 403,
+                             msg='Revoked feed was served')
+            response = self.client.get(response.json()['feed_url'],
+                                       self.params)
+            self.assertEqual(response.status_code, 200,
+                             msg='New feed was not served')
+
+    def test_feed_bad_token(self):
+        """
+        This test requests a feed with a forged token and asserts it is
+        forbidden.
+        """
+        url = self._url('calendar', self.calendar)
+        response = self.client.get(url[:-5] + 'x.ics')
+
+        self.assertEqual(response.status_code, 403,
+                         msg='Forged token was accepted')
+
+
+class EventsApiViewTest(TestCase):
+    """
+    This class implements all the tests for the events_api view.
+    """
+
+    def setUp(self):
+        """
+        Creates an owner, a client, a calendar with events on five days and
+        a weekly recurring event.
+        """
+        self.user_owner =\
+            Owner.objects.create(email=TEST_EMAIL, password=TEST_PASSWORD,
+                                 first_name=TEST_FIRST_NAME,
+                                 last_name=TEST_LAST_NAME,
+                                 identity_number=TEST_ID)
+        self.user_client =\
+            Client.objects.create(email=TEST_EMAIL, password=TEST_PASSWORD,
+                                  first_name=TEST_FIRST_NAME,
+                                  last_name=TEST_LAST_NAME,
+                                  identity_number=TEST_ID)
+        self.user_owner.clients.add(self.user_client)
+        self.calendar = Calendar.objects.create(summary=TEST_SUMMARY,
+                                                owner=self.user_owner)
+        first_day = datetime.strptime(TEST_DATE, "%Y-%m-%d").date()
+        for days in range(5):
+            self.calendar.create_event(first_day + timedelta(days=days),
+                                       TEST_START_TIME, TEST_END_TIME,
+                                       TEST_LOCATION)
+        self.calendar.create_event(first_day, '18:00', '18:30',
+                                   TEST_LOCATION, recurrent=True)
+        self.calendar.assign_event(TEST_ID, first_day, TEST_START_TIME,
+                                   TEST_END_TIME)
+
+    def tearDown(self):
+        """
+        Delete test owner.
+        """
+        self.user_owner.delete()
+        self.user_client.delete()
+        self.client.logout()
+
+    def _get_pages(self, **params):
+        """
+        Get every page of the events API.
+        """
+        pages = []
+        while True:
+            response = self.client.get(reverse('events_api'), params)
+            self.assertEqual(response.status_code, 200,
+                             msg='Events were not listed')
+            pages.append(response.json())
+            if not pages[-1]['next']:
+                return pages
+            params['after'] = pages[-1]['next']
+
+    def test_events_owner(self):
+        """
+        This test pages through the owner's events, with the recurring
+        occurrences merged in order.
+        """
+        self.client.force_login(self.user_owner)
+        pages = self._get_pages(**{'from': TEST_DATE, 'to': '2100-01-14',
+                                   'limit': 2})
+        events = [event for page in pages for event in page['events']]
+        self.assertEqual(len(pages), 4, msg='Wrong number of pages')
+        self.assertEqual(
+            [(event['day'], event['start_time']) for event in events],
+            [('2100-01-01', '15:30:00'), ('2100-01-01', '18:00:00'),
+             ('2100-01-02', '15:30:00'), ('2100-01-03', '15:30:00'),
+             ('2100-01-04', '15:30:00'), ('2100-01-05', '15:30:00'),
+             ('2100-01-08', '18:00:00')],
+            msg='Wrong events')
+        self.assertEqual(events[0]['client_id'], self.user_client.id,
+                         msg='Booking client was not listed')
+
+    def test_events_owner_taken(self):
+        """
+        This test lists the owner's taken events.
+        """
+        self.client.force_login(self.user_owner)
+        events = self._get_pages(**{'from': TEST_DATE,
+                                    'status': 'taken'})[0]['events']
+        self.assertEqual(len(events), 1, msg='Wrong taken events')
+        self.assertFalse(events[0]['free'], msg='Wrong taken events')
+
+    def test_events_client(self):
+        """
+        This test lists the client's bookings, without other client ids.
+        """
+        self.client.force_login(self.user_client)
+        events = self._get_pages(**{'from': TEST_DATE,
+                                    'calendar': self.calendar.id,
+                                    'status': 'mine'})[0]['events']
+        self.assertEqual(len(events), 1, msg='Wrong client events')
+        self.assertTrue(events[0]['mine'], msg='Booking was not marked')
+        self.assertNotIn('client_id', events[0],
+                         msg='Client ids were listed to a client')
+
+    def test_events_bad_range(self):
+        """
+        This test asks for a range longer than allowed.
+        """
+        self.client.force_login(self.user_owner)
+        response = self.client.get(reverse('events_api'),
+                                   {'from': TEST_DATE, 'to': '2102-01-01'})
+        self.assertEqual(response.status_code,
+                         HttpResponseBadRequest().status_code,
+                         msg='Bad range was accepted')
+
+
+class CalendarETagTest(TestCase):
+    """
+    This class implements all the tests for the ETags of the calendar views.
+    """
+
+    def setUp(self):
+        """
+        Creates an owner, a client, a calendar and one event.
+        """
+        self.user_owner =\
+            Owner.objects.create(email=TEST_EMAIL, password=TEST_PASSWORD,
+                                 first_name=TEST_FIRST_NAME,
+                                 last_name=TEST_LAST_NAME,
+                                 identity_number=TEST_ID)
+        self.user_client =\
+            Client.objects.create(email=TEST_EMAIL, password=TEST_PASSWORD,
+                                  first_name=TEST_FIRST_NAME,
+                                  last_name=TEST_LAST_NAME,
+                                  identity_number=TEST_ID)
+        self.user_owner.clients.add(self.user_client)
+        self.calendar = Calendar.objects.create(summary=TEST_SUMMARY,
+                                                owner=self.user_owner)
+        self.calendar.create_event(
+            datetime.strptime(TEST_DATE, "%Y-%m-%d").date(),
+            TEST_START_TIME, TEST_END_TIME, TEST_LOCATION)
+
+    def tearDown(self):
+        """
+        Delete test owner.
+        """
+        self.user_owner.delete()
+        self.user_client.delete()
+        self.client.logout()
+
+    def _assert_not_modified(self, url, params):
+        """
+        Get a page twice and assert the second time is answered with a 304
+        without reading the events.
+        """
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.has_header('ETag'), msg='ETag was not set')
+        with CaptureQueriesContext(connection) as context:
+            cached = self.client.get(url, params,
+                                     HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304,
+                         msg='Unchanged page was sent again')
+        self.assertFalse(
+            [query for query in context.captured_queries
+             if 'web_event' in query['sql']],
+            msg='Events were read for an unchanged page')
+        return response['ETag']
+
+    def test_available_events_not_modified(self):
+        """
+        This test asserts the owner's month is not sent again until an
+        event changes.
+        """
+        self.client.force_login(self.user_owner)
+        params = {'month_filter': 'Enero', 'year_filter': 2100}
+        etag = self._assert_not_modified(reverse('available_events_view'),
+                                         params)
+        self.client.post(reverse('add_event'), {
+            'day': TEST_DATE_RECURRENT, 'start_time': TEST_START_TIME,
+            'end_time': TEST_END_TIME, 'location_name': TEST_LOCATION,
+            'recurrent': False}, content_type='application/json')
+        response = self.client.get(reverse('available_events_view'), params,
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200,
+                         msg='Changed page was not sent')
+
+    def test_schedule_event_not_modified(self):
+        """
+        This test asserts the client's month is not sent again until an
+        event changes, even with the client's calendars cached.
+        """
+        self.client.force_login(self.user_client)
+        params = {'month_filter': 'Enero', 'year_filter': 2100,
+                  'calendar_filter': TEST_SUMMARY}
+        etag = self._assert_not_modified(reverse('schedule_event_view'),
+                                         params)
+        self.calendar.assign_event(
+            TEST_ID, datetime.strptime(TEST_DATE, "%Y-%m-%d").date(),
+            TEST_START_TIME, TEST_END_TIME)
+        response = self.client.get(reverse('schedule_event_view'), params,
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200,
+                         msg='Changed page was not sent')
+
+    def test_schedule_event_rows(self):
+        """
+        This test gets only the rows of the client's month and asserts they
+        are not sent again until an event changes.
+        """
+        self.client.force_login(self.user_client)
+        params = {'month_filter': 'Enero', 'year_filter': 2100,
+                  'calendar_filter': TEST_SUMMARY}
+        page = self.client.get(reverse('schedule_event_view'), params)
+        params['rows'] = 1
+        etag = self._assert_not_modified(reverse('schedule_event_view'),
+                                         params)
+        self.assertNotEqual(etag, page['ETag'],
+                            msg='Rows and page share their ETag')
+
+        response = self.client.get(reverse('schedule_event_view'), params)
+        rows = response.content.decode('utf-8')
+        self.assertIn(TEST_DATE, rows, msg='Event row was not sent')
+        self.assertNotIn('<table', rows, msg='Page was sent with the rows')
+
+    def test_events_api_not_modified(self):
+        """
+        This test asserts a page of the events API is not sent again until
+        an event changes.
+        """
+        self.client.force_login(self.user_owner)
+        self._assert_not_modified(reverse('events_api'), {'from': TEST_DATE})
+
+
+class EventChangesViewTest(TestCase):
+    """
+    This class implements all the tests for the changes returned by the
+    event views.
+    """
+
+    def setUp(self):
+        """
+        Creates an owner, a client, a calendar and one event.
+        """
+        self.user_owner =\
+            Owner.objects.create(email=TEST_EMAIL, password=TEST_PASSWORD,
+                                 first_name=TEST_FIRST_NAME,
+                                 last_name=TEST_LAST_NAME,
+                                 identity_number=TEST_ID)
+        self.user_client =\
+            Client.objects.create(email=TEST_EMAIL, password=TEST_PASSWORD,
+                                  first_name=TEST_FIRST_NAME,
+                                  last_name=TEST_LAST_NAME,
+                                  identity_number=TEST_ID)
+        self.user_owner.clients.add(self.user_client)
+        self.calendar = Calendar.objects.create(summary=TEST_SUMMARY,
+                                                owner=self.user_owner)
+        self.calendar.create_event(
+            datetime.strptime(TEST_DATE, "%Y-%m-%d").date(),
+            TEST_START_TIME, TEST_END_TIME, TEST_LOCATION)
+        self.event_info = '{}|{}:00.000000|{}:00.000000'.format(
+            TEST_DATE, TEST_START_TIME, TEST_END_TIME)
+
+    def tearDown(self):
+        """
+        Delete test owner.
+        """
+        self.user_owner.delete()
+        self.user_client.delete()
+        self.client.logout()
+
+    def _post(self, url, body):
+        response = self.client.post(url, body,
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_add_event_html(self):
+        """
+        This test adds an event and gets its row rendered as in the page.
+        """
+        self.client.force_login(self.user_owner)
+        changes = self._post(reverse('add_event'), {
+            'day': TEST_DATE_RECURRENT, 'start_time': TEST_START_TIME,
+            'end_time': TEST_END_TIME, 'location_name': TEST_LOCATION,
+            'recurrent': False, 'changes': 'html'})
+        self.assertEqual(len(changes['added']), 1, msg='Row was not added')
+        self.assertIn('id="2100-01-08|15:30:00.000000|16:30:00.000000"',
+                      changes['added'][0], msg='Wrong row')
+        self.assertFalse(changes['reload'], msg='Page was reloaded')
+
+    def test_add_event_json(self):
+        """
+        This test adds an event and gets it as JSON.
+        """
+        self.client.force_login(self.user_owner)
+        changes = self._post(reverse('add_event'), {
+            'day': TEST_DATE_RECURRENT, 'start_time': TEST_START_TIME,
+            'end_time': TEST_END_TIME, 'location_name': TEST_LOCATION,
+            'recurrent': False, 'changes': 'json'})
+        self.assertEqual(changes['added'][0]['event_info'],
+                         '2100-01-08|15:30:00.000000|16:30:00.000000',
+                         msg='Wrong event')
+        self.assertTrue(changes['added'][0]['free'], msg='Wrong event')
+
+    def test_add_event_recurrent(self):
+        """
+        This test adds a recurrent event and is told to reload the page.
+        """
+        self.client.force_login(self.user_owner)
+        changes = self._post(reverse('add_event'), {
+            'day': TEST_DATE_RECURRENT, 'start_time': TEST_START_TIME,
+            'end_time': TEST_END_TIME, 'location_name': TEST_LOCATION,
+            'recurrent': True, 'changes': 'html'})
+        self.assertTrue(changes['reload'], msg='Page was not reloaded')
+
+    def test_add_event_no_changes(self):
+        """
+        This test asserts the changes are only returned when asked for.
+        """
+        self.client.force_login(self.user_owner)
+        changes = self._post(reverse('add_event'), {
+            'day': TEST_DATE_RECURRENT, 'start_time': TEST_START_TIME,
+            'end_time': TEST_END_TIME, 'location_name': TEST_LOCATION,
+            'recurrent': False})
+        self.assertEqual(changes, {}, msg='Changes were returned')
+
+    def test_delete_event(self):
+        """
+        This test deletes an event and gets its row removed.
+        """
+        self.client.force_login(self.user_owner)
+        changes = self._post(reverse('delete_event'), {
+            'event_info': self.event_info, 'all': False, 'changes': 'html'})
+        self.assertEqual(changes['removed'], [self.event_info],
+                         msg='Row was not removed')
+        self.assertEqual(changes['deleted'], 1, msg='Event was not deleted')
+
+    def test_schedule_and_cancel_event(self):
+        """
+        This test books and cancels an event and gets its row removed from
+        both pages.
+        """
+        self.client.force_login(self.user_client)
+        body = {'event_info': self.event_info, 'calendar': self.calendar.id,
+                'changes': 'html'}
+        changes = self._post(reverse('schedule_event'), body)
+        self.assertEqual(changes['removed'], [self.event_info],
+                         msg='Booked row was not removed')
+        changes = self._post(reverse('cancel_event'), body)
+        self.assertEqual(changes['removed'], [self.event_info],
+                         msg='Cancelled row was not removed')
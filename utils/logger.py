@@ -1,29 +1,251 @@
 from datetime import datetime
+import atexit
+import json
 import os
+import queue
+import random
+import sys
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+LEVELS = {'DEBUG': 10, 'INFO': 20, 'ERROR': 40}
 
 
 class Logger:
 
-    def __init__(self, log_path):
+    def __init__(self, log_path, max_bytes=10 * 1024 * 1024,
+                 rotate_seconds=24 * 60 * 60, backups=5, batch_size=512,
+                 level=None, sampling=None):
         """
         Inits Logger singleton to be used globally.
 
+        Records below the level are dropped before anything is formatted.
+        Messages take %-style arguments, which are only formatted for the
+        records kept, on the calling thread. Records of the modules or
+        functions in sampling are kept with the given probability.
+
+        Records are queued by the calling thread and written as JSON lines
+        by a background thread, in batches. The file is opened on the first
+        write, appended to by every worker process and rotated when it
+        grows over max_bytes or gets older than rotate_seconds.
+
+        Args:
+            - log_path(str): log file directory.
+            - max_bytes(int): size rotating the file, 0 disables it.
+            - rotate_seconds(int): age rotating the file, 0 disables it.
+            - backups(int): rotated files kept.
+            - batch_size(int): max records written at once.
+            - level(str): DEBUG, INFO or ERROR. Defaults to the LOG_LEVEL
+              setting.
+            - sampling(dict): probability of keeping a record by module
+              ('web.models') or function ('web.models.get_events'). Defaults
+              to the LOG_SAMPLING setting.
+
+        """
+        self.log_path = os.path.join(log_path, "log.txt")
+        self.level = level
+        self.sampling = sampling
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self.backups = backups
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._queue = None
+        self._pid = None
+        self._fd = None
+        self._opened_at = None
+        self._level_number = None
+
+    def log_debug(self, debug, *args):
+        self._log("DEBUG", debug, args)
+
+    def log_info(self, info, *args):
+        self._log("INFO", info, args)
+
+    def log_error(self, error, *args):
+        self._log("ERROR", error, args)
+
+    def flush(self, timeout=5):
+        """
+        Wait until the queued records are written.
+
         Args:
-            - log_path(str): log file full path.
+            - timeout(float): max seconds to wait.
 
+        Returns(bool): False if the records were not written in time.
         """
-        log_path = os.path.join(log_path, "log.txt")
-        self.log_file = open(log_path, "a+")
+        if self._pid != os.getpid():
+            return True
+        written = threading.Event()
+        self._queue.put(written)
+        return written.wait(timeout)
 
-    def log_info(self, info):
-        now = datetime.now()
-        now_formated = now.strftime("%d-%m-%Y %H:%M:%S")
-        self.log_file.write("[{} INFO]: {}\n".format(now_formated, info))
+    def _log(self, level, message, args):
+        if self._level_number is None:
+            self._configure()
+        if LEVELS[level] < self._level_number:
+            return
+        if self.sampling:
+            caller = sys._getframe(2)
+            module = caller.f_globals.get('__name__')
+            rate = self.sampling.get(
+                "{}.{}".format(module, caller.f_code.co_name),
+                self.sampling.get(module))
+            if rate is not None and random.random() >= rate:
+                return
+        self._start()
+        self._queue.put((time.time(), level, self._format(message, args)))
+
+    def _format(self, message, args):
+        """
+        Format a message with its arguments. Formatting may fail, as an
+        argument whose __str__ raises, and logging must never break the
+        application.
+
+        Args:
+            - message(str):
+            - args(tuple): %-style arguments.
+
+        Returns(str):
+        """
+        try:
+            return str(message % args if args else message)
+        except Exception:
+            pass
+        try:
+            return "{} {}".format(message, args)
+        except Exception as err:
+            # Not even the arguments, or the message, can be made text.
+            return "{} ({} formatting arguments)".format(
+                message if isinstance(message, str) else "Log message",
+                type(err).__name__)
+
+    def _configure(self):
+        """
+        Take the level and sampling not given on init from the settings.
+        """
+        try:
+            from django.conf import settings
+            level = getattr(settings, 'LOG_LEVEL', 'INFO')
+            sampling = getattr(settings, 'LOG_SAMPLING', {})
+        except Exception:
+            level, sampling = 'INFO', {}
+        if self.level is None:
+            self.level = level
+        if self.sampling is None:
+            self.sampling = sampling
+        self._level_number = LEVELS[self.level.upper()]
+
+    def _start(self):
+        """
+        Start the writer thread of this process. Forked workers do not
+        inherit the parent's thread, so they start their own.
+        """
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.SimpleQueue()
+            self._fd = None
+            threading.Thread(target=self._run, name="logger",
+                             daemon=True).start()
+            if self._pid is None:
+                atexit.register(self.flush)
+            self._pid = os.getpid()
+
+    def _run(self):
+        while True:
+            records = [self._queue.get()]
+            while len(records) < self.batch_size:
+                try:
+                    records.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._write(records)
+
+    def _write(self, records):
+        lines = []
+        flushes = []
+        for record in records:
+            if isinstance(record, threading.Event):
+                flushes.append(record)
+                continue
+            created, level, message = record
+            lines.append(json.dumps({
+                'time': datetime.fromtimestamp(created).strftime(
+                    "%d-%m-%Y %H:%M:%S.%f"),
+                'level': level,
+                'pid': self._pid,
+                'message': message,
+            }))
+        if lines:
+            try:
+                self._open()
+                # A single write on an O_APPEND descriptor keeps the lines
+                # of concurrent workers whole.
+                os.write(self._fd, ("\n".join(lines) + "\n").encode('utf-8'))
+                self._rotate()
+            except OSError:
+                # Logging must never break the application.
+                self._close()
+        for written in flushes:
+            written.set()
+
+    def _open(self):
+        """
+        Open the log file, or reopen it if another worker rotated it.
+        """
+        if self._fd is not None:
+            try:
+                if os.stat(self.log_path).st_ino == \
+                        os.fstat(self._fd).st_ino:
+                    return
+            except FileNotFoundError:
+                pass
+            self._close()
+        self._fd = os.open(self.log_path,
+                           os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._opened_at = time.time()
+
+    def _close(self):
+        if self._fd is not None:
+            try:
+                os.close(self._fd)
+            except OSError:
+                pass
+        self._fd = None
+
+    def _rotate(self):
+        """
+        Rotate the log file if it is too big or too old, keeping the last
+        backups as log.txt.1, log.txt.2, ...
+        """
+        too_big = self.max_bytes and \
+            os.fstat(self._fd).st_size >= self.max_bytes
+        too_old = self.rotate_seconds and \
+            time.time() - self._opened_at >= self.rotate_seconds
+        if not too_big and not too_old:
+            return
 
-    def log_error(self, error):
-        now = datetime.now()
-        now_formated = now.strftime("%d-%m-%Y %H:%M:%S")
-        self.log_file.write("[{} ERROR]: {}\n".format(now_formated, error))
+        with open(self.log_path + ".lock", "a") as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            # Another worker may have rotated it while waiting for the lock.
+            if os.stat(self.log_path).st_ino == os.fstat(self._fd).st_ino:
+                for number in range(self.backups - 1, 0, -1):
+                    backup = "{}.{}".format(self.log_path, number)
+                    if os.path.exists(backup):
+                        os.replace(backup, "{}.{}".format(self.log_path,
+                                                          number + 1))
+                os.replace(self.log_path, self.log_path + ".1")
+        self._close()
 
 
-logger = Logger(os.getcwd())
+logger = Logger(os.environ.get("LOG_DIR", os.getcwd()))
@@ -1,5 +1,6 @@
 from web.forms import ClientForm, OwnerForm
-from web.models import Calendar, Client, Event, Owner
+from web.models import Calendar, Client, Event, Owner, RecurringSeries,\
+    WeeklyTemplate
 
 from django.contrib import admin
 
@@ -34,6 +35,22 @@ class EventAdmin(admin.ModelAdmin):
                     'free', 'calendar']
 
 
+class RecurringSeriesAdmin(admin.ModelAdmin):
+    """
+    This class defines the RecurringSeries Admin page.
+    """
+    list_display = ['start_date', 'end_date', 'start_time', 'end_time',
+                    'location', 'calendar']
+
+
+class WeeklyTemplateAdmin(admin.ModelAdmin):
+    """
+    This class defines the WeeklyTemplate Admin page.
+    """
+    list_display = ['name', 'week_days', 'opening_time', 'closing_time',
+                    'slot_minutes', 'start_date', 'end_date', 'calendar']
+
+
 class OwnerAdmin(admin.ModelAdmin):
     """
     This class defines the Owner Admin page.
@@ -52,3 +69,5 @@ admin.site.register(Calendar, admin_class=CalendarAdmin)
 admin.site.register(Client, admin_class=ClientAdmin)
 admin.site.register(Event, admin_class=EventAdmin)
 admin.site.register(Owner, admin_class=OwnerAdmin)
+admin.site.register(RecurringSeries, admin_class=RecurringSeriesAdmin)
+admin.site.register(WeeklyTemplate, admin_class=WeeklyTemplateAdmin)
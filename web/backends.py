@@ -1,8 +1,11 @@
+from .helpers import cache_helper
 from .models import Client, Owner
 
 from django.contrib.auth.backends import BaseBackend
 from django.contrib.auth.hashers import check_password
 
+USER_MODELS = {'1': Owner, '2': Client}
+
 
 class EmailAuthBackend(BaseBackend):
     def authenticate(self, request, username=None, password=None, **kwargs):
@@ -19,7 +22,7 @@ class EmailAuthBackend(BaseBackend):
             try:
                 client = Client.objects.get(email=username)
                 if client:
-                    if check_password(password, client.password):
+                    if self._check_password(client, password):
                         return client
             except Exception as e:
                 print("Client register error: {}".format(e))
@@ -29,18 +32,51 @@ class EmailAuthBackend(BaseBackend):
             try:
                 owner = Owner.objects.get(email=username)
                 if owner:
-                    if check_password(password, owner.password):
+                    if self._check_password(owner, password):
                         return owner
             except Exception as e:
                 print(e)
                 return None
         return None
 
+    def _check_password(self, user, password):
+        """
+        Check the password of a user, rehashing it with the preferred hasher
+        if it was hashed with an outdated one.
+
+        Args:
+            - user(Client/Owner):
+            - password(str):
+
+        Returns(bool):
+        """
+        def setter(raw_password):
+            user.password = raw_password
+            user.save(update_fields=['password'])
+
+        return check_password(password, user.password, setter)
+
     def get_user(self, user_id):
+        """
+        Get the user of a session. Owner ids start with 1 and Client ids
+        with 2, so only one table is queried, and none if the user was
+        cached by a recent request.
+
+        Args:
+            - user_id(int|str):
+
+        Returns(Client/Owner):
+        """
+        user = cache_helper.get_user(user_id)
+        if user is not None:
+            return user
+
+        model = USER_MODELS.get(str(user_id)[:1])
+        if model is None:
+            return None
         try:
-            return Owner.objects.get(pk=user_id)
-        except Owner.DoesNotExist:
-            try:
-                return Client.objects.get(pk=user_id)
-            except Client.DoesNotExist:
-                return None
+            user = model.objects.get(pk=user_id)
+        except model.DoesNotExist:
+            return None
+        cache_helper.set_user(user)
+        return user
@@ -13,3 +13,40 @@ class Language:
         'Noviembre': 'November',
         'Diciembre': 'December'
     }
+
+
+class Cache:
+    CLIENT_CALENDARS = 'client_calendars:{}'
+    USER = 'user:{}'
+    MONTH = 'month:{}:{}:{}:{}:{}:{}'
+
+
+class Api:
+    PAGE_SIZE = 100
+    MAX_PAGE_SIZE = 500
+    DAYS = 30
+    MAX_DAYS = 366
+    MAX_BATCH = 100
+    MAX_CLIENTS = 5000
+
+
+class PubSub:
+    STREAM_PATH = '/events/stream'
+    CALENDAR = 'calendar:{}'
+    MONTH = 'calendar:{}:{}:{}'
+
+
+class Feed:
+    PATH = '/feeds/'
+    SALT = 'web.feeds'
+    UID_DOMAIN = 'assistant-web-app'
+    DAYS_BEFORE = 30
+    DAYS_AFTER = 366
+    MAX_DAYS = 3660
+    CHUNK_SIZE = 500
+
+
+class Import:
+    CHUNK_SIZE = 1000
+    MAX_SLOTS = 20000
+    WEEK_DAYS = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
@@ -0,0 +1,14 @@
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """
+    This class implements the PBKDF2 hasher with the number of iterations
+    set by PASSWORD_HASH_ITERATIONS. Passwords hashed with another number of
+    iterations are rehashed on login.
+    """
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_HASH_ITERATIONS
@@ -0,0 +1,129 @@
+import time
+
+from ..consts import Cache
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+def get_client_calendars(client_id):
+    """
+    Get the cached calendars a client can book on.
+
+    Args:
+        - client_id(int):
+
+    Returns(list|None): None if not cached.
+    """
+    return cache.get(Cache.CLIENT_CALENDARS.format(client_id))
+
+
+def set_client_calendars(client_id, calendars):
+    """
+    Cache the calendars a client can book on.
+
+    Args:
+        - client_id(int):
+        - calendars(list):
+
+    Returns(None):
+    """
+    cache.set(Cache.CLIENT_CALENDARS.format(client_id), calendars,
+              settings.CLIENT_CALENDARS_CACHE_TIMEOUT)
+
+
+def invalidate_client_calendars(client_ids):
+    """
+    Drop the cached calendars of several clients.
+
+    Args:
+        - client_ids(iterable): client ids.
+
+    Returns(None):
+    """
+    cache.delete_many([Cache.CLIENT_CALENDARS.format(client_id)
+                       for client_id in client_ids])
+
+
+def get_user(user_id):
+    """
+    Get a cached Client or Owner.
+
+    Args:
+        - user_id(int|str):
+
+    Returns(Client|Owner|None): None if not cached.
+    """
+    if not settings.AUTH_USER_CACHE_TIMEOUT:
+        return None
+    return cache.get(Cache.USER.format(user_id))
+
+
+def set_user(user):
+    """
+    Cache a Client or Owner for a short time.
+
+    Args:
+        - user(Client|Owner):
+
+    Returns(None):
+    """
+    if settings.AUTH_USER_CACHE_TIMEOUT:
+        cache.set(Cache.USER.format(user.pk), user,
+                  settings.AUTH_USER_CACHE_TIMEOUT)
+
+
+def invalidate_user(user_id):
+    """
+    Drop a cached Client or Owner.
+
+    Args:
+        - user_id(int):
+
+    Returns(None):
+    """
+    cache.delete(Cache.USER.format(user_id))
+
+
+def get_month(calendar_id, version, year, month, kind, language, render):
+    """
+    Get a rendered calendar month, rendering and caching it on a miss.
+    Cached months are keyed by their version, so every worker stops
+    reading a month once its events change, and the old ones expire.
+
+    Only one worker renders a missing month, the others wait for it up to
+    MONTH_CACHE_LOCK_TIMEOUT and then render it themselves.
+
+    Args:
+        - calendar_id(int):
+        - version(int): current version of the month.
+        - year(int):
+        - month(int):
+        - kind(str): page the month is rendered for.
+        - language(str): active language, see translation.get_language.
+        - render(callable): renders the month.
+
+    Returns(str):
+    """
+    key = Cache.MONTH.format(calendar_id, version, year, month, kind,
+                             language)
+    rendered = cache.get(key)
+    if rendered is not None:
+        return rendered
+
+    lock = key + ':lock'
+    locked = cache.add(lock, 1, settings.MONTH_CACHE_LOCK_TIMEOUT)
+    if not locked:
+        deadline = time.monotonic() + settings.MONTH_CACHE_LOCK_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            rendered = cache.get(key)
+            if rendered is not None:
+                return rendered
+    try:
+        rendered = render()
+        cache.set(key, rendered, settings.MONTH_CACHE_TIMEOUT)
+    finally:
+        if locked:
+            cache.delete(lock)
+    return rendered
@@ -0,0 +1,167 @@
+import datetime
+import hashlib
+import json
+
+from . import feed_helper, user_helper
+from ..models import Calendar
+
+from django.db.models import Max
+from django.middleware.csrf import get_token
+from django.utils import timezone
+
+
+def available_events(request):
+    """
+    Get the ETag of the owner's available events page.
+
+    Args:
+        - request(HttpRequest):
+
+    Returns(str|None): None if the page has no ETag.
+    """
+    if not user_helper.is_owner(request.user):
+        return None
+    calendar = Calendar.objects.filter(owner=request.user)\
+        .values_list('id', 'version').first()
+    if calendar is None:
+        return None
+    return _etag(request, 'owner', calendar,
+                 request.GET.get('month_filter'),
+                 request.GET.get('year_filter'))
+
+
+def schedule_event(request):
+    """
+    Get the ETag of the client's schedule event page.
+
+    Args:
+        - request(HttpRequest):
+
+    Returns(str|None): None if the page has no ETag.
+    """
+    if not user_helper.is_client(request.user):
+        return None
+    calendars = user_helper.get_client_calendars(request.user)
+    if not calendars:
+        return None
+    calendar = calendars[0]
+    if request.GET.get('month_filter'):
+        summary = request.GET.get('calendar_filter', '').split("|")[0].strip()
+        calendar = next((calendar for calendar in calendars
+                         if calendar.summary == summary), None)
+        if calendar is None:
+            return None
+    # Cached calendars hold the version they were cached with.
+    return _etag(request, 'client', _version(calendar.id),
+                 request.GET.get('month_filter'),
+                 request.GET.get('year_filter'),
+                 bool(request.GET.get('rows')),
+                 [(calendar.id, calendar.summary, str(calendar.owner))
+                  for calendar in calendars])
+
+
+def events_api(request):
+    """
+    Get the ETag of a page of the events API.
+
+    Args:
+        - request(HttpRequest):
+
+    Returns(str|None): None if the page has no ETag.
+    """
+    if user_helper.is_owner(request.user):
+        role = 'owner'
+        calendar = Calendar.objects.filter(owner=request.user)\
+            .values_list('id', 'version').first()
+    else:
+        role = 'client'
+        try:
+            calendar_id = int(request.GET['calendar']) \
+                if request.GET.get('calendar') else None
+        except ValueError:
+            return None
+        calendars = user_helper.get_client_calendars(request.user,
+                                                     id=calendar_id)
+        calendar = _version(calendars[0].id) if calendars else None
+    if calendar is None:
+        return None
+    return _etag(request, role, calendar, sorted(request.GET.items()))
+
+
+def feed(request, token):
+    """
+    Get the ETag of an iCalendar feed, from the versions of the calendars
+    it exports.
+
+    Args:
+        - request(HttpRequest):
+        - token(str):
+
+    Returns(str|None): None if the feed has no ETag.
+    """
+    signed = feed_helper.load_token(token)
+    if signed is None:
+        return None
+    calendars = list(feed_helper.get_calendars(*signed)
+                     .order_by('id').values_list('id', 'version'))
+    key = json.dumps([token, calendars, datetime.date.today().isoformat(),
+                      sorted(request.GET.items())])
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def feed_modified(request, token):
+    """
+    Get the Last-Modified time of an iCalendar feed. The default window
+    moves every day, so it is never older than today.
+
+    Args:
+        - request(HttpRequest):
+        - token(str):
+
+    Returns(datetime|None): None if the feed has no modification time.
+    """
+    signed = feed_helper.load_token(token)
+    if signed is None:
+        return None
+    modified = feed_helper.get_calendars(*signed)\
+        .aggregate(modified=Max('modified'))['modified']
+    today = timezone.localtime().replace(hour=0, minute=0, second=0,
+                                         microsecond=0)
+    return max(modified, today) if modified else today
+
+
+def _version(calendar_id):
+    """
+    Read the current version of a calendar.
+
+    Args:
+        - calendar_id(int):
+
+    Returns(tuple): (id, version)
+    """
+    return calendar_id, Calendar.objects.filter(pk=calendar_id)\
+        .values_list('version', flat=True).first()
+
+
+def _etag(request, role, calendar, *parts):
+    """
+    Build an ETag from the calendar version and everything else the
+    response depends on: the user, the date defaults and the CSRF token
+    rendered in pages.
+
+    Args:
+        - request(HttpRequest):
+        - role(str): 'owner' or 'client'.
+        - calendar(tuple): (id, version)
+        - parts: request parameters the response depends on.
+
+    Returns(str):
+    """
+    # get_token sets the CSRF cookie the page is rendered with, if the
+    # request did not have it.
+    get_token(request)
+    key = json.dumps([role, request.user.pk, list(calendar),
+                      datetime.date.today().isoformat(),
+                      request.META.get('CSRF_COOKIE'), parts],
+                     default=str)
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
@@ -0,0 +1,250 @@
+import datetime
+
+from ..consts import Feed
+from ..models import Calendar, Client, Event, RecurringSeries,\
+    new_feed_secret
+
+from django.core import signing
+from django.urls import reverse
+from django.utils import timezone
+
+
+def get_feed_url(request, calendar=None, client=None):
+    """
+    Get the iCalendar feed URL of a calendar or of a client's bookings. The
+    URL carries a signed token, so calendar apps can poll it without a
+    session. The token holds the feed secret of the calendar or client, so
+    rotating it revokes the URL.
+
+    Args:
+        - request(HttpRequest):
+        - calendar(Calendar):
+        - client(Client):
+
+    Returns(str):
+    """
+    kind, owner = ('calendar', calendar) if calendar else ('client', client)
+    token = signing.dumps([kind, owner.pk, owner.feed_secret], salt=Feed.SALT)
+    return request.build_absolute_uri(reverse('feed', args=[token]))
+
+
+def rotate_secret(owner):
+    """
+    Change the feed secret of a calendar or client, revoking the URLs given
+    until now.
+
+    Args:
+        - owner(Calendar|Client):
+
+    Returns(None):
+    """
+    owner.feed_secret = new_feed_secret()
+    owner.save(update_fields=['feed_secret'])
+
+
+def load_token(token):
+    """
+    Get what a feed token was signed for, without reading the database.
+
+    Args:
+        - token(str):
+
+    Returns(tuple|None): ('calendar' | 'client', pk, secret), None for
+    invalid tokens.
+    """
+    try:
+        kind, pk, secret = signing.loads(token, salt=Feed.SALT)
+    except (signing.BadSignature, ValueError):
+        return None
+    return kind, pk, secret
+
+
+def get_owner(kind, pk, secret):
+    """
+    Get the calendar or client of a feed.
+
+    Args:
+        - kind(str): 'calendar' or 'client'.
+        - pk(int):
+        - secret(str): feed secret signed in the token.
+
+    Returns(Calendar|Client|None): None if it was deleted or its secret
+    rotated.
+    """
+    model = Calendar if kind == 'calendar' else Client
+    return model.objects.filter(pk=pk, feed_secret=secret).first()
+
+
+def get_window(params):
+    """
+    Get the days exported by a feed from its query parameters.
+
+    Args:
+        - params(dict): from and to, as YYYY-MM-DD.
+
+    Returns(tuple): (first_day, last_day)
+
+    Raises:
+        ValueError: on invalid parameters.
+    """
+    today = datetime.date.today()
+    first_day = datetime.date.fromisoformat(params['from']) \
+        if params.get('from') else \
+        today - datetime.timedelta(days=Feed.DAYS_BEFORE)
+    last_day = datetime.date.fromisoformat(params['to']) \
+        if params.get('to') else \
+        today + datetime.timedelta(days=Feed.DAYS_AFTER)
+    if not 0 <= (last_day - first_day).days < Feed.MAX_DAYS:
+        raise ValueError("Date range must span 1 to {} days"
+                         .format(Feed.MAX_DAYS))
+    return first_day, last_day
+
+
+def get_calendars(kind, pk, secret):
+    """
+    Get the calendars whose changes a feed depends on.
+
+    Args:
+        - kind(str): 'calendar' or 'client'.
+        - pk(int):
+        - secret(str): feed secret signed in the token.
+
+    Returns(QuerySet): calendars, none if the secret was rotated.
+    """
+    if kind == 'calendar':
+        return Calendar.objects.filter(pk=pk, feed_secret=secret)
+    return Calendar.objects.filter(
+        event__client=pk, event__client__feed_secret=secret).distinct()
+
+
+def stream_calendar(calendar, first_day, last_day):
+    """
+    Stream the events and recurring series of a calendar as an iCalendar
+    file. Events are read in chunks, so memory does not grow with the
+    window.
+
+    Args:
+        - calendar(Calendar):
+        - first_day(date):
+        - last_day(date):
+
+    Returns(generator): the file, one event at a time.
+    """
+    stamp = _format_stamp(calendar.modified)
+    yield _header(calendar.summary)
+    events = Event.objects.filter(
+        calendar=calendar, day__range=(first_day, last_day))\
+        .select_related('client').order_by('day', 'start_time')
+    for event in events.iterator(chunk_size=Feed.CHUNK_SIZE):
+        yield _vevent(
+            'event-{}'.format(event.pk), stamp, event.day, event.start_time,
+            event.end_time,
+            "{} {}".format(event.client.first_name, event.client.last_name)
+            if event.client else "Libre",
+            event.location)
+    series = RecurringSeries.objects.filter(
+        calendar=calendar, start_date__lte=last_day, end_date__gte=first_day)
+    for recurring in series.iterator(chunk_size=Feed.CHUNK_SIZE):
+        yield _vseries(recurring, stamp)
+    yield "END:VCALENDAR\r\n"
+
+
+def stream_client(client, first_day, last_day):
+    """
+    Stream the bookings of a client as an iCalendar file, read in chunks.
+
+    Args:
+        - client(Client):
+        - first_day(date):
+        - last_day(date):
+
+    Returns(generator): the file, one event at a time.
+    """
+    stamp = _format_stamp(timezone.now())
+    yield _header("{} {}".format(client.first_name, client.last_name))
+    events = Event.objects.filter(
+        client=client, free=False, day__range=(first_day, last_day))\
+        .select_related('calendar').order_by('day', 'start_time')
+    for event in events.iterator(chunk_size=Feed.CHUNK_SIZE):
+        yield _vevent(
+            'event-{}'.format(event.pk), stamp, event.day, event.start_time,
+            event.end_time, event.calendar.summary, event.location)
+    yield "END:VCALENDAR\r\n"
+
+
+def _header(name):
+    return "".join([
+        "BEGIN:VCALENDAR\r\n",
+        "VERSION:2.0\r\n",
+        "PRODID:-//{}//ES\r\n".format(Feed.UID_DOMAIN),
+        "CALSCALE:GREGORIAN\r\n",
+        _line("X-WR-CALNAME", _escape(name))])
+
+
+def _vseries(recurring, stamp):
+    """
+    Format a recurring series as one weekly event, with its skipped days as
+    exceptions. The stored occurrences are exported as events.
+    """
+    first_day = recurring.start_date + datetime.timedelta(
+        days=(recurring.week_day - recurring.start_date.weekday()) % 7)
+    until = datetime.datetime.combine(recurring.end_date,
+                                      recurring.start_time)
+    rules = ["RRULE:FREQ=WEEKLY;UNTIL={}\r\n".format(_format_time(until))]
+    if recurring.skipped_days:
+        rules.append(_line("EXDATE", ",".join(
+            _format_time(datetime.datetime.combine(
+                datetime.date.fromisoformat(day), recurring.start_time))
+            for day in sorted(recurring.skipped_days))))
+    return _vevent('series-{}'.format(recurring.pk), stamp, first_day,
+                   recurring.start_time, recurring.end_time, "Libre",
+                   recurring.location, rules)
+
+
+def _vevent(uid, stamp, day, start_time, end_time, summary, location,
+            rules=()):
+    lines = [
+        "BEGIN:VEVENT\r\n",
+        "UID:{}@{}\r\n".format(uid, Feed.UID_DOMAIN),
+        "DTSTAMP:{}\r\n".format(stamp),
+        "DTSTART:{}\r\n".format(
+            _format_time(datetime.datetime.combine(day, start_time))),
+        "DTEND:{}\r\n".format(
+            _format_time(datetime.datetime.combine(day, end_time))),
+        *rules,
+        _line("SUMMARY", _escape(summary))]
+    if location:
+        lines.append(_line("LOCATION", _escape(location)))
+    lines.append("END:VEVENT\r\n")
+    return "".join(lines)
+
+
+def _format_time(value):
+    # Events have no time zone, so they are exported as floating times.
+    return value.strftime("%Y%m%dT%H%M%S")
+
+
+def _format_stamp(value):
+    return value.astimezone(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace(";", "\\;")\
+        .replace(",", "\\,").replace("\n", "\\n")
+
+
+def _line(name, value):
+    """
+    Format a content line, folded at 75 octets as RFC 5545 requires.
+    """
+    line = "{}:{}".format(name, value).encode('utf-8')
+    parts = []
+    while len(line) > (74 if parts else 75):
+        cut = 74 if parts else 75
+        # Do not split a multi-byte character.
+        while line[cut] & 0xC0 == 0x80:
+            cut -= 1
+        parts.append(line[:cut])
+        line = line[cut:]
+    parts.append(line)
+    return "\r\n ".join(part.decode('utf-8') for part in parts) + "\r\n"
@@ -0,0 +1,228 @@
+import codecs
+import csv
+import datetime
+import re
+
+from ..consts import Import
+from ..models import Event, format_event_info
+
+from django.utils import timezone
+
+
+def import_slots(calendar, name, lines):
+    """
+    Import the slots of an .ics or .csv file into a calendar. Rows that can
+    not be read and slots overlapping other events or slots are reported
+    instead of aborting the import.
+
+    Args:
+        - calendar(Calendar):
+        - name(str): file name, its extension tells the format.
+        - lines(iterable): lines of the file, as bytes.
+
+    Returns(dict): {'created': int, 'conflicts': list of event_info,
+    'errors': [{'line': int, 'reason': str}]}
+
+    Raises:
+        ValueError: on unknown formats or too many slots.
+    """
+    slots, errors = [], []
+    for line, slot, error in parse(name, lines):
+        if error:
+            errors.append({'line': line, 'reason': error})
+            continue
+        slots.append(slot)
+        if len(slots) > Import.MAX_SLOTS:
+            raise ValueError("Files can have up to {} slots"
+                             .format(Import.MAX_SLOTS))
+    created, skipped = calendar.create_slots(slots,
+                                             batch_size=Import.CHUNK_SIZE)
+    return {'created': len(created),
+            'conflicts': [format_event_info(*slot[:3]) for slot in skipped],
+            'errors': errors}
+
+
+def parse(name, lines):
+    """
+    Read the slots of an .ics or .csv file as a stream.
+
+    Args:
+        - name(str): file name.
+        - lines(iterable): lines of the file, as bytes.
+
+    Returns(generator): (line, slot, error) for every row, slot being
+    (day, start_time, end_time, location), or None with the error.
+
+    Raises:
+        ValueError: on unknown formats.
+    """
+    lines = codecs.iterdecode(lines, 'utf-8-sig')
+    extension = name.rsplit(".", 1)[-1].lower()
+    if extension == 'csv':
+        return _parse_csv(lines)
+    if extension == 'ics':
+        return _parse_ics(lines)
+    raise ValueError("Only .ics and .csv files can be imported")
+
+
+def _parse_csv(lines):
+    """
+    Read a CSV file with day, start_time, end_time and location columns,
+    formatted as YYYY-MM-DD and HH:MM.
+    """
+    reader = csv.DictReader(lines)
+    for row in reader:
+        try:
+            day = datetime.date.fromisoformat(_column(row, 'day'))
+            start_time = datetime.time.fromisoformat(
+                _column(row, 'start_time'))
+            end_time = datetime.time.fromisoformat(_column(row, 'end_time'))
+            yield reader.line_num, _slot(day, start_time, end_time,
+                                         row.get('location')), None
+        except (KeyError, ValueError) as err:
+            yield reader.line_num, None, _reason(err)
+
+
+def _column(row, name):
+    if not row.get(name):
+        raise KeyError(name)
+    return row[name].strip()
+
+
+def _parse_ics(lines):
+    """
+    Read the events of an iCalendar file. Weekly recurring events are
+    expanded to one slot per week.
+    """
+    event = None
+    for line, name, params, value in _properties(lines):
+        if name == 'BEGIN' and value.upper() == 'VEVENT':
+            event = {'line': line}
+        elif name == 'END' and value.upper() == 'VEVENT' and event:
+            try:
+                yield from ((event['line'], slot, None)
+                            for slot in _event_slots(event))
+            except (KeyError, OverflowError, ValueError) as err:
+                yield event['line'], None, _reason(err)
+            event = None
+        elif event is not None:
+            event[name] = (params, value)
+
+
+def _properties(lines):
+    """
+    Unfold the content lines of an iCalendar file.
+
+    Returns(generator): (line, name, params, value) for every property.
+    """
+    start, current = 0, None
+    for number, text in enumerate(lines, 1):
+        text = text.rstrip("\r\n")
+        if text[:1] in (" ", "\t") and current is not None:
+            current += text[1:]
+            continue
+        if current:
+            yield _property(start, current)
+        start, current = number, text
+    if current:
+        yield _property(start, current)
+
+
+def _property(line, text):
+    name, _, value = text.partition(":")
+    name, *params = name.split(";")
+    params = dict(param.partition("=")[::2] for param in params)
+    return line, name.upper(), params, value
+
+
+def _event_slots(event):
+    """
+    Get the slots of an iCalendar event.
+    """
+    start = _datetime(*event['DTSTART'])
+    if 'DTEND' not in event:
+        raise ValueError("Events must have a DTEND")
+    end = _datetime(*event['DTEND'])
+    if start.date() != end.date():
+        raise ValueError("Events must start and end on the same day")
+    location = _unescape(event['LOCATION'][1]) \
+        if 'LOCATION' in event else None
+    days = [start.date()]
+    if 'RRULE' in event:
+        days = _weekly_days(start, event['RRULE'][1],
+                            event.get('EXDATE', ({}, ''))[1])
+    return [_slot(day, start.time(), end.time(), location) for day in days]
+
+
+def _weekly_days(start, rule, exdates):
+    """
+    Expand a weekly recurrence rule ending with UNTIL or COUNT, repeating
+    on the week day it starts.
+    """
+    rule = dict(part.partition("=")[::2] for part in rule.upper().split(";"))
+    interval = int(rule.pop('INTERVAL', 1))
+    if interval < 1:
+        raise ValueError("Recurrence interval must be at least 1")
+    if rule.pop('FREQ', None) != 'WEEKLY':
+        raise ValueError("Only weekly recurrences are supported")
+    # Slots repeat on the day they start, so that is the only BYDAY allowed.
+    if rule.get('BYDAY') == Import.WEEK_DAYS[start.weekday()]:
+        del rule['BYDAY']
+    rule.pop('WKST', None)
+    unsupported = sorted(set(rule) - {'UNTIL', 'COUNT'})
+    if unsupported:
+        raise ValueError("Unsupported recurrence rule part {}"
+                         .format(", ".join(unsupported)))
+    if 'UNTIL' in rule:
+        last_day = _datetime({}, rule['UNTIL']).date()
+        count = Import.MAX_SLOTS + 1
+    elif 'COUNT' in rule:
+        # More than Import.MAX_SLOTS occurrences fail the import anyway.
+        last_day = datetime.date.max
+        count = min(int(rule['COUNT']), Import.MAX_SLOTS + 1)
+    else:
+        raise ValueError("Recurrences must end with UNTIL or COUNT")
+    skipped = {_datetime({}, exdate).date()
+               for exdate in exdates.split(",") if exdate}
+    days, day = [], start.date()
+    while day <= last_day and len(days) < count:
+        if day not in skipped:
+            days.append(day)
+        day += datetime.timedelta(weeks=interval)
+    return days
+
+
+def _datetime(params, value):
+    """
+    Parse an iCalendar date time. UTC times are converted to the current
+    time zone, other times are taken as local.
+    """
+    if params.get('VALUE') == 'DATE' or len(value) == 8:
+        raise ValueError("All day events are not supported")
+    moment = datetime.datetime.strptime(value.rstrip("Z"), "%Y%m%dT%H%M%S")
+    if value.endswith("Z"):
+        moment = timezone.make_naive(
+            moment.replace(tzinfo=datetime.timezone.utc))
+    return moment
+
+
+def _slot(day, start_time, end_time, location):
+    if end_time <= start_time:
+        raise ValueError("End time must be greater than start time")
+    location = location.strip() if location else None
+    max_length = Event._meta.get_field('location').max_length
+    if location and len(location) > max_length:
+        raise ValueError("Location is longer than {} characters"
+                         .format(max_length))
+    return day, start_time, end_time, location
+
+
+def _unescape(text):
+    return re.sub(r"\\(.)", lambda match: "\n" if match.group(1) in "nN"
+                  else match.group(1), text)
+
+
+def _reason(err):
+    if isinstance(err, KeyError):
+        return "Missing {}".format(err.args[0])
+    return str(err)
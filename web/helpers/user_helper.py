@@ -1,7 +1,22 @@
+import codecs
+import csv
 import datetime
+import re
+from calendar import monthrange
 
-from ..consts import Language
-from ..models import Client, Calendar, Owner
+from . import cache_helper
+from ..consts import Api, Language
+from ..models import Client, Calendar, CalendarMonth
+
+from django.template.loader import render_to_string
+from django.utils import translation
+from django.utils.safestring import mark_safe
+
+# Template and event filters of the cached month pages.
+MONTH_PAGES = {
+    'available': ('available_times_rows.html', {}),
+    'schedule': ('schedule_event_rows.html', {'free': True}),
+}
 
 
 def is_client(model_object):
@@ -89,37 +104,29 @@ def get_owner_events(owner, **kwargs):
     Returns(list): list of events
 
     """
-    month = kwargs.get("month_filter")
-    year = kwargs.get("year_filter")
     calendar = get_owner_calendar(owner)
-    events = calendar.get_events()
-    if month and year:
-        kwargs.pop('month_filter')
-        kwargs.pop('year_filter')
-        month =\
-            Language.MONTH.get(month) if Language.MONTH.get(month) else month
-        if isinstance(month, str):
-            month = datetime.datetime.strptime(month, "%B").month
-        events = events.filter(day__year=year, day__month=month, **kwargs)
-    return events
+    return get_client_events(calendar, **kwargs)
 
 
 def get_client_calendars(client, **kwargs):
     """
-    Get all the owners calendars associated to the client.
+    Get all the owners calendars associated to the client. The calendars are
+    cached until the client is added to or removed from an owner.
 
     Args:
         - client(Client):
 
     Return(list):
     """
-    owners = Owner.objects.all()
-    calendars = [owner.calendar for owner in owners
-                 if owner.clients.filter(id=client.id)]
+    calendars = cache_helper.get_client_calendars(client.id)
+    if calendars is None:
+        calendars = list(Calendar.objects.filter(owner__clients=client)
+                         .select_related('owner').order_by('id'))
+        cache_helper.set_client_calendars(client.id, calendars)
     _id = kwargs.get('id')
     if _id:
-        calendar = list(filter(lambda x: x.id == _id, calendars))
-        calendars = calendar
+        calendars = [calendar for calendar in calendars
+                     if calendar.id == _id]
     return calendars
 
 
@@ -133,18 +140,242 @@ def get_client_events(calendar, **kwargs):
     Returns(list): list of events
 
     """
-    month = kwargs.get("month_filter")
-    year = kwargs.get("year_filter")
-    events = calendar.get_events()
+    month = kwargs.pop("month_filter", None)
+    year = kwargs.pop("year_filter", None)
     if month and year:
-        kwargs.pop('month_filter')
-        kwargs.pop('year_filter')
-        month =\
-            Language.MONTH.get(month) if Language.MONTH.get(month) else month
-        if isinstance(month, str):
-            month = datetime.datetime.strptime(month, "%B").month
-        events = events.filter(day__year=year, day__month=month,
-                               **kwargs)
-        return events
-    events = events.filter(**kwargs)
-    return events
+        first_day, last_day = month_range(month, year)
+        return calendar.get_events_between(first_day, last_day, **kwargs)
+    return calendar.get_events(**kwargs)
+
+
+def get_month_rows(calendar, page, month, year):
+    """
+    Get the rendered event rows of a calendar month for a page. They are
+    cached until the events of the month change.
+
+    Args:
+        - calendar(Calendar):
+        - page(str): 'available' or 'schedule'.
+        - month(int|str): month number or name, in english or spanish.
+        - year(int|str):
+
+    Returns(str): html, empty if the month has no events.
+    """
+    template, filters = MONTH_PAGES[page]
+    first_day, last_day = month_range(month, year)
+    language = translation.get_language()
+
+    def render():
+        events = calendar.get_events_between(first_day, last_day, **filters)
+        return render_to_string(
+            template, {'events': events, 'language': language}).strip()
+
+    return mark_safe(cache_helper.get_month(
+        calendar.id, CalendarMonth.get_version(calendar, first_day),
+        first_day.year, first_day.month, page, language, render))
+
+
+def get_changes(changes, page=None, added=(), removed=(), reload=False):
+    """
+    Describe the rows changed by a POST, for the page to patch its table
+    in place instead of reloading.
+
+    Args:
+        - changes(str|None): 'json' for event dicts, 'html' for rows
+          rendered as in the page, None for no description.
+        - page(str): page added rows are rendered for, see MONTH_PAGES.
+        - added(list): list of Event instances.
+        - removed(list): event_info of the removed rows.
+        - reload(bool): the change spans more rows than described.
+
+    Returns(dict): {'added': list, 'removed': list, 'reload': bool}, empty
+    without changes.
+    """
+    if changes == 'html':
+        added = [render_to_string(MONTH_PAGES[page][0],
+                                  {'events': [event]}).strip()
+                 for event in added]
+    elif changes == 'json':
+        added = [{'event_info': event.event_info,
+                  'day': event.day,
+                  'start_time': event.start_time,
+                  'end_time': event.end_time,
+                  'location': event.location,
+                  'free': event.free}
+                 for event in added]
+    else:
+        return {}
+    return {'added': added, 'removed': list(removed), 'reload': reload}
+
+
+def get_language(accept_language):
+    """
+    Get the preferred language of an Accept-Language header.
+
+    Args:
+        - accept_language(str|None):
+
+    Returns(str): language tag, 'es' by default.
+    """
+    match = re.match(r'[A-Za-z-]+', (accept_language or '').strip())
+    return match.group().lower() if match else 'es'
+
+
+def get_events_page(user, params):
+    """
+    Get a page of events of the user's calendar, or of one of the client's
+    calendars, from the query parameters of the events API.
+
+    Clients only see free events and their own bookings, without the ids
+    of other clients.
+
+    Args:
+        - user(Client|Owner):
+        - params(dict): from, to, status, calendar, after and limit.
+
+    Returns(tuple): list of event dicts and the cursor of the next page,
+    None on the last one.
+
+    Raises:
+        ValueError: on invalid parameters.
+    """
+    first_day = datetime.date.fromisoformat(params['from']) \
+        if params.get('from') else datetime.date.today()
+    last_day = datetime.date.fromisoformat(params['to']) \
+        if params.get('to') else \
+        first_day + datetime.timedelta(days=Api.DAYS - 1)
+    if not 0 <= (last_day - first_day).days < Api.MAX_DAYS:
+        raise ValueError("Date range must span 1 to {} days"
+                         .format(Api.MAX_DAYS))
+    limit = int(params.get('limit') or Api.PAGE_SIZE)
+    if not 0 < limit <= Api.MAX_PAGE_SIZE:
+        raise ValueError("Limit must be between 1 and {}"
+                         .format(Api.MAX_PAGE_SIZE))
+    after = None
+    if params.get('after'):
+        day, start_time, _id = params['after'].split("|")
+        after = (datetime.date.fromisoformat(day),
+                 datetime.time.fromisoformat(start_time), int(_id))
+
+    status = params.get('status')
+    if is_owner(user):
+        calendar = get_owner_calendar(user)
+        filters = {'free': {'free': True}, 'taken': {'free': False},
+                   None: {}}
+    else:
+        calendars = get_client_calendars(user, id=int(params['calendar'])) \
+            if params.get('calendar') else get_client_calendars(user)
+        calendar = calendars[0] if calendars else None
+        filters = {'free': {'free': True},
+                   'mine': {'free': False, 'client': user},
+                   None: {'free': True}}
+    if status not in filters:
+        raise ValueError("Unknown status {}".format(status))
+    if calendar is None:
+        return [], None
+
+    events, more = calendar.get_events_page(first_day, last_day, after,
+                                            limit, **filters[status])
+    if is_client(user):
+        for event in events:
+            event['mine'] = event.pop('client_id') == user.id
+    cursor = None
+    if more:
+        last = events[-1]
+        cursor = "{}|{}|{}".format(last['day'], last['start_time'],
+                                   last['id'] or 0)
+    return events, cursor
+
+
+def month_range(month, year):
+    """
+    Get the first and last day of a month.
+
+    Args:
+        - month(int|str): month number or name, in english or spanish.
+        - year(int|str):
+
+    Returns(tuple): (first_day, last_day)
+
+    """
+    month =\
+        Language.MONTH.get(month) if Language.MONTH.get(month) else month
+    if isinstance(month, str) and month.isdigit():
+        month = int(month)
+    if isinstance(month, str):
+        month = datetime.datetime.strptime(month, "%B").month
+    year = int(year)
+    first_day = datetime.date(year, month, 1)
+    last_day = datetime.date(year, month, monthrange(year, month)[1])
+    return first_day, last_day
+
+
+def get_slots(event_infos):
+    """
+    Parse the event_info of several rows, see format_event_info.
+
+    Args:
+        - event_infos(list): list of 'YYYY-MM-DD|HH:MM:SS|HH:MM:SS'.
+
+    Returns(list): list of (day, start_time, end_time).
+
+    """
+    if not event_infos or len(event_infos) > Api.MAX_BATCH:
+        raise ValueError("Between 1 and {} events are allowed"
+                         .format(Api.MAX_BATCH))
+    slots = []
+    for event_info in event_infos:
+        day, start_time, end_time = event_info.split("|")
+        slots.append((datetime.date.fromisoformat(day),
+                      datetime.time.fromisoformat(start_time),
+                      datetime.time.fromisoformat(end_time)))
+    return slots
+
+
+def get_batch_results(event_infos, statuses, changes):
+    """
+    Describe the result of each event of a batch, and the rows changed.
+
+    Args:
+        - event_infos(list): the event_info of each event.
+        - statuses(list): the status of each event.
+        - changes(str|None): see get_changes.
+
+    Returns(dict): {'results': [{'event_info': str, 'status': str}]}, with
+    the changes if asked.
+    """
+    results = [{'event_info': event_info, 'status': status}
+               for event_info, status in zip(event_infos, statuses)]
+    changed = [result['event_info'] for result in results
+               if result['status'] == 'ok']
+    return {'results': results, **get_changes(changes, removed=changed)}
+
+
+def get_client_rows(content=None, upload=None):
+    """
+    Get the clients to add from a JSON body or a CSV file with email and
+    identity_number columns.
+
+    Args:
+        - content(dict): {'clients': [{'email': str,
+          'identity_number': int}]}
+        - upload(File): CSV file.
+
+    Returns(list): list of dicts. Rows of a CSV file have their line.
+
+    Raises:
+        ValueError: without clients or with too many of them.
+    """
+    if upload is not None:
+        reader = csv.DictReader(codecs.iterdecode(upload, 'utf-8-sig'))
+        rows = [{'line': reader.line_num,
+                 'email': (row.get('email') or '').strip(),
+                 'identity_number': (row.get('identity_number') or '')
+                 .strip()}
+                for row in reader]
+    else:
+        rows = (content or {}).get('clients') or []
+    if not rows or len(rows) > Api.MAX_CLIENTS:
+        raise ValueError("Between 1 and {} clients are allowed"
+                         .format(Api.MAX_CLIENTS))
+    return rows
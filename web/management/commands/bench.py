@@ -0,0 +1,365 @@
+import datetime
+import http.cookiejar
+import json
+import os
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from web.models import Calendar, Client, Event, Owner
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test import Client as TestClient
+from django.test.testcases import LiveServerThread
+from django.test.utils import (override_settings, setup_test_environment,
+                               teardown_test_environment)
+from django.urls import reverse
+
+BENCH_PASSWORD = 'benchPassword'
+BENCH_FIRST_DAY = datetime.date(2100, 1, 1)
+BENCH_MONTH = 'Enero'
+BENCH_YEAR = 2100
+ROUTES = ['login_user', 'available_events_view', 'add_event',
+          'schedule_event', 'cancel_event']
+
+
+class Command(BaseCommand):
+    help = ("Seed a throwaway database and measure the latency of the "
+            "booking workflow under concurrent users.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--owners', type=int, default=10)
+        parser.add_argument('--clients', type=int, default=20,
+                            help="clients per owner")
+        parser.add_argument('--days', type=int, default=30,
+                            help="days of events per owner")
+        parser.add_argument('--slots', type=int, default=8,
+                            help="events per day")
+        parser.add_argument('--users', type=int, default=8,
+                            help="concurrent simulated users")
+        parser.add_argument('--iterations', type=int, default=10,
+                            help="workflows run by every user")
+        parser.add_argument('--server', action='store_true',
+                            help="drive a local HTTP server instead of the "
+                                 "test client")
+        parser.add_argument('--output', help="write the report to a file")
+
+    def handle(self, *args, **options):
+        """
+        Run the benchmark on a test database, which is destroyed after it,
+        and print the report as JSON.
+        """
+        if options['clients'] * options['owners'] < options['users']:
+            options['clients'] = -(-options['users'] // options['owners'])
+        options['clients'] = min(options['clients'],
+                                 options['days'] * options['slots'])
+
+        old_name, test_file = _create_test_db()
+        setup_test_environment()
+        try:
+            with override_settings(
+                    DEBUG=False,
+                    ALLOWED_HOSTS=settings.ALLOWED_HOSTS + ['localhost']):
+                users = seed(options['owners'], options['clients'],
+                             options['days'], options['slots'])
+                report = run(users, options['users'], options['iterations'],
+                             options['server'])
+        finally:
+            teardown_test_environment()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            if test_file and os.path.exists(test_file):
+                os.remove(test_file)
+
+        report['config'] = {key: options[key] for key in
+                            ['owners', 'clients', 'days', 'slots', 'users',
+                             'iterations', 'server']}
+        report['config']['database'] = connection.vendor
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as report_file:
+                report_file.write(output + "\n")
+        self.stdout.write(output)
+
+
+def _create_test_db():
+    """
+    Create the test database. SQLite uses a file instead of the shared
+    in memory database, so concurrent users wait for each other's writes
+    instead of failing.
+
+    Returns(tuple): original database name and the SQLite file, if any.
+    """
+    test_file = None
+    if connection.vendor == 'sqlite' and \
+            not connection.settings_dict['TEST'].get('NAME'):
+        test_file = tempfile.mkstemp(prefix='bench', suffix='.sqlite3')[1]
+        connection.settings_dict['TEST']['NAME'] = test_file
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True,
+                                       serialize=False)
+    return old_name, test_file
+
+
+def seed(owners, clients, days, slots):
+    """
+    Create the owners, their calendars, clients and free events.
+
+    Every client gets its own event to book, so users measure the
+    database and not each other's conflicts.
+
+    Args:
+        - owners(int):
+        - clients(int): clients per owner.
+        - days(int): days of events per owner.
+        - slots(int): events per day.
+
+    Returns(list): (owner, client, calendar, event) for every client.
+    """
+    password = make_password(BENCH_PASSWORD)
+    owner_rows = Owner.objects.bulk_create([
+        Owner(id=int("1{}".format(10000000 + number)),
+              owner_id=1000 + number,
+              email='owner{}@bench.com'.format(number), password=password,
+              first_name='owner', last_name='bench',
+              identity_number=10000000 + number)
+        for number in range(owners)])
+    calendars = Calendar.objects.bulk_create([
+        Calendar(summary='calendar {}'.format(number), owner=owner)
+        for number, owner in enumerate(owner_rows)])
+    client_rows = Client.objects.bulk_create([
+        Client(id=int("2{}".format(20000000 + number)),
+               email='client{}@bench.com'.format(number), password=password,
+               first_name='client', last_name='bench',
+               identity_number=20000000 + number)
+        for number in range(owners * clients)])
+    Owner.clients.through.objects.bulk_create([
+        Owner.clients.through(owner=owner_rows[number // clients],
+                              client=client)
+        for number, client in enumerate(client_rows)])
+    Event.objects.bulk_create([
+        Event(day=BENCH_FIRST_DAY + datetime.timedelta(days=day),
+              start_time=datetime.time(8 + slot, 00),
+              end_time=datetime.time(8 + slot, 30),
+              location='bench',
+              calendar=calendar)
+        for calendar in calendars
+        for day in range(days)
+        for slot in range(slots)])
+
+    # Consecutive users belong to different owners.
+    users = []
+    for index in range(clients):
+        for number in range(owners):
+            users.append((owner_rows[number],
+                          client_rows[number * clients + index],
+                          calendars[number],
+                          (BENCH_FIRST_DAY +
+                           datetime.timedelta(days=index // slots),
+                           datetime.time(8 + index % slots, 00),
+                           datetime.time(8 + index % slots, 30))))
+    return users
+
+
+def run(users, concurrency, iterations, server):
+    """
+    Run the workflows of the simulated users concurrently.
+
+    Args:
+        - users(list): seeded (owner, client, calendar, event).
+        - concurrency(int): simulated users.
+        - iterations(int): workflows run by every user.
+        - server(bool): drive a local HTTP server.
+
+    Returns(dict): report by route.
+    """
+    live_server = None
+    if server:
+        live_server = LiveServerThread('localhost', lambda handler: handler)
+        live_server.daemon = True
+        live_server.start()
+        live_server.is_ready.wait()
+        if live_server.error:
+            raise live_server.error
+        base_url = 'http://localhost:{}'.format(live_server.port)
+
+    latencies = {route: [] for route in ROUTES}
+    errors = {route: 0 for route in ROUTES}
+    lock = threading.Lock()
+
+    def simulate(number):
+        browser = HttpBrowser(base_url) if server else TestBrowser()
+        owner, client, calendar, event = users[number % len(users)]
+        try:
+            for iteration in range(iterations):
+                new_day = BENCH_FIRST_DAY + datetime.timedelta(
+                    days=3650 + number * iterations + iteration)
+                for route, status in _workflow(browser, owner, client,
+                                               calendar, event, new_day):
+                    with lock:
+                        latencies[route[0]].append(route[1])
+                        if status != 200:
+                            errors[route[0]] += 1
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=simulate, args=(number,))
+               for number in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - start
+
+    if live_server:
+        live_server.terminate()
+
+    return {
+        'seconds': round(seconds, 3),
+        'routes': {route: _summary(latencies[route], errors[route], seconds)
+                   for route in ROUTES},
+    }
+
+
+def _workflow(browser, owner, client, calendar, event, new_day):
+    """
+    Run a booking workflow: the owner logs in, lists the month and adds an
+    event, then the client logs in, books an event and cancels it.
+
+    Returns(generator): ((route, seconds), status) for every request.
+    """
+    day, start_time, end_time = event
+    event_info = '{}|{}|{}'.format(day, start_time, end_time)
+
+    yield browser.request('login_user', 'post', reverse('login_user'), {
+        'is_client': False, 'is_owner': True,
+        'email': owner.email, 'password': BENCH_PASSWORD})
+    yield browser.request(
+        'available_events_view', 'get', '{}?{}'.format(
+            reverse('available_events_view'),
+            urllib.parse.urlencode({'month_filter': BENCH_MONTH,
+                                    'year_filter': BENCH_YEAR})))
+    yield browser.request('add_event', 'post', reverse('add_event'), {
+        'day': str(new_day), 'start_time': '20:00', 'end_time': '20:30',
+        'location_name': 'bench', 'recurrent': False})
+    browser.logout()
+
+    yield browser.request('login_user', 'post', reverse('login_user'), {
+        'is_client': True, 'is_owner': False,
+        'email': client.email, 'password': BENCH_PASSWORD})
+    yield browser.request('schedule_event', 'post', reverse('schedule_event'),
+                          {'event_info': event_info,
+                           'calendar': calendar.id})
+    yield browser.request('cancel_event', 'post', reverse('cancel_event'),
+                          {'event_info': event_info,
+                           'calendar': calendar.id})
+    browser.logout()
+
+
+def _summary(latencies, errors, seconds):
+    """
+    Summarize the latencies of a route.
+
+    Args:
+        - latencies(list): seconds of every request.
+        - errors(int): requests not answered with a 200.
+        - seconds(float): duration of the run.
+
+    Returns(dict):
+    """
+    latencies = sorted(latencies)
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput': round(len(latencies) / seconds, 2) if seconds else 0,
+        'p50_ms': _percentile(latencies, 50),
+        'p95_ms': _percentile(latencies, 95),
+        'p99_ms': _percentile(latencies, 99),
+    }
+
+
+def _percentile(latencies, percentile):
+    """
+    Get a percentile of sorted latencies, by the nearest rank method.
+
+    Args:
+        - latencies(list): sorted seconds.
+        - percentile(int):
+
+    Returns(float): milliseconds.
+    """
+    if not latencies:
+        return None
+    rank = max(-(-percentile * len(latencies) // 100), 1)
+    return round(latencies[rank - 1] * 1000, 3)
+
+
+class TestBrowser:
+    """
+    Simulated user driving the routes with the Django test client.
+    """
+
+    def __init__(self):
+        self.client = TestClient(raise_request_exception=False)
+
+    def request(self, route, method, url, content=None):
+        start = time.perf_counter()
+        if method == 'post':
+            response = self.client.post(url, content,
+                                        content_type='application/json')
+        else:
+            response = self.client.get(url)
+        return (route, time.perf_counter() - start), response.status_code
+
+    def logout(self):
+        self.client.cookies.clear()
+
+
+class HttpBrowser:
+    """
+    Simulated user driving the routes of a local HTTP server, with its own
+    cookies and CSRF token.
+    """
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(self.cookies))
+
+    def request(self, route, method, url, content=None):
+        if method == 'post' and self._csrf_token() is None:
+            self.opener.open(self.base_url + reverse('login')).read()
+        data = None
+        headers = {}
+        if method == 'post':
+            data = json.dumps(content).encode('utf-8')
+            headers = {'Content-Type': 'application/json',
+                       'X-CSRFToken': self._csrf_token(),
+                       'Referer': self.base_url}
+        http_request = urllib.request.Request(
+            self.base_url + url, data=data,
+            headers=headers)
+        start = time.perf_counter()
+        try:
+            with self.opener.open(http_request) as response:
+                response.read()
+                status = response.status
+        except urllib.error.HTTPError as err:
+            status = err.code
+        return (route, time.perf_counter() - start), status
+
+    def logout(self):
+        self.cookies.clear()
+
+    def _csrf_token(self):
+        for cookie in self.cookies:
+            if cookie.name == settings.CSRF_COOKIE_NAME:
+                return cookie.value
+        return None
@@ -0,0 +1,33 @@
+import json
+import os
+
+from web.helpers import import_helper
+from web.models import Calendar
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = ("Import the slots of an .ics or .csv file to a calendar, "
+            "reporting the rows which could not be added.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('calendar', type=int, help="calendar id")
+        parser.add_argument('path', help=".ics or .csv file")
+
+    def handle(self, *args, **options):
+        """
+        Import the file and print the summary as JSON.
+        """
+        try:
+            calendar = Calendar.objects.get(pk=options['calendar'])
+        except Calendar.DoesNotExist:
+            raise CommandError("Calendar {} does not exist"
+                               .format(options['calendar']))
+        with open(options['path'], 'rb') as lines:
+            try:
+                summary = import_helper.import_slots(
+                    calendar, os.path.basename(options['path']), lines)
+            except ValueError as err:
+                raise CommandError(err)
+        self.stdout.write(json.dumps(summary, indent=2))
@@ -0,0 +1,134 @@
+import threading
+
+# Upper bounds, in seconds, of the request latency histogram buckets.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class ViewMetrics:
+    """
+    This class holds the metrics of one view.
+    """
+
+    def __init__(self):
+        self.responses = {}
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.seconds = 0.0
+        self.requests = 0
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.response_bytes = 0
+
+
+class Metrics:
+    """
+    This class aggregates the request metrics of this process by view and
+    exports them in the Prometheus text format.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def observe(self, view, status, seconds, queries, query_seconds,
+                response_bytes):
+        """
+        Record one request.
+
+        Args:
+            - view(str): view name.
+            - status(int): response status code.
+            - seconds(float): request latency.
+            - queries(int): database queries run.
+            - query_seconds(float): time spent in the database.
+            - response_bytes(int): response body size.
+
+        Returns(None):
+        """
+        with self._lock:
+            metrics = self._views.get(view)
+            if metrics is None:
+                metrics = self._views[view] = ViewMetrics()
+            metrics.responses[status] = metrics.responses.get(status, 0) + 1
+            for index, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    metrics.buckets[index] += 1
+                    break
+            metrics.seconds += seconds
+            metrics.requests += 1
+            metrics.queries += queries
+            metrics.query_seconds += query_seconds
+            metrics.response_bytes += response_bytes
+
+    def export(self):
+        """
+        Get the metrics in the Prometheus text format.
+
+        Returns(str):
+        """
+        with self._lock:
+            views = sorted(self._views.items())
+            lines = [
+                "# HELP http_responses_total Responses by view and status.",
+                "# TYPE http_responses_total counter",
+            ]
+            for view, metrics in views:
+                for status, count in sorted(metrics.responses.items()):
+                    lines.append(
+                        'http_responses_total{{view="{}",status="{}"}} {}'
+                        .format(_escape(view), status, count))
+
+            lines += [
+                "# HELP http_request_duration_seconds Request latency by "
+                "view.",
+                "# TYPE http_request_duration_seconds histogram",
+            ]
+            for view, metrics in views:
+                view = _escape(view)
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS, metrics.buckets):
+                    cumulative += count
+                    lines.append(
+                        'http_request_duration_seconds_bucket'
+                        '{{view="{}",le="{}"}} {}'
+                        .format(view, bound, cumulative))
+                lines += [
+                    'http_request_duration_seconds_bucket'
+                    '{{view="{}",le="+Inf"}} {}'
+                    .format(view, metrics.requests),
+                    'http_request_duration_seconds_sum{{view="{}"}} {}'
+                    .format(view, metrics.seconds),
+                    'http_request_duration_seconds_count{{view="{}"}} {}'
+                    .format(view, metrics.requests),
+                ]
+
+            for name, attribute, help_text in (
+                    ('db_queries_total', 'queries',
+                     'Database queries by view.'),
+                    ('db_query_duration_seconds_total', 'query_seconds',
+                     'Time spent in the database by view.'),
+                    ('http_response_bytes_total', 'response_bytes',
+                     'Response body bytes by view.')):
+                lines += ["# HELP {} {}".format(name, help_text),
+                          "# TYPE {} counter".format(name)]
+                for view, metrics in views:
+                    lines.append('{}{{view="{}"}} {}'.format(
+                        name, _escape(view), getattr(metrics, attribute)))
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        """
+        Drop every recorded metric.
+        """
+        with self._lock:
+            self._views = {}
+
+
+def _escape(value):
+    """
+    Escape a Prometheus label value.
+    """
+    return value.replace('\\', '\\\\').replace('"', '\\"')\
+        .replace('\n', '\\n')
+
+
+metrics = Metrics()
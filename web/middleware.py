@@ -0,0 +1,51 @@
+import time
+
+from .metrics import metrics
+
+from django.db import connection
+
+
+class QueryCounter:
+    """
+    This class counts and times the database queries run through the
+    connection it wraps.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - start
+            self.queries += 1
+
+
+class MetricsMiddleware:
+    """
+    This middleware records the latency, database queries, response status
+    and response size of every request by view name.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        start = time.perf_counter()
+        with connection.execute_wrapper(counter):
+            response = self.get_response(request)
+        seconds = time.perf_counter() - start
+
+        match = request.resolver_match
+        metrics.observe(
+            match.view_name if match else 'unresolved',
+            response.status_code,
+            seconds,
+            counter.queries,
+            counter.seconds,
+            0 if response.streaming else len(response.content))
+        return response
@@ -0,0 +1,70 @@
+# Generated by Django 4.0.3 on 2026-10-18 17:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Calendar',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('summary', models.CharField(max_length=50)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Client',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('email', models.CharField(max_length=50, unique=True)),
+                ('password', models.CharField(max_length=100)),
+                ('first_name', models.CharField(max_length=20)),
+                ('last_name', models.CharField(max_length=20)),
+                ('identity_number', models.IntegerField(unique=True)),
+                ('last_login', models.DateTimeField(blank=True, null=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('is_authenticated', models.BooleanField(default=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Owner',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('owner_id', models.IntegerField(blank=True, null=True)),
+                ('email', models.CharField(max_length=50, unique=True)),
+                ('password', models.CharField(max_length=100)),
+                ('first_name', models.CharField(max_length=20)),
+                ('last_name', models.CharField(max_length=20)),
+                ('identity_number', models.IntegerField(unique=True)),
+                ('last_login', models.DateTimeField(blank=True, null=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('is_authenticated', models.BooleanField(default=True)),
+                ('clients', models.ManyToManyField(blank=True, to='web.client')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Event',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('location', models.CharField(max_length=50, null=True)),
+                ('free', models.BooleanField(default=True)),
+                ('calendar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='web.calendar')),
+                ('client', models.OneToOneField(null=True, on_delete=django.db.models.deletion.DO_NOTHING, to='web.client')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='calendar',
+            name='owner',
+            field=models.OneToOneField(null=True, on_delete=django.db.models.deletion.CASCADE, to='web.owner'),
+        ),
+    ]
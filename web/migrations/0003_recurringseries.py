@@ -0,0 +1,37 @@
+# Generated by Django 4.0.3 on 2026-10-18 17:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web', '0002_event_calendar_day_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecurringSeries',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('week_day', models.PositiveSmallIntegerField()),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField()),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('location', models.CharField(max_length=50, null=True)),
+                ('skipped_days', models.JSONField(blank=True, default=list)),
+                ('calendar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='web.calendar')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='series',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='web.recurringseries'),
+        ),
+        migrations.AddIndex(
+            model_name='recurringseries',
+            index=models.Index(fields=['calendar', 'week_day', 'start_date'], name='web_recurri_calenda_6f80cc_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.0.3 on 2026-10-18 17:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web', '0003_recurringseries'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['calendar', 'free', 'day'], name='web_event_calenda_da429e_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.0.3 on 2026-10-18 17:00
+
+from django.db import migrations, models
+from django.db.models.functions import ExtractIsoWeekDay
+
+
+def backfill_week_day(apps, schema_editor):
+    """
+    Store the week day of the events created before it was a column, 0 is
+    monday as in date.weekday().
+    """
+    Event = apps.get_model('web', 'Event')
+    Event.objects.update(week_day=ExtractIsoWeekDay('day') - 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web', '0004_event_calendar_free_day_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='week_day',
+            field=models.PositiveSmallIntegerField(default=0),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_week_day, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['calendar', 'week_day', 'start_time', 'day'], name='web_event_calenda_da3074_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.0.3 on 2026-10-18 17:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web', '0005_event_week_day'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='calendar',
+            name='version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.0.3 on 2026-10-18 17:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web', '0006_calendar_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WeeklyTemplate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(blank=True, max_length=50)),
+                ('week_days', models.JSONField(default=list)),
+                ('opening_time', models.TimeField()),
+                ('closing_time', models.TimeField()),
+                ('slot_minutes', models.PositiveSmallIntegerField()),
+                ('breaks', models.JSONField(blank=True, default=list)),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField()),
+                ('location', models.CharField(max_length=50, null=True)),
+                ('calendar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='web.calendar')),
+            ],
+        ),
+    ]
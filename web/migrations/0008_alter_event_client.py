@@ -0,0 +1,19 @@
+# Generated by Django 4.0.3 on 2026-10-18 17:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web', '0007_weeklytemplate'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='event',
+            name='client',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.DO_NOTHING, to='web.client'),
+        ),
+    ]
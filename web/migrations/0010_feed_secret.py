@@ -0,0 +1,37 @@
+# Generated by Django 4.0.3 on 2026-10-18 17:28
+
+from django.db import migrations, models
+import web.models
+
+
+def new_feed_secrets(apps, schema_editor):
+    """
+    Give every existing calendar and client a secret of its own, the added
+    column holds the same one for all the rows.
+    """
+    for name in ('Calendar', 'Client'):
+        model = apps.get_model('web', name)
+        for instance in model.objects.only('pk').iterator():
+            model.objects.filter(pk=instance.pk).update(
+                feed_secret=web.models.new_feed_secret())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web', '0009_calendar_modified'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='calendar',
+            name='feed_secret',
+            field=models.CharField(default=web.models.new_feed_secret, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='client',
+            name='feed_secret',
+            field=models.CharField(default=web.models.new_feed_secret, max_length=32),
+        ),
+        migrations.RunPython(new_feed_secrets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.0.3 on 2026-10-18 17:33
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web', '0010_feed_secret'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CalendarMonth',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('calendar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='web.calendar')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='calendarmonth',
+            constraint=models.UniqueConstraint(fields=('calendar', 'month'), name='unique_calendar_month'),
+        ),
+    ]
@@ -1,14 +1,65 @@
-from datetime import timedelta
+from datetime import datetime, time, timedelta
 from random import randint
+from secrets import token_urlsafe
 
+from . import pubsub
+from .consts import Import, PubSub
+from .helpers import cache_helper
 from utils.logger import logger
 
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Max, Q
+from django.utils import timezone
 from django.core.exceptions import ValidationError
 from django.contrib.auth.hashers import make_password
 
 
-class Client(models.Model):
+class EventTakenError(ValidationError):
+    """
+    Raised when assigning an event which is already taken.
+    """
+    pass
+
+
+def new_feed_secret():
+    """
+    Get a random secret for the feed tokens of a calendar or client.
+
+    Returns(str):
+    """
+    return token_urlsafe(16)
+
+
+class HashedPasswordMixin:
+    """
+    This class hashes the password of a model when it is set or changed,
+    keeping the stored hash on any other save.
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._stored_password = instance.__dict__.get('password')
+        return instance
+
+    def hash_password(self, update_fields=None):
+        """
+        Hash the password if it is not the one stored in the database.
+
+        Args:
+            - update_fields(iterable|None): fields being saved.
+
+        Returns(None):
+        """
+        if update_fields is not None and 'password' not in update_fields:
+            return
+        if self.password == getattr(self, '_stored_password', None):
+            return
+        self.password = make_password(self.password)
+        self._stored_password = self.password
+
+
+class Client(HashedPasswordMixin, models.Model):
     """
     This model defines the Client table.
 
@@ -18,6 +69,8 @@ class Client(models.Model):
         - first_name(str):
         - last_name(str):
         - identity_number(int):
+        - feed_secret(str): signed in the URL of the bookings feed, changed
+          to revoke it.
 
     """
     id = models.IntegerField(primary_key=True)
@@ -29,6 +82,7 @@ class Client(models.Model):
     last_login = models.DateTimeField(null=True, blank=True)
     is_active = models.BooleanField(default=True)
     is_authenticated = models.BooleanField(default=True)
+    feed_secret = models.CharField(max_length=32, default=new_feed_secret)
 
     def __str__(self):
         return "{} {} - {}".format(self.first_name, self.last_name,
@@ -36,14 +90,14 @@ class Client(models.Model):
 
     def save(self, *args, **kwargs):
         """
-        This method hashes the password before saving it.
+        This method hashes the password before saving it, if it was changed.
         """
-        self.password = make_password(self.password)
+        self.hash_password(kwargs.get('update_fields'))
         self.id = int("2{}".format(str(self.identity_number)))
         super().save(*args, **kwargs)
 
 
-class Owner(models.Model):
+class Owner(HashedPasswordMixin, models.Model):
     """
     This model defines the Owner table.
 
@@ -72,11 +126,12 @@ class Owner(models.Model):
     def save(self, *args, **kwargs):
         """
         This method initializes the owner_id with a 4 random digit integer
-        and hashes the password before saving it.
+        and hashes the password before saving it, if it was changed.
         """
         self.id = int("1{}".format(str(self.identity_number)))
-        self.password = make_password(self.password)
-        self.owner_id = randint(1000, 9999)
+        self.hash_password(kwargs.get('update_fields'))
+        if self.owner_id is None:
+            self.owner_id = randint(1000, 9999)
         super().save(*args, **kwargs)
 
     def add_client(self, client):
@@ -87,9 +142,61 @@ class Owner(models.Model):
             - client(Client)
 
         """
-        logger.log_info("Adding client {}".format(client))
+        logger.log_info("Adding client %s", client)
         self.clients.add(client)
 
+    def add_clients(self, rows):
+        """
+        This method adds several clients to the owner, finding them with one
+        query and linking them with one insert. Clients already added are
+        skipped.
+
+        Args:
+            - rows(list): dicts with the email and identity_number of a
+              client, one of them can be missing.
+
+        Returns(tuple): list of the newly added clients and list of the rows
+        matching no client.
+
+        """
+        keys = [(row.get('email') or None, _identity_number(row))
+                for row in rows]
+        emails = {email for email, _ in keys if email}
+        numbers = {number for _, number in keys if number}
+        clients = list(Client.objects.filter(
+            Q(email__in=emails) | Q(identity_number__in=numbers)))
+        by_email = {client.email: client for client in clients}
+        by_number = {client.identity_number: client for client in clients}
+
+        added, unknown = {}, []
+        for row, (email, number) in zip(rows, keys):
+            matches = {by_email.get(email) if email else None,
+                       by_number.get(number) if number else None} - {None}
+            client = matches.pop() if len(matches) == 1 else None
+            if client is None or \
+                    email and client.email != email or \
+                    number and client.identity_number != number:
+                unknown.append(row)
+            else:
+                added[client.pk] = client
+
+        linked = set(self.clients.filter(pk__in=added).values_list(
+            'pk', flat=True))
+        added = {pk: client for pk, client in added.items()
+                 if pk not in linked}
+        logger.log_info("Adding %s clients, %s already added, %s unknown",
+                        len(added), len(linked), len(unknown))
+        with transaction.atomic():
+            # Conflicts are links added since by a concurrent request.
+            Owner.clients.through.objects.bulk_create(
+                [Owner.clients.through(owner=self, client=client)
+                 for client in added.values()],
+                ignore_conflicts=True)
+            # bulk_create does not send m2m_changed.
+            transaction.on_commit(
+                lambda: cache_helper.invalidate_client_calendars(added))
+        return list(added.values()), unknown
+
     def delete_client(self, client_id_number):
         """
         This method removes a client by client identity number.
@@ -102,12 +209,12 @@ class Owner(models.Model):
         """
         client = self.clients.all().filter(identity_number=client_id_number)
         if client:
-            logger.log_info("Deleting client {}".format(client_id_number))
+            logger.log_info("Deleting client %s", client_id_number)
             self.clients.remove(client[0])
             return
 
-        logger.log_error("Client {} not found. Unable to delete"
-                         .format(client_id_number))
+        logger.log_error("Client %s not found. Unable to delete",
+                         client_id_number)
 
 
 class Calendar(models.Model):
@@ -117,10 +224,18 @@ class Calendar(models.Model):
     fields:
         - summary(str): Calendar name.
         - owner(Owner): The owner the calendar belongs to.
+        - version(int): Bumped on every change of the calendar's events.
+        - modified(DateTimeField): Time of the last change of the calendar's
+          events.
+        - feed_secret(str): signed in the URL of the calendar feed, changed
+          to revoke it.
 
     """
     summary = models.CharField(max_length=50)
     owner = models.OneToOneField(Owner, on_delete=models.CASCADE, null=True)
+    version = models.PositiveBigIntegerField(default=0)
+    modified = models.DateTimeField(default=timezone.now)
+    feed_secret = models.CharField(max_length=32, default=new_feed_secret)
 
     def __str__(self):
         return "{} {}".format(self.owner.email, self.summary)
@@ -128,7 +243,8 @@ class Calendar(models.Model):
     def create_event(self, day, start_time, end_time, location,
                      recurrent=False):
         """
-        Creates a new event on this calendar.
+        Creates a new event on this calendar. Recurrent events are stored as
+        a weekly RecurringSeries lasting one year.
 
         Args:
             - day(date):
@@ -137,43 +253,45 @@ class Calendar(models.Model):
             - location(string):
             - recurrent(bool):
 
-        Returns(None):
+        Returns(list): list of the created events, empty for recurrent
+        events.
 
         """
         if end_time <= start_time:
             logger.log_error("End time must be greater than start time")
             raise ValidationError("End time must be greater than start time")
 
-        events = Event.objects.filter(day=day, calendar=self)
-        if events.exists():
-            for event in events:
-                if self._check_overlap(
-                        event.start_time,
-                        event.end_time,
-                        start_time,
-                        end_time):
-                    logger.log_error("This event overlaps with another event")
-                    raise ValidationError(
-                        "This event overlaps with another event")
-
-        Event.objects.create(
-            day=day,
-            start_time=start_time,
-            end_time=end_time,
-            location=location,
-            calendar=self)
-        logger.log_info("New event added")
-        if recurrent:
-            logger.log_info("Creating recurrent event")
-            end_date = day + timedelta(days=365)
-            next_date = day + timedelta(days=7)
-            while next_date < end_date:
-                self.create_event(next_date, start_time, end_time, location)
-                next_date += timedelta(days=7)
+        if not recurrent:
+            with transaction.atomic():
+                events = self._bulk_create_events([day], start_time,
+                                                  end_time, location)
+                self._changed('added', day, start_time, end_time)
+            logger.log_info("New event added")
+            return events
+
+        logger.log_info("Creating recurrent event")
+        end_date = day + timedelta(days=364)
+        with transaction.atomic():
+            self._lock()
+            series = RecurringSeries(
+                calendar=self,
+                week_day=day.weekday(),
+                start_date=day,
+                end_date=end_date,
+                start_time=start_time,
+                end_time=end_time,
+                location=location)
+            self._raise_on_conflicts(
+                list(series.occurrences(day, end_date)), start_time, end_time)
+            series.save()
+            self._changed('reload', days=month_days(day, end_date))
+        logger.log_info("New recurrent event added")
+        return []
 
     def delete_event(self, day, start_time, end_time, all_events=False):
         """
-        Delete an event.
+        Delete an event. With all_events, delete every recurrence of the
+        event from day on, keeping the past ones.
 
         Args:
             - day(date):
@@ -181,24 +299,46 @@ class Calendar(models.Model):
             - end_time(time):
             - all_events(bool):
 
-        Returns(None):
+        Returns(int): number of deleted events and skipped occurrences, or
+        of deleted or shortened events and series with all_events.
         """
-        logger.log_info("Deleting event {}:{}-{}".format(
-                        day, start_time, end_time))
+        logger.log_info("Deleting event %s:%s-%s", day, start_time, end_time)
 
-        if all_events:
-            week_day = (day.weekday() + 1) % 7 + 1
-            event = Event.objects.filter(
-                calendar=self,
-                start_time=start_time,
-                end_time=end_time,
-                day__week_day=week_day)
-            event.delete()
-            return
-        Event.objects.filter(
-            calendar=self, day=day,
+        series = RecurringSeries.objects.filter(
+            calendar=self,
+            week_day=day.weekday(),
             start_time=start_time,
-            end_time=end_time).delete()
+            end_time=end_time)
+        events = Event.objects.filter(
+            calendar=self,
+            week_day=day.weekday(),
+            start_time=start_time,
+            end_time=end_time)
+        if not all_events:
+            with transaction.atomic():
+                deleted = sum(
+                    recurring.skip(day)
+                    for recurring in series.select_for_update().filter(
+                        start_date__lte=day, end_date__gte=day))
+                deleted += events.filter(day=day).delete()[0]
+                self._changed('removed', day, start_time, end_time)
+                return deleted
+
+        first_day = max(day, timezone.localdate())
+        with transaction.atomic():
+            last_days = [
+                events.filter(day__gte=first_day).aggregate(
+                    last_day=Max('day'))['last_day'],
+                series.filter(end_date__gte=first_day).aggregate(
+                    last_day=Max('end_date'))['last_day'],
+            ]
+            last_day = max(filter(None, last_days), default=first_day)
+            deleted = events.filter(day__gte=first_day).delete()[0]
+            deleted += series.filter(start_date__gte=first_day).delete()[0]
+            deleted += series.filter(end_date__gte=first_day).update(
+                end_date=first_day - timedelta(days=1))
+            self._changed('reload', days=month_days(first_day, last_day))
+        return deleted
 
     def get_events(self, **kwargs):
         """
@@ -210,12 +350,91 @@ class Calendar(models.Model):
             list of Event instances.
 
         """
-        logger.log_info("Getting event {}".format(kwargs))
-        return Event.objects.filter(calendar=self, **kwargs)
+        logger.log_info("Getting event %s", kwargs)
+        # The related manager sets event.calendar, so rendering it does not
+        # query the calendar of every row.
+        return self.event_set.filter(**kwargs)
+
+    def get_events_between(self, first_day, last_day, **kwargs):
+        """
+        Get events linked to this calendar between two days (both included),
+        expanding the recurring series, and filter them by kwargs.
+
+        Series occurrences are free events, so they are only included when
+        the filters do not exclude free events.
+
+        Args:
+            - first_day(date):
+            - last_day(date):
+
+        Returns(list):
+            list of Event instances sorted by day and start time.
+
+        """
+        events = list(self.get_events(day__range=(first_day, last_day),
+                                      **kwargs).select_related('client'))
+        if kwargs.get('free', True) and kwargs.get('client') is None:
+            series = self.recurringseries_set.filter(
+                start_date__lte=last_day,
+                end_date__gte=first_day)
+            for recurring in series:
+                events += recurring.expand(first_day, last_day)
+        return sorted(events, key=lambda event: (event.day, event.start_time))
+
+    def get_events_page(self, first_day, last_day, after=None, limit=100,
+                        **kwargs):
+        """
+        Get a page of the events linked to this calendar between two days
+        (both included), expanding the recurring series, and filter them by
+        kwargs. Events are sorted by day, start time and id and returned as
+        dicts, without creating model instances.
+
+        Series occurrences have no id, they sort as id 0.
+
+        Args:
+            - first_day(date):
+            - last_day(date):
+            - after(tuple): (day, start_time, id) of the last event of the
+              previous page.
+            - limit(int):
+
+        Returns(tuple): list of event dicts and whether there are more.
+
+        """
+        events = self.get_events(day__range=(first_day, last_day), **kwargs)
+        if after:
+            day, start_time, _id = after
+            events = events.filter(
+                Q(day__gt=day) |
+                Q(day=day, start_time__gt=start_time) |
+                Q(day=day, start_time=start_time, id__gt=_id))
+        events = list(events.order_by('day', 'start_time', 'id')
+                      .values('id', 'day', 'start_time', 'end_time',
+                              'location', 'free', 'client_id', 'series_id')
+                      [:limit + 1])
+        if kwargs.get('free', True) and kwargs.get('client') is None:
+            series = self.recurringseries_set.filter(
+                start_date__lte=last_day,
+                end_date__gte=first_day)
+            for recurring in series:
+                for day in recurring.occurrences(first_day, last_day):
+                    event = {'id': None,
+                             'day': day,
+                             'start_time': recurring.start_time,
+                             'end_time': recurring.end_time,
+                             'location': recurring.location,
+                             'free': True,
+                             'client_id': None,
+                             'series_id': recurring.id}
+                    if not after or _page_key(event) > after:
+                        events.append(event)
+        events.sort(key=_page_key)
+        return events[:limit], len(events) > limit
 
     def assign_event(self, client_id_number, day, start_time, end_time):
         """
-        Assign a free event to a client.
+        Assign a free event to a client. Occurrences of a recurring series
+        are stored as events when they are assigned.
 
         Args:
             - day(date):
@@ -226,21 +445,26 @@ class Calendar(models.Model):
         Returns(None):
 
         """
-        logger.log_info("Assigning event {}:{}-{} to client {}"
-                        .format(day, start_time, end_time, client_id_number))
-        event = Event.objects.get(
+        logger.log_info("Assigning event %s:%s-%s to client %s",
+                        day, start_time, end_time, client_id_number)
+        client = Client.objects.get(identity_number=client_id_number)
+        event = Event.objects.filter(
             day=day,
             start_time=start_time,
             end_time=end_time,
             calendar=self)
-        if not event.free:
-            logger.log_error("Event is already taken")
-            raise ValidationError("Event is already taken")
-
-        client = Client.objects.get(identity_number=client_id_number)
-        event.client = client
-        event.free = False
-        event.save()
+        # Checking and taking the event in one statement makes concurrent
+        # bookings of the same event race-free without locking it first.
+        with transaction.atomic():
+            if event.filter(free=True).update(client=client, free=False):
+                self._changed('taken', day, start_time, end_time)
+                return
+            if event.exists() or \
+                    not self._materialize_occurrence(day, start_time,
+                                                     end_time, client=client):
+                logger.log_error("Event is already taken")
+                raise EventTakenError("Event is already taken")
+            self._changed('taken', day, start_time, end_time)
 
     def free_event(self, day, start_time, end_time):
         """
@@ -253,8 +477,7 @@ class Calendar(models.Model):
 
         Returns(None):
         """
-        logger.log_info("Freing Event {}:{}-{}"
-                        .format(day, start_time, end_time))
+        logger.log_info("Freing Event %s:%s-%s", day, start_time, end_time)
         event = Event.objects.get(
             day=day,
             start_time=start_time,
@@ -262,31 +485,805 @@ class Calendar(models.Model):
             calendar=self)
         event.client = None
         event.free = True
-        event.save()
+        with transaction.atomic():
+            event.save()
+            self._changed('freed', day, start_time, end_time)
+
+    def assign_events(self, client_id_number, slots, atomic=False):
+        """
+        Assign several free events to a client, finding them with one query
+        and taking them with one update. Occurrences of recurring series are
+        stored as events with one insert.
+
+        Args:
+            - client_id_number(int):
+            - slots(list): list of (day, start_time, end_time).
+            - atomic(bool): assign none of the events unless all of them
+              are free.
+
+        Returns(list): status of each slot, 'ok', 'taken', 'not_found' or
+        'rolled_back' when another slot failed in atomic mode.
+
+        """
+        logger.log_info("Assigning %s events to client %s", len(slots),
+                        client_id_number)
+        client = Client.objects.get(identity_number=client_id_number)
+        with transaction.atomic():
+            events = self._slot_events(slots)
+            free = [slot for slot, event in events.items() if event.free]
+            Event.objects.filter(
+                pk__in=[events[slot].pk for slot in free]).update(
+                    client=client, free=False)
+            stored = self._materialize_occurrences(
+                [slot for slot in slots if slot not in events], client)
+            statuses = self._batch_statuses(
+                slots, set(free).union(stored), events, 'taken', atomic)
+            if 'ok' in statuses:
+                self._batch_changed('taken', free + stored)
+        return statuses
+
+    def free_events(self, slots, client=None, atomic=False):
+        """
+        Free several events with one query to find them and one update.
+
+        Args:
+            - slots(list): list of (day, start_time, end_time).
+            - client(Client): only free the events of this client.
+            - atomic(bool): free none of the events unless all of them are
+              taken.
+
+        Returns(list): status of each slot, 'ok', 'free', 'not_found' or
+        'rolled_back' when another slot failed in atomic mode.
+
+        """
+        logger.log_info("Freeing %s events", len(slots))
+        filters = {'client': client} if client else {}
+        with transaction.atomic():
+            events = self._slot_events(slots, **filters)
+            taken = [slot for slot, event in events.items() if not event.free]
+            Event.objects.filter(
+                pk__in=[events[slot].pk for slot in taken]).update(
+                    client=None, free=True)
+            statuses = self._batch_statuses(slots, set(taken), events,
+                                            'free', atomic)
+            if 'ok' in statuses:
+                self._batch_changed('freed', taken)
+        return statuses
+
+    def create_slots(self, slots, location=None, batch_size=None):
+        """
+        Create several events at once, skipping the ones overlapping an
+        event, a recurring series occurrence or an earlier slot. Conflicts
+        are found with one query per table and a sweep over each day, and
+        the events are created with one insert per batch.
+
+        Args:
+            - slots(list): list of (day, start_time, end_time), or of
+              (day, start_time, end_time, location).
+            - location(string): location of the slots without one.
+            - batch_size(int): events per insert, all of them by default.
+
+        Returns(tuple): list of the created events and sorted list of the
+        skipped slots.
+
+        """
+        if not slots:
+            return [], []
+        slots = sorted(slots, key=lambda slot: slot[:3])
+        first_day, last_day = slots[0][0], slots[-1][0]
+        week_days = {slot[0].weekday() for slot in slots}
+        opening_time = min(slot[1] for slot in slots)
+        closing_time = max(slot[2] for slot in slots)
+        with transaction.atomic():
+            self._lock()
+            busy = {}
+            for day, start_time, end_time in Event.objects.filter(
+                    calendar=self,
+                    day__range=(first_day, last_day),
+                    week_day__in=week_days,
+                    start_time__lt=closing_time,
+                    end_time__gt=opening_time).values_list(
+                        'day', 'start_time', 'end_time'):
+                busy.setdefault(day, []).append((start_time, end_time))
+            for recurring in RecurringSeries.objects.filter(
+                    calendar=self,
+                    week_day__in=week_days,
+                    start_date__lte=last_day,
+                    end_date__gte=first_day,
+                    start_time__lt=closing_time,
+                    end_time__gt=opening_time):
+                for day in recurring.occurrences(first_day, last_day):
+                    busy.setdefault(day, []).append(
+                        (recurring.start_time, recurring.end_time))
+
+            days = {}
+            for slot in slots:
+                days.setdefault(slot[0], []).append(slot)
+            created, skipped = [], []
+            for day, day_slots in days.items():
+                accepted, overlapping = _sweep(day_slots, busy.get(day, ()))
+                skipped.extend(overlapping)
+                created.extend(
+                    Event(day=day, start_time=slot[1], end_time=slot[2],
+                          location=slot[3] if len(slot) > 3 else location,
+                          calendar=self)
+                    for slot in accepted)
+            created = Event.objects.bulk_create(created,
+                                                batch_size=batch_size)
+            if created:
+                self._changed('reload',
+                              days={event.day for event in created})
+        logger.log_info("Created %s slots, skipped %s", len(created),
+                        len(skipped))
+        return created, sorted(skipped, key=lambda slot: slot[:3])
+
+    def _changed(self, change, day=None, start_time=None, end_time=None,
+                 days=()):
+        """
+        Bump the version and modification time of this calendar and the
+        version of the months changed, which drops their rendered rows, and
+        once the current transaction commits publish the change: to the
+        month of the event, or to the whole calendar without one.
+
+        It runs after the events are written, so the calendar row is always
+        locked last, and before its months.
+
+        Args:
+            - change(str): added, removed, taken, freed or reload.
+            - day(date):
+            - start_time(time|str):
+            - end_time(time|str):
+            - days(iterable): days changed by a reload, any day of each
+              month.
+
+        Returns(None):
+        """
+        Calendar.objects.filter(pk=self.pk).update(
+            version=F('version') + 1, modified=timezone.now())
+        CalendarMonth.bump(self, [day] if day is not None else days)
+        if day is None:
+            transaction.on_commit(lambda: pubsub.publish(
+                PubSub.CALENDAR.format(self.pk), {'type': change}))
+            return
+
+        message = {
+            'type': change,
+            'event_info': format_event_info(day, start_time, end_time),
+        }
+        transaction.on_commit(lambda: pubsub.publish(
+            PubSub.MONTH.format(self.pk, day.year, day.month), message))
+
+    def _batch_changed(self, change, slots):
+        """
+        Notify the change of several slots, as one change of the calendar
+        if there is more than one.
+
+        Args:
+            - change(str): see _changed.
+            - slots(list): list of (day, start_time, end_time).
+
+        Returns(None):
+        """
+        if len(slots) == 1:
+            self._changed(change, *slots[0])
+        else:
+            self._changed('reload', days={slot[0] for slot in slots})
+
+    def _batch_statuses(self, slots, done, events, failure, atomic):
+        """
+        Get the status of each slot of a batch, rolling back the current
+        transaction if a slot failed in atomic mode.
+
+        Args:
+            - slots(list): list of (day, start_time, end_time).
+            - done(set): the slots changed.
+            - events(dict): the events found by slot.
+            - failure(str): status of the slots found but not changed.
+            - atomic(bool):
+
+        Returns(list): list of statuses. A slot repeated in the batch is
+        changed once, its later copies get the failure status.
+        """
+        statuses, seen = [], set()
+        for slot in slots:
+            if slot in done and slot not in seen:
+                statuses.append('ok')
+            elif slot in done or slot in events:
+                statuses.append(failure)
+            else:
+                statuses.append('not_found')
+            seen.add(slot)
+        if atomic and any(status != 'ok' for status in statuses):
+            logger.log_error("Batch rolled back: %s", statuses)
+            transaction.set_rollback(True)
+            statuses = [status if status != 'ok' else 'rolled_back'
+                        for status in statuses]
+        return statuses
+
+    def _slot_events(self, slots, **kwargs):
+        """
+        Lock and get the stored events of several slots with one query.
+
+        Args:
+            - slots(list): list of (day, start_time, end_time).
+            - kwargs: extra filters.
+
+        Returns(dict): events by (day, start_time, end_time).
+        """
+        if not slots:
+            return {}
+        query = Q()
+        for day, start_time, end_time in slots:
+            query |= Q(day=day, start_time=start_time, end_time=end_time)
+        return {(event.day, event.start_time, event.end_time): event
+                for event in Event.objects.select_for_update().filter(
+                    query, calendar=self, **kwargs).only(
+                        'id', 'day', 'start_time', 'end_time', 'free')}
+
+    def _materialize_occurrences(self, slots, client):
+        """
+        Store the occurrences of recurring series of several slots as events
+        assigned to client, with one query to find the series, one insert
+        and one update of their skipped days.
+
+        Args:
+            - slots(list): list of (day, start_time, end_time).
+            - client(Client):
+
+        Returns(list): the slots stored.
+        """
+        if not slots:
+            return []
+        days = [day for day, _, _ in slots]
+        series = RecurringSeries.objects.select_for_update().filter(
+            calendar=self,
+            week_day__in={day.weekday() for day in days},
+            start_date__lte=max(days),
+            end_date__gte=min(days),
+            start_time__in={start_time for _, start_time, _ in slots})
+        by_time = {}
+        for recurring in series:
+            by_time.setdefault(
+                (recurring.week_day, recurring.start_time,
+                 recurring.end_time), []).append(recurring)
+
+        stored, events, changed = [], [], {}
+        for slot in dict.fromkeys(slots):
+            day, start_time, end_time = slot
+            recurring = next(
+                (recurring for recurring in by_time.get(
+                    (day.weekday(), start_time, end_time), ())
+                 if recurring.start_date <= day <= recurring.end_date and
+                 day.isoformat() not in recurring.skipped_days), None)
+            if recurring is None:
+                continue
+            recurring.skipped_days.append(day.isoformat())
+            changed[recurring.pk] = recurring
+            stored.append(slot)
+            events.append(Event(
+                day=day,
+                start_time=start_time,
+                end_time=end_time,
+                location=recurring.location,
+                free=False,
+                client=client,
+                calendar=self,
+                series=recurring))
+        if events:
+            RecurringSeries.objects.bulk_update(changed.values(),
+                                                ['skipped_days'])
+            Event.objects.bulk_create(events)
+        return stored
+
+    def _lock(self):
+        """
+        Lock the calendar row until the end of the current transaction, so
+        concurrent writers on the same calendar serialize between the
+        overlap check and the insert.
+
+        Overlaps are not left to a database exclusion constraint: the
+        occurrences of a RecurringSeries are not rows, so a constraint on
+        the event table could not see them, and every method creating
+        events or series checks them under this lock.
+        """
+        Calendar.objects.select_for_update().filter(pk=self.pk).first()
+
+    def _bulk_create_events(self, days, start_time, end_time, location):
+        """
+        Create the same event on several days with one overlap query and one
+        insert. Nothing is created if any of the days overlaps.
+
+        Args:
+            - days(list): sorted list of dates.
+            - start_time(time):
+            - end_time(time):
+            - location(string):
+
+        Returns(list): list of the created events.
+
+        """
+        with transaction.atomic():
+            self._lock()
+            self._raise_on_conflicts(days, start_time, end_time)
+            return Event.objects.bulk_create([
+                Event(day=day, start_time=start_time, end_time=end_time,
+                      location=location, calendar=self)
+                for day in days])
+
+    def _materialize_occurrence(self, day, start_time, end_time,
+                                client=None):
+        """
+        Store the occurrence of a recurring series as an event, assigned to
+        client if given.
+
+        Args:
+            - day(date):
+            - start_time(time):
+            - end_time(time):
+            - client(Client):
+
+        Returns(Event|None):
+            None if the occurrence was already stored.
 
-    def _check_overlap(self, fixed_start, fixed_end, new_start, new_end):
         """
-        Check overlap between two events.
+        with transaction.atomic():
+            try:
+                series = RecurringSeries.objects.select_for_update().get(
+                    calendar=self,
+                    week_day=day.weekday(),
+                    start_date__lte=day,
+                    end_date__gte=day,
+                    start_time=start_time,
+                    end_time=end_time)
+            except RecurringSeries.DoesNotExist:
+                raise Event.DoesNotExist("Event does not exist")
+            if day.isoformat() in series.skipped_days:
+                if not Event.objects.filter(day=day, series=series).exists():
+                    raise Event.DoesNotExist("Event does not exist")
+                return None
+            series.skip(day)
+            return Event.objects.create(
+                day=day,
+                start_time=series.start_time,
+                end_time=series.end_time,
+                location=series.location,
+                free=client is None,
+                client=client,
+                calendar=self,
+                series=series)
+
+    def _raise_on_conflicts(self, days, start_time, end_time):
+        """
+        Raise a ValidationError listing the days on which a time range
+        overlaps an event or a recurring series occurrence.
 
         Args:
-            - fixed_start(time):
-            - fixed_end(time):
-            - new_start(time):
-            - new_end(time):
+            - days(list): sorted list of dates.
+            - start_time(time):
+            - end_time(time):
 
-        Returns(bool):
-            True means overlap.
+        Returns(None):
+
+        """
+        conflicts = self._conflicting_days(days, start_time, end_time)
+        if conflicts:
+            conflicts = ", ".join(str(conflict) for conflict in conflicts)
+            logger.log_error("This event overlaps with another event: %s",
+                             conflicts)
+            raise ValidationError(
+                "This event overlaps with another event: {}"
+                .format(conflicts))
 
+    def _conflicting_days(self, days, start_time, end_time):
         """
-        overlap = False
+        Get the days on which a time range overlaps an event or a recurring
+        series occurrence of this calendar.
+
+        Two events overlap when each one starts before the other ends, so
+        back to back events are allowed.
+
+        Args:
+            - days(list): sorted list of dates.
+            - start_time(time):
+            - end_time(time):
 
-        if (new_start >= fixed_start and new_start <= fixed_end) or \
-                (new_end >= fixed_start and new_end <= fixed_end):
-            overlap = True
-        elif new_start <= fixed_start and new_end >= fixed_end:
-            overlap = True
+        Returns(list): sorted list of dates.
+
+        """
+        first_day, last_day = days[0], days[-1]
+        conflicts = set(Event.objects.filter(
+            calendar=self,
+            day__range=(first_day, last_day),
+            start_time__lt=end_time,
+            end_time__gt=start_time).values_list('day', flat=True))
+        series = RecurringSeries.objects.filter(
+            calendar=self,
+            week_day__in={day.weekday() for day in days},
+            start_date__lte=last_day,
+            end_date__gte=first_day,
+            start_time__lt=end_time,
+            end_time__gt=start_time)
+        for recurring in series:
+            conflicts.update(recurring.occurrences(first_day, last_day))
+        return sorted(conflicts.intersection(days))
 
-        return overlap
+
+class CalendarMonth(models.Model):
+    """
+    This model defines the CalendarMonth table, the version of a month of a
+    calendar. Rendered months are cached by it, so a change only drops the
+    months of the events it touched.
+
+    fields:
+        - calendar(Calendar):
+        - month(DateField): first day of the month.
+        - version(int): Bumped on every change of the month's events.
+
+    """
+    calendar = models.ForeignKey(Calendar, on_delete=models.CASCADE)
+    month = models.DateField()
+    version = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['calendar', 'month'],
+                                    name='unique_calendar_month'),
+        ]
+
+    def __str__(self):
+        return "{}: {:%Y-%m} v{}".format(self.calendar.summary, self.month,
+                                         self.version)
+
+    @staticmethod
+    def get_version(calendar, day):
+        """
+        Get the version of the month of a day.
+
+        Args:
+            - calendar(Calendar):
+            - day(date):
+
+        Returns(int): 0 for months never changed.
+        """
+        return CalendarMonth.objects.filter(
+            calendar=calendar, month=day.replace(day=1)).values_list(
+                'version', flat=True).first() or 0
+
+    @staticmethod
+    def bump(calendar, days):
+        """
+        Bump the version of the months of some days. The calendar row must
+        be locked by the caller, so the months are written one change at a
+        time.
+
+        Args:
+            - calendar(Calendar):
+            - days(iterable): dates, any day of each month.
+
+        Returns(None):
+        """
+        months = {day.replace(day=1) for day in days}
+        if not months:
+            return
+        bumped = CalendarMonth.objects.filter(
+            calendar=calendar, month__in=months).update(
+                version=F('version') + 1)
+        if bumped < len(months):
+            # The months just bumped conflict and are skipped.
+            CalendarMonth.objects.bulk_create(
+                [CalendarMonth(calendar=calendar, month=month, version=1)
+                 for month in months],
+                ignore_conflicts=True)
+
+
+def month_days(first_day, last_day):
+    """
+    Get one day of each month between two days.
+
+    Args:
+        - first_day(date):
+        - last_day(date):
+
+    Returns(list): first day of each month.
+    """
+    month = first_day.replace(day=1)
+    days = []
+    while month <= last_day:
+        days.append(month)
+        month = (month + timedelta(days=31)).replace(day=1)
+    return days
+
+
+class WeeklyTemplate(models.Model):
+    """
+    This model defines the WeeklyTemplate table. A template describes the
+    working hours of a week, split in slots, to create many events at once.
+
+    fields:
+        - name(str):
+        - week_days(list): week days with slots, 0 is monday.
+        - opening_time(TimeField): start of the first slot.
+        - closing_time(TimeField): no slots end after this time.
+        - slot_minutes(int): length of every slot.
+        - breaks(list): ['HH:MM', 'HH:MM'] ranges without slots.
+        - start_date(DateField): first day with slots.
+        - end_date(DateField): last day with slots.
+        - location(str):
+        - calendar(Calendar): The calendar the template belongs to.
+
+    """
+    MAX_DAYS = 366
+
+    name = models.CharField(max_length=50, blank=True)
+    week_days = models.JSONField(default=list)
+    opening_time = models.TimeField()
+    closing_time = models.TimeField()
+    slot_minutes = models.PositiveSmallIntegerField()
+    breaks = models.JSONField(default=list, blank=True)
+    start_date = models.DateField()
+    end_date = models.DateField()
+    location = models.CharField(max_length=50, null=True)
+    calendar = models.ForeignKey(Calendar, on_delete=models.CASCADE)
+
+    def __str__(self):
+        return "{}: {} {}".format(self.calendar.summary, self.name,
+                                  self.week_days)
+
+    def clean(self):
+        """
+        Validate the hours, breaks and dates of the template.
+        """
+        if not self.week_days or \
+                not set(self.week_days).issubset(range(7)):
+            raise ValidationError("Week days must be numbers from 0 to 6")
+        if self.closing_time <= self.opening_time:
+            raise ValidationError(
+                "Closing time must be greater than opening time")
+        if not self.slot_minutes or self.slot_minutes < 0:
+            raise ValidationError("Slots must last at least one minute")
+        if datetime.combine(self.start_date, self.opening_time) + \
+                timedelta(minutes=self.slot_minutes) > \
+                datetime.combine(self.start_date, self.closing_time):
+            raise ValidationError(
+                "Slots can not last longer than the opening hours")
+        for start_time, end_time in self.get_breaks():
+            if end_time <= start_time:
+                raise ValidationError(
+                    "Breaks must end after they start")
+        if not 0 <= (self.end_date - self.start_date).days < self.MAX_DAYS:
+            raise ValidationError("Date range must span 1 to {} days"
+                                  .format(self.MAX_DAYS))
+
+    def get_breaks(self):
+        """
+        Get the breaks of the template.
+
+        Returns(list): sorted list of (start_time, end_time).
+        """
+        return sorted((time.fromisoformat(start_time),
+                       time.fromisoformat(end_time))
+                      for start_time, end_time in self.breaks)
+
+    def slots(self):
+        """
+        Get the slots of the template between its start and end dates.
+
+        A slot overlapping a break is moved to the end of the break.
+
+        Returns(list): sorted list of (day, start_time, end_time).
+
+        Raises:
+            ValidationError: if the template has more than Import.MAX_SLOTS
+            slots.
+        """
+        length = timedelta(minutes=self.slot_minutes)
+        breaks = self.get_breaks()
+        week_days = set(self.week_days)
+        slots = []
+        day = self.start_date
+        while day <= self.end_date:
+            if day.weekday() in week_days:
+                start = datetime.combine(day, self.opening_time)
+                closing = datetime.combine(day, self.closing_time)
+                while start + length <= closing:
+                    end = start + length
+                    pause = next(
+                        (datetime.combine(day, break_end)
+                         for break_start, break_end in breaks
+                         if break_start < end.time() and
+                         break_end > start.time()), None)
+                    if pause:
+                        start = pause
+                        continue
+                    if len(slots) == Import.MAX_SLOTS:
+                        raise ValidationError(
+                            "Templates can not create more than {} slots"
+                            .format(Import.MAX_SLOTS))
+                    slots.append((day, start.time(), end.time()))
+                    start = end
+            day += timedelta(days=1)
+        return slots
+
+
+def format_event_info(day, start_time, end_time):
+    """
+    Format the id the pages give to the row of an event.
+
+    Args:
+        - day(date):
+        - start_time(time|str):
+        - end_time(time|str):
+
+    Returns(str): 'YYYY-MM-DD|HH:MM:SS.ffffff|HH:MM:SS.ffffff'
+    """
+    start_time, end_time = [
+        value if isinstance(value, time) else time.fromisoformat(value)
+        for value in (start_time, end_time)]
+    return "{}|{}|{}".format(day.isoformat(),
+                             start_time.strftime("%H:%M:%S.%f"),
+                             end_time.strftime("%H:%M:%S.%f"))
+
+
+def _identity_number(row):
+    try:
+        return int(row.get('identity_number'))
+    except (TypeError, ValueError):
+        return None
+
+
+def _sweep(slots, busy):
+    """
+    Split the slots of one day in two passes over them, sorted by start.
+    Slots overlapping a busy range are skipped first, then of two
+    overlapping free slots the earlier one is kept.
+
+    Args:
+        - slots(list): slots of the day, see Calendar.create_slots.
+        - busy(list): (start_time, end_time) taken ranges of the day.
+
+    Returns(tuple): list of the accepted slots and list of the skipped ones.
+    """
+    merged = []
+    for start, end in sorted(busy):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    free, skipped = [], []
+    index = 0
+    for slot in sorted(slots, key=lambda slot: slot[1:3]):
+        # Ranges ending before this slot also end before the next ones.
+        while index < len(merged) and merged[index][1] <= slot[1]:
+            index += 1
+        if index < len(merged) and merged[index][0] < slot[2]:
+            skipped.append(slot)
+        else:
+            free.append(slot)
+    accepted = []
+    for slot in free:
+        if accepted and slot[1] < accepted[-1][2]:
+            skipped.append(slot)
+        else:
+            accepted.append(slot)
+    return accepted, skipped
+
+
+def _page_key(event):
+    return (event['day'], event['start_time'], event['id'] or 0)
+
+
+class RecurringSeries(models.Model):
+    """
+    This model defines the RecurringSeries table. A series is a weekly event
+    expanded on read instead of being stored once per week.
+
+    fields:
+        - week_day(int): 0 is monday.
+        - start_date(DateField): day of the first occurrence.
+        - end_date(DateField): no occurrences after this day.
+        - start_time(TimeField):
+        - end_time(TimeField):
+        - location(str):
+        - skipped_days(list): iso formatted days with no occurrence, either
+          deleted or stored as an Event.
+        - calendar(Calendar): The calendar the series belongs to.
+
+    """
+    week_day = models.PositiveSmallIntegerField()
+    start_date = models.DateField()
+    end_date = models.DateField()
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    location = models.CharField(max_length=50, null=True)
+    skipped_days = models.JSONField(default=list, blank=True)
+    calendar = models.ForeignKey(Calendar, on_delete=models.CASCADE)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['calendar', 'week_day', 'start_date']),
+        ]
+
+    def __str__(self):
+        return "{}: every {} from {} to {}, {} to {}".format(
+            self.calendar.summary,
+            self.start_date.strftime("%A"),
+            self.start_date,
+            self.end_date,
+            self.start_time,
+            self.end_time)
+
+    def occurrences(self, first_day, last_day):
+        """
+        Get the days of this series between two days (both included).
+
+        Args:
+            - first_day(date):
+            - last_day(date):
+
+        Returns(generator): dates.
+
+        """
+        day = max(first_day, self.start_date)
+        day += timedelta(days=(self.week_day - day.weekday()) % 7)
+        last_day = min(last_day, self.end_date)
+        skipped_days = set(self.skipped_days)
+        while day <= last_day:
+            if day.isoformat() not in skipped_days:
+                yield day
+            day += timedelta(days=7)
+
+    def expand(self, first_day, last_day):
+        """
+        Get the occurrences of this series between two days as unsaved free
+        events.
+
+        Args:
+            - first_day(date):
+            - last_day(date):
+
+        Returns(list): list of Event instances.
+
+        """
+        return [Event(day=day,
+                      week_day=day.weekday(),
+                      start_time=self.start_time,
+                      end_time=self.end_time,
+                      location=self.location,
+                      calendar=self.calendar,
+                      series=self)
+                for day in self.occurrences(first_day, last_day)]
+
+    def skip(self, day):
+        """
+        Stop generating the occurrence of a day.
+
+        Args:
+            - day(date):
+
+        Returns(bool): False if the occurrence was already skipped.
+
+        """
+        if day.isoformat() in self.skipped_days:
+            return False
+        self.skipped_days.append(day.isoformat())
+        self.save(update_fields=['skipped_days'])
+        return True
+
+
+class EventQuerySet(models.QuerySet):
+    """
+    This class defines the Event QuerySet.
+    """
+
+    def bulk_create(self, objs, *args, **kwargs):
+        """
+        This method stores the day of the week of the events before creating
+        them, as save is not called.
+        """
+        objs = list(objs)
+        for event in objs:
+            event.set_week_day()
+        return super().bulk_create(objs, *args, **kwargs)
 
 
 class Event(models.Model):
@@ -295,22 +1292,41 @@ class Event(models.Model):
 
     fields:
         - day(DateField):
+        - week_day(int): day of the week of day, 0 is monday.
         - start_time(TimeField):
         - end_time(TimeField):
         - location(str):
         - free(bool):
-        - client(Client):
+        - client(Client): who booked the event. A client can book many
+          events, so it is not a one to one field.
         - calendar(Calendar): The calendar the event belongs to.
+        - series(RecurringSeries): The series the event was stored from.
 
     """
     day = models.DateField()
+    week_day = models.PositiveSmallIntegerField()
     start_time = models.TimeField()
     end_time = models.TimeField()
     location = models.CharField(max_length=50, null=True)
     free = models.BooleanField(default=True)
-    client = models.OneToOneField(Client, null=True,
-                                  on_delete=models.DO_NOTHING)
+    client = models.ForeignKey(Client, null=True,
+                               on_delete=models.DO_NOTHING)
     calendar = models.ForeignKey(Calendar, on_delete=models.CASCADE)
+    series = models.ForeignKey(RecurringSeries, null=True, blank=True,
+                               on_delete=models.CASCADE)
+
+    class Meta:
+        indexes = [
+            # Month windows, overlap checks and exact slot lookups.
+            models.Index(fields=['calendar', 'day', 'start_time']),
+            # Month windows restricted to free or taken events.
+            models.Index(fields=['calendar', 'free', 'day']),
+            # Recurrences of an event from a day on.
+            models.Index(fields=['calendar', 'week_day', 'start_time',
+                                 'day']),
+        ]
+
+    objects = EventQuerySet.as_manager()
 
     def __str__(self):
         return "{}: {} {} to {}".format(
@@ -318,3 +1334,21 @@ class Event(models.Model):
             self.day,
             self.start_time,
             self.end_time)
+
+    def save(self, *args, **kwargs):
+        """
+        This method stores the day of the week before saving the event.
+        """
+        self.set_week_day()
+        super().save(*args, **kwargs)
+
+    @property
+    def event_info(self):
+        return format_event_info(self.day, self.start_time, self.end_time)
+
+    def set_week_day(self):
+        """
+        Set week_day from day.
+        """
+        self.day = self._meta.get_field('day').to_python(self.day)
+        self.week_day = self.day.weekday()
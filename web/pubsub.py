@@ -0,0 +1,226 @@
+import asyncio
+import json
+import os
+import select
+import threading
+import time
+
+from utils.logger import logger
+
+from django.conf import settings
+from django.db import connection
+from django.utils.module_loading import import_string
+
+try:
+    import psycopg2
+    from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+except ImportError:
+    psycopg2 = None
+
+
+class Subscription:
+    """
+    Messages published on some channels, queued for an asyncio consumer.
+    """
+
+    def __init__(self, backend, channels, max_messages=100):
+        self.backend = backend
+        self.channels = channels
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(max_messages)
+        # Set when messages were dropped because the consumer was too slow.
+        self.overflow = False
+
+    async def get(self, timeout):
+        """
+        Wait for the next message.
+
+        Args:
+            - timeout(float): seconds.
+
+        Returns(dict|None): None on timeout.
+        """
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.backend.unsubscribe(self)
+
+    def put(self, message):
+        """
+        Queue a message from any thread.
+        """
+        try:
+            self.loop.call_soon_threadsafe(self._put, message)
+        except RuntimeError:
+            # The loop of the consumer is closed.
+            self.close()
+
+    def _put(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.overflow = True
+
+
+class LocalBackend:
+    """
+    Pub/sub within one process. Messages only reach the subscribers of the
+    process they are published in, so several workers need a shared
+    backend.
+    """
+
+    def __init__(self):
+        self._subscriptions = {}
+        self._lock = threading.Lock()
+
+    def publish(self, channel, message):
+        """
+        Publish a message on a channel.
+
+        Args:
+            - channel(str):
+            - message(dict): JSON serializable.
+
+        Returns(None):
+        """
+        self.deliver(channel, message)
+
+    def subscribe(self, channels):
+        """
+        Subscribe to several channels. It must be called from the event loop
+        the messages are consumed in.
+
+        Args:
+            - channels(list): list of str.
+
+        Returns(Subscription):
+        """
+        subscription = Subscription(self, channels)
+        with self._lock:
+            for channel in channels:
+                self._subscriptions.setdefault(channel, set())\
+                    .add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscriptions = self._subscriptions.get(channel, set())
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    self._subscriptions.pop(channel, None)
+
+    def deliver(self, channel, message):
+        """
+        Hand a message to the subscribers of this process.
+        """
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            subscription.put(message)
+
+
+class PostgresBackend(LocalBackend):
+    """
+    Pub/sub between workers over PostgreSQL LISTEN/NOTIFY. Every worker
+    listens from a thread with its own connection and delivers the
+    notifications to its subscribers.
+    """
+
+    CHANNEL = 'assistant_pubsub'
+
+    def __init__(self):
+        super().__init__()
+        self._pid = None
+
+    def publish(self, channel, message):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [
+                self.CHANNEL,
+                json.dumps({'channel': channel, 'message': message})])
+
+    def subscribe(self, channels):
+        self._start()
+        return super().subscribe(channels)
+
+    def _start(self):
+        """
+        Start the listening thread of this process.
+        """
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            threading.Thread(target=self._run, name="pubsub",
+                             daemon=True).start()
+            self._pid = os.getpid()
+
+    def _run(self):
+        while True:
+            try:
+                self._listen()
+            except Exception as err:
+                logger.log_error("Pub/sub connection lost: %s", err)
+                time.sleep(1)
+
+    def _listen(self):
+        listener = psycopg2.connect(**connection.get_connection_params())
+        try:
+            listener.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+            with listener.cursor() as cursor:
+                cursor.execute("LISTEN {}".format(self.CHANNEL))
+            while True:
+                if not select.select([listener], [], [], 5)[0]:
+                    continue
+                listener.poll()
+                while listener.notifies:
+                    notification = json.loads(listener.notifies.pop(0).payload)
+                    self.deliver(notification['channel'],
+                                 notification['message'])
+        finally:
+            listener.close()
+
+
+_backend = None
+
+
+def get_backend():
+    """
+    Get the backend set in the PUBSUB_BACKEND setting.
+
+    Returns(LocalBackend):
+    """
+    global _backend
+    if _backend is None:
+        _backend = import_string(settings.PUBSUB_BACKEND)()
+    return _backend
+
+
+def publish(channel, message):
+    """
+    Publish a message on a channel.
+
+    Args:
+        - channel(str):
+        - message(dict): JSON serializable.
+
+    Returns(None):
+    """
+    get_backend().publish(channel, message)
+
+
+def subscribe(channels):
+    """
+    Subscribe to several channels, from the event loop the messages are
+    consumed in.
+
+    Args:
+        - channels(list): list of str.
+
+    Returns(Subscription):
+    """
+    return get_backend().subscribe(channels)
@@ -0,0 +1,97 @@
+from .helpers import cache_helper
+from .models import Calendar, Client, Owner
+
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+
+@receiver(m2m_changed, sender=Owner.clients.through)
+def owner_clients_changed(sender, instance, action, reverse, pk_set,
+                          **kwargs):
+    """
+    Invalidate the cached calendars of the clients added to or removed from
+    an owner.
+    """
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if reverse:
+        client_ids = [instance.pk]
+    elif action == 'pre_clear':
+        client_ids = instance.clients.values_list('id', flat=True)
+    else:
+        client_ids = pk_set
+    cache_helper.invalidate_client_calendars(client_ids)
+
+
+@receiver(post_save, sender=Calendar)
+@receiver(post_delete, sender=Calendar)
+def calendar_changed(sender, instance, **kwargs):
+    """
+    Invalidate the cached calendars of the clients of a calendar's owner.
+    """
+    if instance.owner_id is None:
+        return
+    _invalidate_owner_clients(instance.owner_id)
+
+
+@receiver(post_save, sender=Owner)
+def owner_changed(sender, instance, created, update_fields, **kwargs):
+    """
+    Invalidate the cached calendars of the clients of an owner, as they
+    hold the owner's name. Logins only update last_login and are skipped.
+    """
+    if created or update_fields == frozenset(['last_login']):
+        return
+    _invalidate_owner_clients(instance.pk)
+
+
+@receiver(post_save, sender=Client)
+@receiver(post_delete, sender=Client)
+def client_changed(sender, instance, **kwargs):
+    """
+    Invalidate the cached calendars of a client. Client ids are derived from
+    identity numbers and can be reused.
+    """
+    cache_helper.invalidate_client_calendars([instance.pk])
+
+
+@receiver(post_save, sender=Client)
+def client_profile_changed(sender, instance, created, update_fields,
+                           **kwargs):
+    """
+    Bump the version of the calendars a client booked on, as their feeds
+    hold the client's name. Saves of other fields only, as logins, are
+    skipped.
+    """
+    if created or update_fields is not None and \
+            not update_fields & {'first_name', 'last_name'}:
+        return
+    Calendar.objects.filter(event__client=instance).update(
+        version=F('version') + 1, modified=timezone.now())
+
+
+@receiver(post_save, sender=Owner)
+@receiver(post_delete, sender=Owner)
+@receiver(post_save, sender=Client)
+@receiver(post_delete, sender=Client)
+def user_changed(sender, instance, **kwargs):
+    """
+    Invalidate a cached Client or Owner after a profile or password change.
+    """
+    cache_helper.invalidate_user(instance.pk)
+
+
+def _invalidate_owner_clients(owner_id):
+    """
+    Invalidate the cached calendars of the clients of an owner.
+
+    Args:
+        - owner_id(int):
+
+    Returns(None):
+    """
+    cache_helper.invalidate_client_calendars(
+        Owner.clients.through.objects.filter(owner_id=owner_id)
+        .values_list('client_id', flat=True))
@@ -0,0 +1,130 @@
+import asyncio
+import json
+from io import BytesIO
+
+from . import pubsub
+from .consts import PubSub
+from .helpers import user_helper
+
+from asgiref.sync import ThreadSensitiveContext, sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.core.handlers.asgi import ASGIRequest
+from django.db import close_old_connections
+from django.utils.module_loading import import_string
+
+
+async def slots_stream(scope, receive, send):
+    """
+    Stream the changes of the events of a calendar month as server-sent
+    events, until the client disconnects. Django 4.0 can not stream from
+    async views, so this is a raw ASGI application.
+
+    Owners get their calendar and clients one of their calendars.
+
+    input (query string):
+        calendar: int, calendar id (clients).
+        year: int
+        month: int
+
+    response: text/event-stream of added, removed, taken, freed and reload
+    events, with {'type': str, 'event_info': str} data.
+    """
+    request = ASGIRequest(scope, BytesIO())
+    # Without ASGIHandler, the context it opens keeps the lookups out of
+    # the thread other requests are served on.
+    async with ThreadSensitiveContext():
+        calendar = await sync_to_async(_authorize)(request)
+    try:
+        year = int(request.GET['year'])
+        month = int(request.GET['month'])
+    except (KeyError, ValueError):
+        calendar = None
+    if calendar is None:
+        await send({'type': 'http.response.start', 'status': 403,
+                    'headers': []})
+        await send({'type': 'http.response.body', 'body': b''})
+        return
+
+    subscription = pubsub.subscribe([
+        PubSub.CALENDAR.format(calendar.id),
+        PubSub.MONTH.format(calendar.id, year, month)])
+    disconnected = asyncio.ensure_future(_disconnect(receive))
+    try:
+        await send({'type': 'http.response.start', 'status': 200,
+                    'headers': [(b'content-type', b'text/event-stream'),
+                                (b'cache-control', b'no-cache'),
+                                (b'x-accel-buffering', b'no')]})
+        while not disconnected.done():
+            message = asyncio.ensure_future(
+                subscription.get(settings.SLOTS_STREAM_KEEPALIVE))
+            await asyncio.wait([message, disconnected],
+                               return_when=asyncio.FIRST_COMPLETED)
+            if not message.done():
+                message.cancel()
+                break
+            message = message.result()
+            if subscription.overflow:
+                subscription.overflow = False
+                message = {'type': 'reload'}
+            await send({'type': 'http.response.body',
+                        'body': _format(message), 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        subscription.close()
+        disconnected.cancel()
+
+
+def _authorize(request):
+    """
+    Get the calendar the user of a request can follow. No request signals
+    are sent for the stream, so the database connections are closed here
+    as they would be at the start and end of a request.
+
+    Args:
+        - request(HttpRequest):
+
+    Returns(Calendar|None):
+    """
+    close_old_connections()
+    try:
+        return _get_calendar(request)
+    finally:
+        close_old_connections()
+
+
+def _get_calendar(request):
+    engine = import_string(settings.SESSION_ENGINE)
+    request.session = engine.SessionStore(
+        request.COOKIES.get(settings.SESSION_COOKIE_NAME))
+    user = get_user(request)
+    if not user.is_authenticated:
+        return None
+    if user_helper.is_owner(user):
+        return user_helper.get_owner_calendar(user)
+    try:
+        calendars = user_helper.get_client_calendars(
+            user, id=int(request.GET.get('calendar', '')))
+    except ValueError:
+        return None
+    return calendars[0] if calendars else None
+
+
+async def _disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+def _format(message):
+    """
+    Format a message as a server-sent event, or a keep-alive comment.
+
+    Args:
+        - message(dict|None):
+
+    Returns(bytes):
+    """
+    if message is None:
+        return b': keep-alive\n\n'
+    return "event: {}\ndata: {}\n\n".format(
+        message['type'], json.dumps(message)).encode('utf-8')
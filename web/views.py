@@ -1,16 +1,27 @@
 import json
 from datetime import datetime
 
-from .helpers import login_helper, register_helper, user_helper
+from .helpers import etag_helper, feed_helper, import_helper, login_helper,\
+    register_helper, user_helper
+from .metrics import metrics as request_metrics
+from .consts import Import, PubSub
+from .models import Calendar, EventTakenError, WeeklyTemplate,\
+    format_event_info
 from utils.error import error_map
 from utils.logger import logger
 
-from django.http import HttpResponse, HttpResponseBadRequest, JsonResponse
+from django.conf import settings
+from django.db import transaction
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, HttpResponseBadRequest,\
+    HttpResponseForbidden, HttpResponseNotFound, JsonResponse,\
+    StreamingHttpResponse
 from django.shortcuts import redirect, render
 from django.urls import reverse
 from django.contrib.auth import login, logout
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.http import require_http_methods
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import condition, require_http_methods
 
 
 @require_http_methods(['GET'])
@@ -46,8 +57,11 @@ def owner_view(request):
     if user_helper.is_client(request.user):
         return redirect(reverse("client_view"))
     calendar = user_helper.get_owner_calendar(request.user)
+    feed_url = feed_helper.get_feed_url(request, calendar=calendar) \
+        if calendar else None
     return render(request, "owner.html",
-                  context={'owner': True, 'calendar': calendar})
+                  context={'owner': True, 'calendar': calendar,
+                           'feed_url': feed_url})
 
 
 @login_required(login_url="/login")
@@ -79,7 +93,7 @@ def add_owner_client(request):
     if user_helper.is_client(request.user):
         return redirect(reverse("client_view"))
     content = json.loads(request.body.decode('utf-8'))
-    logger.log_info("Trying to add client {}".format(content['email']))
+    logger.log_info("Trying to add client %s", content['email'])
     try:
         client = user_helper.get_client(
             email=content['email'],
@@ -87,7 +101,38 @@ def add_owner_client(request):
         request.user.add_client(client)
         return JsonResponse({})
     except Exception as err:
-        logger.log_error("Error Adding client: {}".format(err))
+        logger.log_error("Error Adding client: %s", err)
+        return HttpResponseBadRequest(reason=err)
+
+
+@login_required(login_url="/login")
+@require_http_methods(['POST'])
+def add_owner_clients(request):
+    """
+    Add several clients to the owners clients list at once.
+
+    input:
+        {'clients': [{'email': str, 'identity_number': int}]}, or a
+        multipart form with a CSV file with email and identity_number
+        columns.
+
+    response: {'added': int, clients not added before, 'unknown': list of the
+    rows matching no client} or {'reason': err_msg }
+    """
+    if user_helper.is_client(request.user):
+        return redirect(reverse("client_view"))
+    try:
+        if request.content_type == 'application/json':
+            rows = user_helper.get_client_rows(
+                content=json.loads(request.body.decode('utf-8')))
+        else:
+            rows = user_helper.get_client_rows(
+                upload=request.FILES.get('file'))
+        logger.log_info("Trying to add %s clients", len(rows))
+        added, unknown = request.user.add_clients(rows)
+        return JsonResponse({'added': len(added), 'unknown': unknown})
+    except Exception as err:
+        logger.log_error("Error Adding clients: %s", err)
         return HttpResponseBadRequest(reason=err)
 
 
@@ -106,12 +151,12 @@ def delete_owner_client(request):
     if user_helper.is_client(request.user):
         return redirect(reverse("client_view"))
     content = json.loads(request.body.decode('utf-8'))
-    logger.log_info("Trying to delete client {}".format(content['client_id']))
+    logger.log_info("Trying to delete client %s", content['client_id'])
     try:
         request.user.delete_client(content['client_id'])
         return JsonResponse({})
     except Exception as err:
-        logger.log_error("Error deleting client: {}".format(err))
+        logger.log_error("Error deleting client: %s", err)
         return HttpResponseBadRequest(reason=err)
 
 
@@ -130,17 +175,18 @@ def add_owner_calendar(request):
     if user_helper.is_client(request.user):
         return redirect(reverse("client_view"))
     content = json.loads(request.body.decode('utf-8'))
-    logger.log_info("Trying to add calendar {}".format(content['summary']))
+    logger.log_info("Trying to add calendar %s", content['summary'])
     try:
         user_helper.add_owner_calendar(request.user, content['summary'])
         return JsonResponse({})
     except Exception as err:
-        logger.log_error("Error adding calendar: {}".format(err))
+        logger.log_error("Error adding calendar: %s", err)
         return HttpResponseBadRequest(reason=err)
 
 
 @login_required(login_url="/login")
 @require_http_methods(['GET'])
+@condition(etag_func=etag_helper.available_events)
 def available_events_view(request):
     """
     Define the available events page.
@@ -153,14 +199,20 @@ def available_events_view(request):
     if not filter_args['month_filter']:
         filter_args['month_filter'] = datetime.now().month
         filter_args['year_filter'] = datetime.now().year
-    events = user_helper.get_owner_events(
-        request.user,
-        month_filter=filter_args.get('month_filter'),
-        year_filter=filter_args.get('year_filter'))
-    language = request.META.get('HTTP_ACCEPT_LANGUAGE', ['es', ])
+    calendar = user_helper.get_owner_calendar(request.user)
+    language = user_helper.get_language(
+        request.META.get('HTTP_ACCEPT_LANGUAGE'))
+    rows = ''
+    if calendar:
+        rows = user_helper.get_month_rows(
+            calendar, 'available',
+            filter_args['month_filter'], filter_args['year_filter'])
+    month = user_helper.month_range(filter_args['month_filter'],
+                                    filter_args['year_filter'])[0]
     return render(
         request, 'available_times.html',
-        context={'events': events, 'owner': True, 'language': language})
+        context={'rows': rows, 'owner': True, 'language': language,
+                 'month': month})
 
 
 @login_required(login_url="/login")
@@ -176,25 +228,29 @@ def add_event(request):
             'end_time': datetime.time,
             'location_name': str
             'recurrent': bool
+            'changes': 'json' | 'html' (optional)
         }
 
-    response: {'reason': err_msg}
+    response: {'added': list, 'removed': list, 'reload': bool}, with
+    changes, or {'reason': err_msg}
     """
     if user_helper.is_client(request.user):
         return redirect(reverse("client_view"))
     calendar = user_helper.get_owner_calendar(request.user)
     content = json.loads(request.body.decode('utf-8'))
-    logger.log_info("Trying to add event {}".format(content))
+    logger.log_info("Trying to add event %s", content)
     try:
-        calendar.create_event(
+        events = calendar.create_event(
             datetime.strptime(content['day'], "%Y-%m-%d").date(),
             datetime.strptime(content['start_time'], "%H:%M").time(),
             datetime.strptime(content['end_time'], "%H:%M").time(),
             content['location_name'],
             content['recurrent'])
-        return JsonResponse({})
+        return JsonResponse(user_helper.get_changes(
+            content.get('changes'), 'available', added=events,
+            reload=content['recurrent']))
     except Exception as err:
-        logger.log_error("Error adding event: {}".format(err))
+        logger.log_error("Error adding event: %s", err)
         return HttpResponseBadRequest(reason=err)
 
 
@@ -208,24 +264,130 @@ def delete_event(request):
     input:
         {
             event_info: str,
-            all: bool
+            all: bool,
+            changes: 'json' | 'html' (optional)
         }
 
-    response: {'reason': err_msg}
+    response: {'deleted': int}, with the changes of add_event if asked, or
+    {'reason': err_msg}
     """
     calendar = user_helper.get_owner_calendar(request.user)
     content = json.loads(request.body.decode('utf-8'))
-    logger.log_info("Trying to delete event {}".format(content))
+    logger.log_info("Trying to delete event %s", content)
     try:
         day, start_time, end_time = content['event_info'].split("|")
-        calendar.delete_event(
+        deleted = calendar.delete_event(
             datetime.strptime(day, "%Y-%m-%d").date(),
             start_time,
             end_time,
             all_events=content['all'])
-        return JsonResponse({})
+        return JsonResponse({'deleted': deleted, **user_helper.get_changes(
+            content.get('changes'), removed=[content['event_info']],
+            reload=content['all'])})
+    except Exception as err:
+        logger.log_error("Error adding event: %s", err)
+        return HttpResponseBadRequest(reason=err)
+
+
+@login_required(login_url="/login")
+@require_http_methods(['POST'])
+def add_weekly_template(request):
+    """
+    Add the slots of a weekly template to the owners calendar. Slots
+    overlapping other events are skipped. A saved template can be applied
+    again by its id, optionally on other dates.
+
+    input:
+        {
+            'template': int (optional, instead of the fields below)
+            'name': str (optional)
+            'week_days': list, 0 is monday
+            'opening_time': datetime.time,
+            'closing_time': datetime.time,
+            'slot_minutes': int,
+            'breaks': [[datetime.time, datetime.time]] (optional)
+            'start_date': datetime.date,
+            'end_date': datetime.date,
+            'location_name': str
+            'changes': 'json' | 'html' (optional)
+        }
+
+    response: {'template': int, 'created': int, 'skipped': list}, with the
+    changes of add_event if asked, or {'reason': err_msg}
+    """
+    if user_helper.is_client(request.user):
+        return redirect(reverse("client_view"))
+    calendar = user_helper.get_owner_calendar(request.user)
+    content = json.loads(request.body.decode('utf-8'))
+    logger.log_info("Trying to add weekly template %s", content)
+    try:
+        if 'template' in content:
+            template = WeeklyTemplate.objects.get(pk=content['template'],
+                                                  calendar=calendar)
+        else:
+            template = WeeklyTemplate(
+                calendar=calendar,
+                name=content.get('name', ''),
+                week_days=[int(day) for day in content['week_days']],
+                opening_time=datetime.strptime(
+                    content['opening_time'], "%H:%M").time(),
+                closing_time=datetime.strptime(
+                    content['closing_time'], "%H:%M").time(),
+                slot_minutes=int(content['slot_minutes']),
+                breaks=[[datetime.strptime(start, "%H:%M").time().isoformat(),
+                         datetime.strptime(end, "%H:%M").time().isoformat()]
+                        for start, end in content.get('breaks', [])],
+                location=content['location_name'])
+        for field in ('start_date', 'end_date'):
+            if field in content:
+                setattr(template, field, datetime.strptime(
+                    content[field], "%Y-%m-%d").date())
+        template.clean()
+        slots = template.slots()
+        with transaction.atomic():
+            if template.pk is None:
+                template.save()
+            events, skipped = calendar.create_slots(
+                slots, template.location, batch_size=Import.CHUNK_SIZE)
+        return JsonResponse({
+            'template': template.pk,
+            'created': len(events),
+            'skipped': [format_event_info(*slot) for slot in skipped],
+            **user_helper.get_changes(content.get('changes'),
+                                      reload=bool(events))})
     except Exception as err:
-        logger.log_error("Error adding event: {}".format(err))
+        logger.log_error("Error adding weekly template: %s", err)
+        return HttpResponseBadRequest(reason=err)
+
+
+@login_required(login_url="/login")
+@require_http_methods(['POST'])
+def import_events(request):
+    """
+    Import the slots of an .ics or .csv file to the owners calendar. Rows
+    that can not be read and overlapping slots are reported, the rest are
+    added.
+
+    input: multipart form with the file, and changes: 'json' | 'html'
+    (optional)
+
+    response: {'created': int, 'conflicts': list, 'errors': list}, with the
+    changes of add_event if asked, or {'reason': err_msg}
+    """
+    if user_helper.is_client(request.user):
+        return redirect(reverse("client_view"))
+    calendar = user_helper.get_owner_calendar(request.user)
+    upload = request.FILES.get('file')
+    logger.log_info("Trying to import events from %s",
+                    upload.name if upload else None)
+    try:
+        if upload is None:
+            raise ValueError("A file is required")
+        summary = import_helper.import_slots(calendar, upload.name, upload)
+        return JsonResponse({**summary, **user_helper.get_changes(
+            request.POST.get('changes'), reload=bool(summary['created']))})
+    except Exception as err:
+        logger.log_error("Error importing events: %s", err)
         return HttpResponseBadRequest(reason=err)
 
 
@@ -264,10 +426,11 @@ def cancel_event(request):
     input:
         {
             event_info: str,
-            calendar: str
+            calendar: str,
+            changes: 'json' | 'html' (optional)
         }
 
-    response: {'reason': err_msg}
+    response: the changes of add_event if asked, or {'reason': err_msg}
     """
     content = json.loads(request.body.decode('utf-8'))
     if user_helper.is_owner(request.user):
@@ -277,16 +440,59 @@ def cancel_event(request):
         calendar_id = content['calendar']
         calendar =\
             list(filter(lambda x: x.id == calendar_id, client_calendars))[0]
-    logger.log_info("Trying to cancel event {}".format(content))
+    logger.log_info("Trying to cancel event %s", content)
     try:
         day, start_time, end_time = content['event_info'].split("|")
         calendar.free_event(
             datetime.strptime(day, "%Y-%m-%d").date(),
             start_time,
             end_time)
-        return JsonResponse({})
+        return JsonResponse(user_helper.get_changes(
+            content.get('changes'), removed=[content['event_info']]))
     except Exception as err:
-        logger.log_error("Error canceling event: {}".format(err))
+        logger.log_error("Error canceling event: %s", err)
+        return HttpResponseBadRequest(reason=err)
+
+
+@login_required(login_url="/login")
+@require_http_methods(['POST'])
+def cancel_events(request):
+    """
+    Cancel several events at once. Owners cancel any taken event of their
+    calendar, clients only their own ones.
+
+    input:
+        {
+            event_infos: list,
+            calendar: int (clients only),
+            atomic: bool (optional, cancel all of them or none),
+            changes: 'json' | 'html' (optional)
+        }
+
+    response: {'results': [{'event_info': str, 'status': str}]}, with the
+    changes of add_event if asked, or {'reason': err_msg}. The status is
+    409 if the batch was rolled back.
+    """
+    content = json.loads(request.body.decode('utf-8'))
+    logger.log_info("Trying to cancel events %s", content)
+    try:
+        if user_helper.is_owner(request.user):
+            calendar = user_helper.get_owner_calendar(request.user)
+            client = None
+        else:
+            calendar = user_helper.get_client_calendars(
+                request.user, id=content['calendar'])[0]
+            client = request.user
+        statuses = calendar.free_events(
+            user_helper.get_slots(content['event_infos']),
+            client=client,
+            atomic=content.get('atomic', False))
+        return JsonResponse(
+            user_helper.get_batch_results(content['event_infos'], statuses,
+                                          content.get('changes')),
+            status=409 if 'rolled_back' in statuses else 200)
+    except Exception as err:
+        logger.log_error("Error canceling events: %s", err)
         return HttpResponseBadRequest(reason=err)
 
 
@@ -298,14 +504,18 @@ def client_view(request):
     """
     if user_helper.is_owner(request.user):
         return redirect(reverse("owner_view"))
-    return render(request, "client.html", context={'client': True})
+    return render(request, "client.html", context={
+        'client': True,
+        'feed_url': feed_helper.get_feed_url(request, client=request.user)})
 
 
 @login_required(login_url="/login")
 @require_http_methods(['GET'])
+@condition(etag_func=etag_helper.schedule_event)
 def schedule_event_view(request):
     """
-    This view defines the schedule event page.
+    This view defines the schedule event page. With rows, only the event
+    rows of the month are returned, for the page to refresh its table.
     """
     if user_helper.is_owner(request.user):
         return redirect(reverse("owner_view"))
@@ -314,8 +524,10 @@ def schedule_event_view(request):
     filter_args['year_filter'] = request.GET.get('year_filter')
     client_calendars = user_helper.get_client_calendars(request.user)
     if not client_calendars:
+        if request.GET.get('rows'):
+            return HttpResponse('')
         return render(request, "schedule_event.html",
-                      context={'client': True, 'events': []})
+                      context={'client': True, 'rows': ''})
 
     if not filter_args['month_filter']:
         filter_args['month_filter'] = datetime.now().month
@@ -325,15 +537,20 @@ def schedule_event_view(request):
         calendar = request.GET['calendar_filter'].split("|")[0].strip()
         filter_args['calendar'] =\
             list(filter(lambda x: x.summary == calendar, client_calendars))[0]
-    events = user_helper.get_client_events(
-        calendar=filter_args['calendar'],
-        month_filter=filter_args.get('month_filter'),
-        year_filter=filter_args.get('year_filter'),
-        free=True)
+    rows = user_helper.get_month_rows(
+        filter_args['calendar'], 'schedule',
+        filter_args['month_filter'], filter_args['year_filter'])
+    if request.GET.get('rows'):
+        return HttpResponse(rows)
+    month = user_helper.month_range(filter_args['month_filter'],
+                                    filter_args['year_filter'])[0]
+    # The slots stream is only served through asgi.py.
+    stream = PubSub.STREAM_PATH if isinstance(request, ASGIRequest) else None
     return render(request, "schedule_event.html",
-                  context={'client': True, 'events': events,
+                  context={'client': True, 'rows': rows,
                            'calendar': filter_args['calendar'],
-                           'client_calendars': client_calendars})
+                           'client_calendars': client_calendars,
+                           'month': month, 'stream': stream})
 
 
 @login_required(login_url="/login")
@@ -377,17 +594,18 @@ def schedule_event(request):
             'start_time': datetime.time,
             'end_time': datetime.time,
             'location_name': str,
-            'calendar': str
+            'calendar': str,
+            'changes': 'json' | 'html' (optional)
         }
 
-    response: {'reason': err_msg}
+    response: the changes of add_event if asked, or {'reason': err_msg}
     """
     if user_helper.is_owner(request.user):
         return redirect(reverse("owner_view"))
     content = json.loads(request.body.decode('utf-8'))
     calendar = user_helper.get_client_calendars(request.user,
                                                 id=content['calendar'])[0]
-    logger.log_info("Trying to add event {}".format(content))
+    logger.log_info("Trying to add event %s", content)
     try:
         day, start_time, end_time = content['event_info'].split("|")
         calendar.assign_event(
@@ -395,9 +613,51 @@ def schedule_event(request):
             datetime.strptime(day, "%Y-%m-%d").date(),
             start_time,
             end_time)
-        return JsonResponse({})
+        return JsonResponse(user_helper.get_changes(
+            content.get('changes'), removed=[content['event_info']]))
+    except EventTakenError as err:
+        logger.log_error("Error adding event: %s", err)
+        return HttpResponse(status=409, reason=err)
     except Exception as err:
-        logger.log_error("Error adding event: {}".format(err))
+        logger.log_error("Error adding event: %s", err)
+        return HttpResponseBadRequest(reason=err)
+
+
+@login_required(login_url="/login")
+@require_http_methods(['POST'])
+def schedule_events(request):
+    """
+    Schedule several events at once.
+
+    input:
+        {
+            'event_infos': list,
+            'calendar': int,
+            'atomic': bool (optional, schedule all of them or none),
+            'changes': 'json' | 'html' (optional)
+        }
+
+    response: {'results': [{'event_info': str, 'status': str}]}, with the
+    changes of add_event if asked, or {'reason': err_msg}. The status is
+    409 if the batch was rolled back.
+    """
+    if user_helper.is_owner(request.user):
+        return redirect(reverse("owner_view"))
+    content = json.loads(request.body.decode('utf-8'))
+    logger.log_info("Trying to add events %s", content)
+    try:
+        calendar = user_helper.get_client_calendars(
+            request.user, id=content['calendar'])[0]
+        statuses = calendar.assign_events(
+            request.user.identity_number,
+            user_helper.get_slots(content['event_infos']),
+            atomic=content.get('atomic', False))
+        return JsonResponse(
+            user_helper.get_batch_results(content['event_infos'], statuses,
+                                          content.get('changes')),
+            status=409 if 'rolled_back' in statuses else 200)
+    except Exception as err:
+        logger.log_error("Error adding events: %s", err)
         return HttpResponseBadRequest(reason=err)
 
 
@@ -423,10 +683,10 @@ def register_user(request):
     """
     logger.log_info("/register_user/")
     content = json.loads(request.body.decode('utf-8'))
-    logger.log_info("Trying to register user {}".format(content['email']))
+    logger.log_info("Trying to register user %s", content['email'])
 
     status_code, err_msg = register_helper.register_user(content)
-    logger.log_info("Result: {}-{}".format(status_code, err_msg))
+    logger.log_info("Result: %s-%s", status_code, err_msg)
 
     if status_code != 200:
         user_err_msg = error_map(status_code)
@@ -457,7 +717,7 @@ def login_user(request):
     content = json.loads(request.body.decode('utf-8'))
 
     status_code, err_msg, user = login_helper.login_user(content)
-    logger.log_info("Result: {} - {}".format(status_code, err_msg))
+    logger.log_info("Result: %s - %s", status_code, err_msg)
 
     if status_code != 200:
         user_err_msg = error_map(status_code)
@@ -478,3 +738,97 @@ def logout_user(request):
     """
     logout(request)
     return redirect(reverse("login"))
+
+
+@login_required(login_url="/login")
+@require_http_methods(['GET'])
+@condition(etag_func=etag_helper.events_api)
+def events_api(request):
+    """
+    List a page of calendar events as JSON. Owners get the events of their
+    calendar and clients the free events and their bookings of one of
+    their calendars.
+
+    input (query string):
+        from: date, defaults to today.
+        to: date, defaults to 30 days from the first one.
+        status: 'free', 'taken' (owners) or 'mine' (clients).
+        calendar: int, calendar id (clients).
+        after: str, cursor of the next page.
+        limit: int, defaults to 100.
+
+    response: {'events': list, 'next': str|None}
+    """
+    try:
+        events, cursor = user_helper.get_events_page(request.user,
+                                                     request.GET)
+    except (ValueError, KeyError) as err:
+        logger.log_error("Error listing events: %s", err)
+        return HttpResponseBadRequest(reason=err)
+    return JsonResponse({'events': events, 'next': cursor})
+
+
+@require_http_methods(['GET'])
+@condition(etag_func=etag_helper.feed,
+           last_modified_func=etag_helper.feed_modified)
+def feed(request, token):
+    """
+    Stream the iCalendar feed of a calendar, or of a client's bookings, as
+    signed in the token of the URL. Calendar apps poll it without a session.
+
+    input: from and to query parameters (optional), YYYY-MM-DD.
+
+    response: text/calendar file, or {'reason': err_msg}
+    """
+    signed = feed_helper.load_token(token)
+    owner = feed_helper.get_owner(*signed) if signed else None
+    if owner is None:
+        return HttpResponseForbidden()
+    try:
+        first_day, last_day = feed_helper.get_window(request.GET)
+    except ValueError as err:
+        return HttpResponseBadRequest(reason=err)
+    stream = feed_helper.stream_calendar if isinstance(owner, Calendar) \
+        else feed_helper.stream_client
+    response = StreamingHttpResponse(stream(owner, first_day, last_day),
+                                     content_type='text/calendar')
+    response['Content-Disposition'] = 'inline; filename="calendar.ics"'
+    return response
+
+
+@login_required(login_url="/login")
+@require_http_methods(['POST'])
+def rotate_feed(request):
+    """
+    Change the feed URL of the owner's calendar or of the client's bookings,
+    revoking the one given until now.
+
+    response: {'feed_url': str}, or {'reason': err_msg}
+    """
+    if user_helper.is_owner(request.user):
+        calendar = user_helper.get_owner_calendar(request.user)
+        if calendar is None:
+            return HttpResponseBadRequest(reason="The owner has no calendar")
+        feed_helper.rotate_secret(calendar)
+        return JsonResponse({'feed_url': feed_helper.get_feed_url(
+            request, calendar=calendar)})
+    feed_helper.rotate_secret(request.user)
+    return JsonResponse({'feed_url': feed_helper.get_feed_url(
+        request, client=request.user)})
+
+
+@require_http_methods(['GET'])
+def metrics(request):
+    """
+    This view exports the request metrics of this process in the Prometheus
+    text format. It is not served without a METRICS_TOKEN, and requires it
+    as a bearer token.
+    """
+    if not settings.METRICS_TOKEN:
+        return HttpResponseNotFound()
+    if not constant_time_compare(
+            request.META.get('HTTP_AUTHORIZATION', ''),
+            "Bearer {}".format(settings.METRICS_TOKEN)):
+        return HttpResponseForbidden()
+    return HttpResponse(request_metrics.export(),
+                        content_type="text/plain; version=0.0.4")